@@ -0,0 +1,263 @@
+"""
+Synapse configuration
+Reads service settings from environment variables
+"""
+import os
+from dataclasses import dataclass
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, "true" if default else "false").lower() in ("1", "true", "yes")
+
+
+@dataclass
+class Settings:
+    """Runtime settings for the Synapse service"""
+    redis_host: str = "redis"
+    redis_port: int = 6379
+    redis_password: str = "redispassword"
+    # Treat REDIS_HOST:REDIS_PORT as a startup node of a Redis Cluster
+    redis_cluster: bool = False
+    # Connection pool: max connections per client (per node on a cluster;
+    # 0 = redis-py's default), TCP keepalive, and the idle time in seconds
+    # after which a pooled connection is PINGed before reuse (0 = never)
+    redis_max_connections: int = 0
+    redis_socket_keepalive: bool = True
+    redis_health_check_interval: int = 30
+    # Sentinel: "host:port,..." of the sentinels; the primary is then
+    # REDIS_SENTINEL_MASTER's current master (REDIS_HOST/PORT are unused)
+    redis_sentinels: str = ""
+    redis_sentinel_master: str = "mymaster"
+    # Read replicas for monitoring and browse reads: "host:port,..." (with
+    # Sentinel, the master's replicas are used instead). Replicas further
+    # behind than the staleness budget are skipped until they catch up.
+    redis_replicas: str = ""
+    replica_max_staleness_seconds: float = 5.0
+    replica_check_interval_seconds: float = 1.0
+
+    # Approximate MAXLEN applied on XADD (or by the retention scheduler when enabled)
+    stream_max_length: int = 10000
+
+    # Hash partitioning: "stream=count[:key_field],..." (e.g. inference-events=8:model_name)
+    stream_partitions: str = ""
+
+    # Time-based retention ("stream=age:7d;length:100000;memory:256mb,...")
+    retention_enabled: bool = True
+    retention_policies: str = ""
+    retention_default_max_age_seconds: int = 0
+    retention_interval_seconds: float = 60.0
+    retention_jitter_seconds: float = 10.0
+
+    # Cold-tier archive of trimmed ranges (file:///path or s3://bucket/prefix)
+    archive_enabled: bool = False
+    archive_url: str = "file:///data/synapse-archive"
+    archive_streams: str = "inference-events,training-events"
+    archive_chunk_size: int = 1000
+    archive_segment_max_entries: int = 100000
+
+    # Per-type split: "stream[=type|type],..." copies events into stream:<event type>
+    split_streams: str = ""
+    split_mode: str = "copy"
+    split_max_types: int = 100
+
+    # Secondary indexes: fields indexed on every write (empty = off), and the
+    # streams they apply to (empty = every managed stream)
+    index_fields: str = ""
+    index_streams: str = ""
+
+    # Message browsing: pages above the threshold are streamed as NDJSON
+    browse_stream_threshold: int = 1000
+    browse_batch_size: int = 500
+
+    # Replay pacing in events per second (0 = unpaced)
+    replay_default_rate: float = 1000.0
+    replay_max_rate: float = 0.0
+    replay_batch_size: int = 500
+
+    # Live tailing: per-client queue and what happens when it fills (drop|disconnect)
+    tail_queue_size: int = 1000
+    tail_overflow_policy: str = "drop"
+    tail_block_ms: int = 5000
+    tail_heartbeat_seconds: float = 15.0
+
+    # Filtered consume endpoint: groups it may create on one stream key
+    consume_max_groups: int = 20
+
+    # Memory pressure controller (priority order is highest first)
+    memory_pressure_enabled: bool = False
+    memory_pressure_priority: str = (
+        "model-events,agi-decisions,platform-events,training-events,inference-events"
+    )
+    memory_pressure_soft_ratio: float = 0.75
+    memory_pressure_hard_ratio: float = 0.9
+    memory_pressure_keep_fraction: float = 0.5
+    memory_pressure_min_length: int = 1000
+    memory_pressure_interval_seconds: float = 10.0
+
+    # Batch ingestion
+    ingest_max_batch: int = 1000
+    # Events with an idempotency key (or producer id + sequence) are written
+    # at most once per window (0 disables the check)
+    dedup_window_seconds: float = 300.0
+    # Claim check: field values above the threshold are stored in this blob
+    # store (file:///path or s3://bucket/prefix; empty = off) and referenced
+    claim_check_url: str = ""
+    claim_check_threshold_bytes: int = 65536
+    backpressure_max_lag: int = 50000
+    backpressure_max_memory_ratio: float = 0.9
+    backpressure_retry_after_seconds: int = 1
+    backpressure_check_interval_seconds: float = 1.0
+
+    # Consumer group analytics (/streams/{name}/groups): report cache, lag
+    # samples kept per group, and background sampling interval (0 = sample
+    # only when the endpoint is called)
+    group_analytics_cache_seconds: float = 2.0
+    group_analytics_history_size: int = 60
+    group_analytics_interval_seconds: float = 10.0
+
+    # Response compression (gzip, or brotli when installed) above this size
+    compression_min_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+
+    # Validation policies: "stream=always|sample:N|shape,..."
+    validation_policies: str = ""
+    validation_default_policy: str = "always"
+    # Modules whose register_upcasters(registry) is called at startup ("pkg.mod,...")
+    schema_upcaster_modules: str = ""
+    # How often schemas and upcasters registered on other replicas are loaded (0 = never)
+    schema_refresh_seconds: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Build settings from environment variables"""
+        return cls(
+            redis_host=os.getenv("REDIS_HOST", cls.redis_host),
+            redis_port=_env_int("REDIS_PORT", cls.redis_port),
+            redis_password=os.getenv("REDIS_PASSWORD", cls.redis_password),
+            redis_cluster=_env_bool("REDIS_CLUSTER", cls.redis_cluster),
+            redis_max_connections=_env_int("REDIS_MAX_CONNECTIONS", cls.redis_max_connections),
+            redis_socket_keepalive=_env_bool(
+                "REDIS_SOCKET_KEEPALIVE", cls.redis_socket_keepalive
+            ),
+            redis_health_check_interval=_env_int(
+                "REDIS_HEALTH_CHECK_INTERVAL", cls.redis_health_check_interval
+            ),
+            redis_sentinels=os.getenv("REDIS_SENTINELS", cls.redis_sentinels),
+            redis_sentinel_master=os.getenv("REDIS_SENTINEL_MASTER", cls.redis_sentinel_master),
+            redis_replicas=os.getenv("REDIS_REPLICAS", cls.redis_replicas),
+            replica_max_staleness_seconds=_env_float(
+                "REPLICA_MAX_STALENESS_SECONDS", cls.replica_max_staleness_seconds
+            ),
+            replica_check_interval_seconds=_env_float(
+                "REPLICA_CHECK_INTERVAL_SECONDS", cls.replica_check_interval_seconds
+            ),
+            stream_max_length=_env_int("STREAM_MAX_LENGTH", cls.stream_max_length),
+            stream_partitions=os.getenv("STREAM_PARTITIONS", cls.stream_partitions),
+            retention_enabled=_env_bool("RETENTION_ENABLED", cls.retention_enabled),
+            retention_policies=os.getenv("RETENTION_POLICIES", cls.retention_policies),
+            retention_default_max_age_seconds=_env_int(
+                "RETENTION_DEFAULT_MAX_AGE_SECONDS", cls.retention_default_max_age_seconds
+            ),
+            retention_interval_seconds=_env_float(
+                "RETENTION_INTERVAL_SECONDS", cls.retention_interval_seconds
+            ),
+            retention_jitter_seconds=_env_float(
+                "RETENTION_JITTER_SECONDS", cls.retention_jitter_seconds
+            ),
+            archive_enabled=_env_bool("ARCHIVE_ENABLED", cls.archive_enabled),
+            archive_url=os.getenv("ARCHIVE_URL", cls.archive_url),
+            archive_streams=os.getenv("ARCHIVE_STREAMS", cls.archive_streams),
+            archive_chunk_size=_env_int("ARCHIVE_CHUNK_SIZE", cls.archive_chunk_size),
+            archive_segment_max_entries=_env_int(
+                "ARCHIVE_SEGMENT_MAX_ENTRIES", cls.archive_segment_max_entries
+            ),
+            split_streams=os.getenv("SPLIT_STREAMS", cls.split_streams),
+            split_mode=os.getenv("SPLIT_MODE", cls.split_mode),
+            split_max_types=_env_int("SPLIT_MAX_TYPES", cls.split_max_types),
+            index_fields=os.getenv("INDEX_FIELDS", cls.index_fields),
+            index_streams=os.getenv("INDEX_STREAMS", cls.index_streams),
+            browse_stream_threshold=_env_int(
+                "BROWSE_STREAM_THRESHOLD", cls.browse_stream_threshold
+            ),
+            browse_batch_size=_env_int("BROWSE_BATCH_SIZE", cls.browse_batch_size),
+            replay_default_rate=_env_float("REPLAY_DEFAULT_RATE", cls.replay_default_rate),
+            replay_max_rate=_env_float("REPLAY_MAX_RATE", cls.replay_max_rate),
+            replay_batch_size=_env_int("REPLAY_BATCH_SIZE", cls.replay_batch_size),
+            tail_queue_size=_env_int("TAIL_QUEUE_SIZE", cls.tail_queue_size),
+            tail_overflow_policy=os.getenv("TAIL_OVERFLOW_POLICY", cls.tail_overflow_policy),
+            tail_block_ms=_env_int("TAIL_BLOCK_MS", cls.tail_block_ms),
+            tail_heartbeat_seconds=_env_float(
+                "TAIL_HEARTBEAT_SECONDS", cls.tail_heartbeat_seconds
+            ),
+            consume_max_groups=_env_int("CONSUME_MAX_GROUPS", cls.consume_max_groups),
+            memory_pressure_enabled=_env_bool(
+                "MEMORY_PRESSURE_ENABLED", cls.memory_pressure_enabled
+            ),
+            memory_pressure_priority=os.getenv(
+                "MEMORY_PRESSURE_PRIORITY", cls.memory_pressure_priority
+            ),
+            memory_pressure_soft_ratio=_env_float(
+                "MEMORY_PRESSURE_SOFT_RATIO", cls.memory_pressure_soft_ratio
+            ),
+            memory_pressure_hard_ratio=_env_float(
+                "MEMORY_PRESSURE_HARD_RATIO", cls.memory_pressure_hard_ratio
+            ),
+            memory_pressure_keep_fraction=_env_float(
+                "MEMORY_PRESSURE_KEEP_FRACTION", cls.memory_pressure_keep_fraction
+            ),
+            memory_pressure_min_length=_env_int(
+                "MEMORY_PRESSURE_MIN_LENGTH", cls.memory_pressure_min_length
+            ),
+            memory_pressure_interval_seconds=_env_float(
+                "MEMORY_PRESSURE_INTERVAL_SECONDS", cls.memory_pressure_interval_seconds
+            ),
+            ingest_max_batch=_env_int("INGEST_MAX_BATCH", cls.ingest_max_batch),
+            dedup_window_seconds=_env_float("DEDUP_WINDOW_SECONDS", cls.dedup_window_seconds),
+            claim_check_url=os.getenv("CLAIM_CHECK_URL", cls.claim_check_url),
+            claim_check_threshold_bytes=_env_int(
+                "CLAIM_CHECK_THRESHOLD_BYTES", cls.claim_check_threshold_bytes
+            ),
+            backpressure_max_lag=_env_int("BACKPRESSURE_MAX_LAG", cls.backpressure_max_lag),
+            backpressure_max_memory_ratio=_env_float(
+                "BACKPRESSURE_MAX_MEMORY_RATIO", cls.backpressure_max_memory_ratio
+            ),
+            backpressure_retry_after_seconds=_env_int(
+                "BACKPRESSURE_RETRY_AFTER_SECONDS", cls.backpressure_retry_after_seconds
+            ),
+            backpressure_check_interval_seconds=_env_float(
+                "BACKPRESSURE_CHECK_INTERVAL_SECONDS", cls.backpressure_check_interval_seconds
+            ),
+            group_analytics_cache_seconds=_env_float(
+                "GROUP_ANALYTICS_CACHE_SECONDS", cls.group_analytics_cache_seconds
+            ),
+            group_analytics_history_size=_env_int(
+                "GROUP_ANALYTICS_HISTORY_SIZE", cls.group_analytics_history_size
+            ),
+            group_analytics_interval_seconds=_env_float(
+                "GROUP_ANALYTICS_INTERVAL_SECONDS", cls.group_analytics_interval_seconds
+            ),
+            compression_min_size=_env_int("COMPRESSION_MIN_SIZE", cls.compression_min_size),
+            compression_gzip_level=_env_int(
+                "COMPRESSION_GZIP_LEVEL", cls.compression_gzip_level
+            ),
+            compression_brotli_quality=_env_int(
+                "COMPRESSION_BROTLI_QUALITY", cls.compression_brotli_quality
+            ),
+            validation_policies=os.getenv("VALIDATION_POLICIES", cls.validation_policies),
+            validation_default_policy=os.getenv(
+                "VALIDATION_DEFAULT_POLICY", cls.validation_default_policy
+            ),
+            schema_upcaster_modules=os.getenv(
+                "SCHEMA_UPCASTER_MODULES", cls.schema_upcaster_modules
+            ),
+            schema_refresh_seconds=_env_float("SCHEMA_REFRESH_SECONDS", cls.schema_refresh_seconds),
+        )
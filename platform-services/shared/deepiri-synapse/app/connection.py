@@ -0,0 +1,159 @@
+"""
+Redis connections for Synapse
+Standalone, Sentinel or cluster clients, plus helpers for commands that span nodes
+"""
+import redis.asyncio as redis
+from redis.asyncio.cluster import RedisCluster
+from redis.asyncio.sentinel import Sentinel
+from redis.crc import key_slot
+from typing import Any, Dict, Iterable, List, Tuple
+
+from .config import Settings
+
+
+def _pool_options(settings: Settings) -> Dict[str, Any]:
+    options: Dict[str, Any] = {
+        "socket_keepalive": settings.redis_socket_keepalive,
+        "health_check_interval": settings.redis_health_check_interval,
+    }
+    if settings.redis_max_connections > 0:
+        options["max_connections"] = settings.redis_max_connections
+    return options
+
+
+def parse_nodes(spec: str) -> List[Tuple[str, int]]:
+    """Parse "host:port,host:port" (port defaults to 6379)"""
+    nodes = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.rpartition(":") if ":" in item else (item, "", "6379")
+        nodes.append((host, int(port)))
+    return nodes
+
+
+def _sentinel(settings: Settings) -> Sentinel:
+    return Sentinel(
+        parse_nodes(settings.redis_sentinels),
+        sentinel_kwargs={"password": settings.redis_password},
+        password=settings.redis_password
+    )
+
+
+def _standalone(
+    settings: Settings,
+    host: str,
+    port: int,
+    decode_responses: bool
+) -> redis.Redis:
+    pool = redis.ConnectionPool(
+        host=host,
+        port=port,
+        password=settings.redis_password,
+        decode_responses=decode_responses,
+        **_pool_options(settings)
+    )
+    return redis.Redis.from_pool(pool)
+
+
+def create_redis_client(settings: Settings, decode_responses: bool = True) -> redis.Redis:
+    """
+    Build the Redis client for the configured topology
+
+    With REDIS_CLUSTER=true the host/port are used as a startup node and the
+    client discovers the rest of the cluster. Pipelines on a cluster client
+    are split per node and sent to the nodes in parallel. With
+    REDIS_SENTINELS set, the client follows the primary of
+    REDIS_SENTINEL_MASTER through failovers.
+
+    `decode_responses=False` gives a bytes-mode client for paths that pass
+    entries through without reading them (replay, tail, archive), which
+    skips decoding every field of every entry. The reply parser is
+    redis-py's default: hiredis when it is installed, pure Python otherwise.
+    """
+    if settings.redis_cluster:
+        return RedisCluster(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            password=settings.redis_password,
+            decode_responses=decode_responses,
+            **_pool_options(settings)
+        )
+    if settings.redis_sentinels:
+        return _sentinel(settings).master_for(
+            settings.redis_sentinel_master,
+            decode_responses=decode_responses,
+            **_pool_options(settings)
+        )
+    return _standalone(settings, settings.redis_host, settings.redis_port, decode_responses)
+
+
+def create_replica_clients(settings: Settings) -> Dict[str, redis.Redis]:
+    """
+    Read-only clients for the configured replicas, by display name
+
+    REDIS_REPLICAS lists replica addresses directly; with Sentinel, one
+    client spreads reads over the master's replicas as Sentinel reports
+    them. Cluster deployments get none (their replicas serve their own
+    slots only).
+    """
+    if settings.redis_cluster:
+        return {}
+    if settings.redis_sentinels:
+        client = _sentinel(settings).slave_for(
+            settings.redis_sentinel_master,
+            decode_responses=True,
+            **_pool_options(settings)
+        )
+        return {f"sentinel:{settings.redis_sentinel_master}": client}
+    return {
+        f"{host}:{port}": _standalone(settings, host, port, decode_responses=True)
+        for host, port in parse_nodes(settings.redis_replicas)
+    }
+
+
+def is_cluster(client: Any) -> bool:
+    """Whether a client talks to a Redis Cluster"""
+    return isinstance(client, RedisCluster)
+
+
+def group_by_slot(keys: Iterable[str]) -> List[List[str]]:
+    """
+    Split keys into groups that can share one multi-key command
+
+    Cluster commands such as XREAD over several streams must stay within
+    one hash slot; partitions of a stream deliberately don't.
+    """
+    groups: Dict[int, List[str]] = {}
+    for key in keys:
+        groups.setdefault(key_slot(key.encode("utf-8")), []).append(key)
+    return list(groups.values())
+
+
+async def memory_info(client: redis.Redis) -> Dict[str, int]:
+    """
+    used_memory and maxmemory in bytes (maxmemory 0 means unlimited)
+
+    On a cluster this reports the fullest primary, since each node hits its
+    own maxmemory independently.
+    """
+    try:
+        if is_cluster(client):
+            per_node = list(
+                (await client.info("memory", target_nodes=RedisCluster.PRIMARIES)).values()
+            )
+        else:
+            per_node = [await client.info("memory")]
+    except redis.ResponseError:
+        per_node = [{}]  # INFO can be disabled on managed Redis
+
+    def ratio(info: Dict[str, Any]) -> float:
+        maxmemory = int(info.get("maxmemory", 0) or 0)
+        return int(info.get("used_memory", 0) or 0) / maxmemory if maxmemory else 0.0
+
+    fullest = max(per_node, key=ratio)
+    return {
+        "used_memory": int(fullest.get("used_memory", 0) or 0),
+        "maxmemory": int(fullest.get("maxmemory", 0) or 0),
+    }
@@ -0,0 +1,118 @@
+"""
+Consumer-side coalescing for Synapse
+Collapses bursts of events with the same key into one delivery per window
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+COALESCE_MODES = ("latest", "merge")
+
+# (stream key, entry ID, fields)
+Message = Tuple[str, str, Dict[str, Any]]
+
+
+@dataclass
+class _Held:
+    """Newest entry for one key, waiting for its window to close"""
+    stream: str
+    msg_id: str
+    data: Dict[str, Any]
+    deadline: float
+    # IDs of earlier entries whose fields were merged into `data`
+    merged: List[str] = field(default_factory=list)
+
+
+class Coalescer:
+    """
+    Holds keyed events for a window and releases one per key
+
+    The window starts with the first event for a key, so a steady stream of
+    updates is still delivered at least once per window. "latest" delivers
+    the newest event as-is; "merge" delivers the newest event's fields laid
+    over the earlier ones. Events without the key (or of other types) pass
+    straight through. Superseded entries are handed back for acking; in
+    "merge" mode their fields live on in the held event, so they are kept
+    until it is delivered and then handed back by `take_merged`.
+    """
+
+    def __init__(
+        self,
+        key_field: str,
+        window_seconds: float,
+        mode: str = "latest",
+        event_types: Optional[Set[str]] = None
+    ):
+        """Initialize coalescer"""
+        if mode not in COALESCE_MODES:
+            raise ValueError(f"Unknown coalesce mode '{mode}'")
+        self.key_field = key_field
+        self.window_seconds = window_seconds
+        self.mode = mode
+        self.event_types = event_types
+        self._held: Dict[Tuple[str, str], _Held] = {}
+        self._merged: Dict[Tuple[str, str], List[str]] = {}
+        self.coalesced = 0
+        self.delivered = 0
+
+    def offer(
+        self,
+        stream: str,
+        msg_id: str,
+        data: Dict[str, Any],
+        now: float
+    ) -> Tuple[Optional[Message], List[Tuple[str, str]]]:
+        """
+        Take one event
+
+        Returns the event if it should be delivered right away, and the
+        (stream, entry ID) of any entry it superseded.
+        """
+        key = data.get(self.key_field)
+        if key is None or (self.event_types is not None and data.get("event") not in self.event_types):
+            self.delivered += 1
+            return (stream, msg_id, data), []
+
+        held = self._held.get((stream, key))
+        if held is None:
+            self._held[(stream, key)] = _Held(stream, msg_id, data, now + self.window_seconds)
+            return None, []
+
+        self.coalesced += 1
+        if self.mode == "merge":
+            held.merged.append(held.msg_id)
+            held.data = {**held.data, **data}
+            held.msg_id = msg_id
+            return None, []
+        superseded = [(held.stream, held.msg_id)]
+        held.data = data
+        held.msg_id = msg_id
+        return None, superseded
+
+    def due(self, now: float) -> List[Message]:
+        """Release every key whose window has closed"""
+        ready = [k for k, held in self._held.items() if held.deadline <= now]
+        released = []
+        for k in ready:
+            held = self._held.pop(k)
+            if held.merged:
+                self._merged[(held.stream, held.msg_id)] = held.merged
+            released.append((held.stream, held.msg_id, held.data))
+        self.delivered += len(released)
+        return released
+
+    def take_merged(self, stream: str, msg_id: str) -> List[str]:
+        """IDs merged into a released event, to ack once it has been delivered"""
+        return self._merged.pop((stream, msg_id), [])
+
+    def next_deadline(self) -> Optional[float]:
+        """When the next window closes, if anything is held"""
+        return min((held.deadline for held in self._held.values()), default=None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Coalescing metrics"""
+        return {
+            "mode": self.mode,
+            "held": len(self._held),
+            "coalesced": self.coalesced,
+            "delivered": self.delivered,
+        }
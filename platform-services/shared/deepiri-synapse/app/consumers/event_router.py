@@ -3,66 +3,322 @@ Event router for Synapse
 Routes events to appropriate handlers
 """
 import redis.asyncio as redis
-from typing import Dict, Any, Callable, Optional
+from typing import Dict, Any, Callable, Iterable, List, Optional, Set, Tuple
 import asyncio
+import time
+
+from ..connection import group_by_slot, is_cluster
+from ..monitoring.prometheus import (
+    ACK_BATCH_SIZE,
+    EVENTS_COALESCED,
+    EVENTS_CONSUMED,
+    HANDLER_DURATION,
+    HANDLER_ERRORS,
+    REDIS_RTT,
+)
+from ..schemas.registry import SchemaRegistry
+from ..storage.claim_check import ClaimCheck
+from ..streams.filters import Filters
+from ..streams.functions import StreamFunctions
+from ..streams.partitions import StreamPartitioner
+from .coalescing import Coalescer
+from .filtered import FilteredReader
 
 
 class EventRouter:
     """Routes events to handlers"""
     
-    def __init__(self, redis_client: redis.Redis):
-        """Initialize event router"""
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        partitioner: Optional[StreamPartitioner] = None,
+        functions: Optional[StreamFunctions] = None,
+        max_length: Optional[int] = None,
+        claim_check: Optional[ClaimCheck] = None,
+        schema_registry: Optional[SchemaRegistry] = None
+    ):
+        """
+        Initialize event router
+
+        Handlers get the claim-checked values they declare resolved and,
+        with a schema registry, events upcast to the latest version of
+        their schema.
+        """
         self.redis = redis_client
+        self.schema_registry = schema_registry
+        self.partitioner = partitioner or StreamPartitioner()
+        self.functions = functions or StreamFunctions(redis_client)
+        self.max_length = max_length
+        self.claim_check = claim_check
         self.handlers: Dict[str, list] = {}
+        self.coalescing: Dict[str, Dict[str, Any]] = {}
+        self._coalescers: Dict[str, Coalescer] = {}
     
     def register_handler(
         self,
         stream_name: str,
         handler: Callable[[Dict[str, Any]], None],
-        consumer_group: Optional[str] = None
+        consumer_group: Optional[str] = None,
+        forward_to: Optional[str] = None,
+        claim_fields: Optional[Iterable[str]] = None
     ):
-        """Register event handler"""
+        """
+        Register event handler
+        
+        With `forward_to`, the handler's result (a dict of fields, or the
+        original event when it returns None) is appended to that stream in
+        the same call that acknowledges the entry. `claim_fields` names the
+        claim-checked fields the handler reads; only those are fetched from
+        the blob store (None fetches every one, an empty list none).
+        """
         if stream_name not in self.handlers:
             self.handlers[stream_name] = []
         
         self.handlers[stream_name].append({
             "handler": handler,
-            "consumer_group": consumer_group
+            "consumer_group": consumer_group,
+            "forward_to": forward_to,
+            "claim_fields": None if claim_fields is None else set(claim_fields)
         })
     
+    def coalesce(
+        self,
+        stream_name: str,
+        key_field: str,
+        window_seconds: float,
+        mode: str = "latest",
+        event_types: Optional[Set[str]] = None
+    ):
+        """
+        Coalesce a stream's events by `key_field` within a time window
+        
+        Handlers get one event per key per window: the latest ("latest") or
+        all fields merged in arrival order ("merge"). Superseded entries are
+        acked as coalesced without reaching the handlers; in "merge" mode
+        only once the merged event is delivered. Held entries stay pending
+        until then, and a consumer re-reads its pending entries on start,
+        so a restart under the same consumer name redelivers them.
+        """
+        Coalescer(key_field, window_seconds, mode, event_types)  # Validate up front
+        self.coalescing[stream_name] = {
+            "key_field": key_field,
+            "window_seconds": window_seconds,
+            "mode": mode,
+            "event_types": event_types,
+        }
+    
+    async def _deliver(
+        self,
+        stream_name: str,
+        consumer_group: str,
+        stream: str,
+        msg_id: str,
+        data: Dict[str, Any]
+    ):
+        """Run an entry's handlers, then acknowledge (and forward) it"""
+        forwards = []
+        EVENTS_CONSUMED.labels(stream_name, consumer_group).inc()
+        if self.schema_registry and stream_name in self.handlers:
+            data = self.schema_registry.upcast_fields(data)
+        # Route to handlers
+        if stream_name in self.handlers:
+            duration = HANDLER_DURATION.labels(stream_name)
+            event, resolved = data, set()
+            for handler_info in self.handlers[stream_name]:
+                if self.claim_check:
+                    # Fetch what this handler declares, once per entry
+                    wanted = handler_info["claim_fields"]
+                    missing = (set(data) if wanted is None else wanted) - resolved
+                    if missing:
+                        event = await self.claim_check.resolve_fields(event, missing)
+                        resolved |= missing
+                started = time.perf_counter()
+                try:
+                    result = await handler_info["handler"](event)
+                except Exception as e:
+                    HANDLER_ERRORS.labels(stream_name).inc()
+                    print(f"Handler error: {e}")
+                    continue
+                finally:
+                    duration.observe(time.perf_counter() - started)
+                if handler_info["forward_to"]:
+                    fields = result if isinstance(result, dict) else data
+                    forwards.append((handler_info["forward_to"], fields))
+        
+        # Acknowledge
+        started = time.perf_counter()
+        await self._ack(stream, consumer_group, msg_id, forwards)
+        REDIS_RTT.labels("ack").observe(time.perf_counter() - started)
+        ACK_BATCH_SIZE.labels("router").observe(1)
+    
+    async def _ack(
+        self,
+        stream: str,
+        consumer_group: str,
+        msg_id: str,
+        forwards: List[Tuple[str, Dict[str, Any]]]
+    ):
+        """Acknowledge an entry, forwarding it first if any handler asked to"""
+        if not forwards:
+            await self.redis.xack(stream, consumer_group, msg_id)
+            return
+        forwards = [
+            (self.partitioner.route(target, fields), fields) for target, fields in forwards
+        ]
+        keys = [stream] + [target for target, _ in forwards]
+        if not is_cluster(self.redis) or len(group_by_slot(keys)) == 1:
+            await self.functions.ack_and_forward(
+                stream, consumer_group, msg_id, forwards, max_length=self.max_length
+            )
+            return
+        # Forwarding across slots can't be one call; write before acking
+        pipe = self.redis.pipeline(transaction=False)
+        for target, fields in forwards:
+            if self.max_length:
+                pipe.xadd(target, fields, maxlen=self.max_length, approximate=True)
+            else:
+                pipe.xadd(target, fields)
+        await pipe.execute()
+        await self.redis.xack(stream, consumer_group, msg_id)
+    
+    async def _handle(
+        self,
+        stream_name: str,
+        consumer_group: str,
+        coalescer: Optional[Coalescer],
+        stream: str,
+        msg_id: str,
+        data: Dict[str, Any]
+    ):
+        """Deliver an entry, or hand it to the stream's coalescer"""
+        if coalescer is None:
+            await self._deliver(stream_name, consumer_group, stream, msg_id, data)
+            return
+        ready, superseded = coalescer.offer(stream, msg_id, data, time.monotonic())
+        for old_stream, old_id in superseded:
+            await self.redis.xack(old_stream, consumer_group, old_id)
+            EVENTS_COALESCED.labels(stream_name, consumer_group).inc()
+            ACK_BATCH_SIZE.labels("router").observe(1)
+        if ready:
+            await self._deliver(stream_name, consumer_group, *ready)
+
+    async def _release(self, stream_name: str, consumer_group: str, coalescer: Coalescer):
+        """Deliver held events whose window closed, then ack what they merged"""
+        for stream, msg_id, data in coalescer.due(time.monotonic()):
+            await self._deliver(stream_name, consumer_group, stream, msg_id, data)
+            merged = coalescer.take_merged(stream, msg_id)
+            if merged:
+                await self.redis.xack(stream, consumer_group, *merged)
+                EVENTS_COALESCED.labels(stream_name, consumer_group).inc(len(merged))
+                ACK_BATCH_SIZE.labels("router").observe(len(merged))
+
+    async def _recover(
+        self,
+        stream_name: str,
+        consumer_group: str,
+        consumer_name: str,
+        partitions: List[str],
+        coalescer: Optional[Coalescer]
+    ):
+        """Re-read this consumer's pending entries, e.g. held when it last stopped"""
+        for key in partitions:
+            cursor = "0"
+            while True:
+                reply = await self.redis.xreadgroup(
+                    consumer_group, consumer_name, {key: cursor}, count=100
+                )
+                msgs = [msg for _, stream_msgs in reply or [] for msg in stream_msgs]
+                if not msgs:
+                    break
+                for msg_id, data in msgs:
+                    if data:
+                        await self._handle(
+                            stream_name, consumer_group, coalescer, key, msg_id, data
+                        )
+                    else:
+                        # Trimmed while pending; nothing left to deliver
+                        await self.redis.xack(key, consumer_group, msg_id)
+                cursor = msgs[-1][0]
+
     async def start_consuming(
         self,
         stream_name: str,
         consumer_group: str,
-        consumer_name: str
+        consumer_name: str,
+        filters: Optional[Filters] = None,
+        consumer_index: int = 0,
+        consumer_count: int = 1
     ):
-        """Start consuming from stream"""
+        """
+        Start consuming from stream (only entries matching `filters`, if given)
+        
+        A partitioned stream is split between `consumer_count` consumers;
+        this one reads the partitions at `consumer_index`. Each partition
+        has a single reader, so per-key order is kept. Entries this consumer
+        left pending (held for coalescing, or mid-delivery) are re-read first.
+        """
+        partitions = self.partitioner.assign(stream_name, consumer_index, consumer_count)
+        if not partitions:
+            return  # More consumers than partitions
+        reader = FilteredReader(self.redis, count=10, block_ms=1000) if filters else None
+        # A cluster can't XREADGROUP across slots, so read each slot's keys separately
+        key_groups = group_by_slot(partitions) if is_cluster(self.redis) else [partitions]
+        coalescer = None
+        if stream_name in self.coalescing:
+            coalescer = Coalescer(**self.coalescing[stream_name])
+            self._coalescers[f"{stream_name}:{consumer_group}"] = coalescer
+        try:
+            await self._recover(stream_name, consumer_group, consumer_name, partitions, coalescer)
+        except asyncio.CancelledError:
+            return
+        except Exception as e:
+            print(f"Pending recovery error: {e}")
         while True:
             try:
-                messages = await self.redis.xreadgroup(
-                    consumer_group,
-                    consumer_name,
-                    {stream_name: ">"},
-                    count=10,
-                    block=1000
-                )
+                block_ms = 1000
+                deadline = coalescer.next_deadline() if coalescer else None
+                if deadline is not None:
+                    # Wake in time to release held events (BLOCK 0 would wait forever)
+                    block_ms = max(1, min(block_ms, int((deadline - time.monotonic()) * 1000)))
+                if reader:
+                    # Non-matching entries are acked inside Redis and never fetched
+                    batches = await asyncio.gather(*(
+                        reader.read(key, consumer_group, consumer_name, filters, block_ms=block_ms)
+                        for key in partitions
+                    ))
+                    # Each entry carries the key it was read from
+                    entries = [entry for batch in batches for entry in batch]
+                else:
+                    replies = await asyncio.gather(*(
+                        self.redis.xreadgroup(
+                            consumer_group,
+                            consumer_name,
+                            {key: ">" for key in keys},
+                            count=10,
+                            block=block_ms
+                        )
+                        for keys in key_groups
+                    ))
+                    entries = [
+                        (stream, msg_id, data)
+                        for reply in replies for stream, msgs in reply for msg_id, data in msgs
+                    ]
                 
-                for stream, msgs in messages:
-                    for msg_id, data in msgs:
-                        # Route to handlers
-                        if stream_name in self.handlers:
-                            for handler_info in self.handlers[stream_name]:
-                                try:
-                                    await handler_info["handler"](data)
-                                except Exception as e:
-                                    print(f"Handler error: {e}")
-                        
-                        # Acknowledge
-                        await self.redis.xack(stream_name, consumer_group, msg_id)
+                for stream, msg_id, data in entries:
+                    await self._handle(stream_name, consumer_group, coalescer, stream, msg_id, data)
+                
+                if coalescer:
+                    await self._release(stream_name, consumer_group, coalescer)
             
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 print(f"Consumption error: {e}")
                 await asyncio.sleep(1)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Router metrics: coalescing per stream and consumer group"""
+        return {
+            "coalescing": {name: c.stats() for name, c in self._coalescers.items()}
+        }
 
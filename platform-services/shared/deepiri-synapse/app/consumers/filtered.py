@@ -0,0 +1,231 @@
+"""
+Filtered consumer-group reads for Synapse
+Filters are evaluated inside Redis so only matching entries leave the server
+"""
+import asyncio
+import time
+import redis.asyncio as redis
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..connection import group_by_slot, is_cluster
+from ..schemas.registry import SchemaRegistry
+from ..streams.filters import Filters
+from ..streams.partitions import StreamPartitioner
+
+# (stream key, entry ID, fields); the key tells which partition to ack on
+KeyedEntry = Tuple[str, str, Dict[str, Any]]
+
+# KEYS[1] stream; ARGV group, consumer, count, field count, then per field:
+# name, value count, values... Reads new entries for the consumer, acks the
+# ones that don't match and returns {newest stream ID, scanned, matches...}.
+FILTERED_READ_SCRIPT = """
+local group, consumer, count = ARGV[1], ARGV[2], tonumber(ARGV[3])
+local filters, pos = {}, 5
+for _ = 1, tonumber(ARGV[4]) do
+    local name, accepted = ARGV[pos], {}
+    for i = 1, tonumber(ARGV[pos + 1]) do
+        accepted[ARGV[pos + 1 + i]] = true
+    end
+    filters[name] = accepted
+    pos = pos + 2 + tonumber(ARGV[pos + 1])
+end
+
+local reply = redis.call('XREADGROUP', 'GROUP', group, consumer,
+    'COUNT', count, 'STREAMS', KEYS[1], '>')
+local entries = (reply and reply[1]) and reply[1][2] or {}
+local matched, skipped = {}, {}
+for _, entry in ipairs(entries) do
+    local fields = {}
+    for i = 1, #entry[2], 2 do
+        fields[entry[2][i]] = entry[2][i + 1]
+    end
+    local ok = true
+    for name, accepted in pairs(filters) do
+        if fields[name] == nil or not accepted[fields[name]] then
+            ok = false
+            break
+        end
+    end
+    if ok then
+        matched[#matched + 1] = entry
+    else
+        skipped[#skipped + 1] = entry[1]
+    end
+end
+if #skipped > 0 then
+    redis.call('XACK', KEYS[1], group, unpack(skipped))
+end
+
+local newest = redis.call('XREVRANGE', KEYS[1], '+', '-', 'COUNT', 1)
+local result = {newest[1] and newest[1][1] or '0-0', #entries}
+for _, entry in ipairs(matched) do
+    result[#result + 1] = entry
+end
+return result
+"""
+
+
+def encode_filters(filters: Filters) -> List[str]:
+    """Flatten a filter map into the script's ARGV layout"""
+    args = [str(len(filters))]
+    for name, accepted in filters.items():
+        args.extend([name, str(len(accepted)), *sorted(accepted)])
+    return args
+
+
+def _text(value: Any) -> Any:
+    return value.decode("utf-8", "replace") if isinstance(value, bytes) else value
+
+
+class FilteredReader:
+    """
+    Consumer-group reads that only return entries matching a filter
+
+    Non-matching entries are acknowledged inside the same script call, so
+    they never reach the network or sit in the pending list. Matching
+    entries stay pending until the consumer acknowledges them. Partitioned
+    streams are read partition by partition, starting from a different
+    one on each call so a backlog on one can't starve the others.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        count: int = 100,
+        block_ms: int = 5000,
+        schema_registry: Optional[SchemaRegistry] = None,
+        partitioner: Optional[StreamPartitioner] = None,
+        max_groups: int = 20
+    ):
+        """
+        Initialize filtered reader
+
+        With a schema registry, returned entries are upcast to the latest
+        version of their schema (filters match the stored fields).
+        `max_groups` caps the consumer groups ensure_group will leave on a
+        stream key.
+        """
+        self.redis = redis_client
+        self.count = count
+        self.block_ms = block_ms
+        self.schema_registry = schema_registry
+        self.partitioner = partitioner or StreamPartitioner()
+        self.max_groups = max_groups
+        self._script = redis_client.register_script(FILTERED_READ_SCRIPT)
+        self._rotation: Dict[str, int] = {}
+        self.scanned = 0
+        self.matched = 0
+
+    async def ensure_group(self, stream_name: str, group_name: str, start_id: str = "$"):
+        """
+        Create the consumer group on every partition if it doesn't exist yet
+
+        Streams are never created here; the stream must already exist.
+
+        Raises:
+            ValueError: If the group is new and a key already has `max_groups` groups
+        """
+        for key in self.partitioner.partitions(stream_name):
+            groups = [_text(g["name"]) for g in await self.redis.xinfo_groups(key)]
+            if group_name in groups:
+                continue
+            if len(groups) >= self.max_groups:
+                raise ValueError(
+                    f"Stream '{key}' already has {len(groups)} consumer groups "
+                    f"(limit {self.max_groups})"
+                )
+            try:
+                await self.redis.xgroup_create(key, group_name, id=start_id)
+            except redis.ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+
+    async def read(
+        self,
+        stream_name: str,
+        group_name: str,
+        consumer_name: str,
+        filters: Filters,
+        count: Optional[int] = None,
+        block_ms: Optional[int] = None
+    ) -> List[KeyedEntry]:
+        """
+        Read up to `count` matching entries, waiting up to `block_ms` for one
+
+        Scripts can't block, so when the group has caught up this waits on
+        XREAD from the newest ID the script saw on each key; any later entry
+        wakes it.
+        """
+        count = count or self.count
+        block_ms = self.block_ms if block_ms is None else block_ms
+        deadline = time.monotonic() + block_ms / 1000
+        encoded = encode_filters(filters)
+        entries: List[KeyedEntry] = []
+
+        keys = self.partitioner.partitions(stream_name)
+        offset = self._rotation.get(stream_name, 0) % len(keys)
+        self._rotation[stream_name] = offset + 1
+        keys = keys[offset:] + keys[:offset]
+
+        while True:
+            newest: Dict[str, str] = {}
+            caught_up = True
+            for key in keys:
+                wanted = count - len(entries)
+                if wanted <= 0:
+                    break
+                result = await self._script(
+                    keys=[key], args=[group_name, consumer_name, wanted, *encoded]
+                )
+                newest[key], scanned = _text(result[0]), int(result[1])
+                self.scanned += scanned
+                for entry_id, flat in result[2:]:
+                    fields = {_text(flat[i]): _text(flat[i + 1]) for i in range(0, len(flat), 2)}
+                    if self.schema_registry:
+                        fields = self.schema_registry.upcast_fields(fields)
+                    entries.append((key, _text(entry_id), fields))
+                    self.matched += 1
+                caught_up = caught_up and scanned < wanted
+
+            if len(entries) >= count or (entries and caught_up):
+                return entries
+            if not caught_up and time.monotonic() < deadline:
+                continue  # Backlog left to scan
+            if entries:
+                return entries
+            remaining_ms = int((deadline - time.monotonic()) * 1000)
+            if remaining_ms <= 0:
+                return []
+            await self._wait(newest, remaining_ms)
+
+    async def _wait(self, newest: Dict[str, str], block_ms: int):
+        """Block until any key gets an entry past `newest` (per slot on a cluster)"""
+        # A cluster can't XREAD across slots; partitions deliberately span them
+        key_groups = group_by_slot(newest) if is_cluster(self.redis) else [list(newest)]
+        if len(key_groups) == 1:
+            await self.redis.xread(newest, count=1, block=block_ms)
+            return
+        waits = [
+            asyncio.create_task(
+                self.redis.xread({key: newest[key] for key in keys}, count=1, block=block_ms)
+            )
+            for keys in key_groups
+        ]
+        done, pending = await asyncio.wait(waits, return_when=asyncio.FIRST_COMPLETED)
+        for wait in pending:
+            wait.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for wait in done:
+            wait.result()
+
+    async def ack(self, stream_name: str, group_name: str, *entry_ids: str) -> int:
+        """Acknowledge delivered entries"""
+        return await self.redis.xack(stream_name, group_name, *entry_ids)
+
+    def stats(self) -> Dict[str, Any]:
+        """Filtered read metrics for the metrics endpoint"""
+        return {
+            "scanned": self.scanned,
+            "matched": self.matched,
+            "acked_unmatched": self.scanned - self.matched,
+        }
@@ -31,6 +31,12 @@ class ModelReadyEvent(BaseEvent):
     artifacts: Optional[List[str]] = None
 
 
+class ModelLoadedEvent(BaseEvent):
+    event: Literal["model-loaded"]
+    version: str
+    load_time_ms: Optional[float] = None
+
+
 class InferenceEvent(BaseEvent):
     event: Literal["inference"]
     input: Dict[str, Any]
@@ -77,6 +83,7 @@ class AGIDecisionEvent(BaseEvent):
 __all__ = [
     "BaseEvent",
     "ModelReadyEvent",
+    "ModelLoadedEvent",
     "InferenceEvent",
     "TrainingEvent",
     "PlatformEvent",
@@ -2,27 +2,108 @@
 Deepiri Synapse - Central Event Streaming Hub
 Manages Redis Streams and provides monitoring/management API
 """
-from fastapi import FastAPI
-from typing import Dict, Any, List
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel
+from typing import Dict, Any, List, Optional
 import redis.asyncio as redis
-import os
+from redis.exceptions import RedisClusterException
 import asyncio
 import logging
+import time
+from .config import Settings
+from .connection import create_redis_client, create_replica_clients
+from .consumers.filtered import FilteredReader
+from .replicas import ReplicaRouter
+from .responses import (
+    CompressionMiddleware,
+    ORJSONResponse,
+    cached_json,
+    dumps,
+    entry_body,
+    json_line,
+)
+from .storage.blob import blob_store_from_url
+from .storage.claim_check import ClaimCheck
+from .streams.archiver import StreamArchiver
+from .streams.browser import MessageBrowser, PageQuery, PageState
+from .streams.filters import parse_filter
+from .streams.functions import StreamFunctions
+from .streams.ids import parse_position
+from .streams.indexer import StreamIndexer
 from .streams.manager import StreamManager
+from .streams.partitions import StreamPartitioner, parse_partition_specs
+from .streams.memory_pressure import MemoryPressureController
+from .streams.replay import ReplayService
+from .streams.retention import RetentionPolicy, RetentionScheduler, parse_retention_policies
+from .streams.splitter import StreamSplitter, parse_split_streams
+from .streams.tail import TailHub
+from .monitoring.backpressure import BackpressureMonitor
+from .monitoring.group_analytics import GroupAnalytics
 from .monitoring.metrics_collector import MetricsCollector
+from .monitoring.prometheus import (
+    ACK_BATCH_SIZE,
+    EVENTS_CONSUMED,
+    GROUP_LAG,
+    GROUP_OLDEST_PENDING,
+    GROUP_PENDING,
+    REDIS_RTT,
+    STREAM_LENGTH,
+    registry,
+)
+from .producers.batch_ingestor import BatchIngestor, parse_events
+from .producers.idempotency import DedupWindow
+from .schemas.registry import SchemaCompatibilityError
+from .schemas.sampling import ValidationPolicy, parse_policies
+from .schemas.validators import (
+    configure_validation,
+    install_upcaster_modules,
+    sampling_validator,
+    schema_registry,
+)
 
 logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="Deepiri Synapse",
     description="Central streaming service for event-driven architecture",
-    version="0.1.0"
+    version="0.1.0",
+    default_response_class=ORJSONResponse
+)
+
+# Compression thresholds are read at import; middleware can't be added after startup
+_compression = Settings.from_env()
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=_compression.compression_min_size,
+    gzip_level=_compression.compression_gzip_level,
+    brotli_quality=_compression.compression_brotli_quality
 )
 
 # Redis connection (shared with services)
+settings: Settings = None
 redis_client: redis.Redis = None
+# Bytes-mode client for pass-through reads (replay, tail, archive)
+raw_redis_client: redis.Redis = None
+# Monitoring and browse reads (routed to replicas when configured)
+read_client: redis.Redis = None
+replica_router: ReplicaRouter = None
+group_analytics: GroupAnalytics = None
 stream_manager: StreamManager = None
 metrics_collector: MetricsCollector = None
+backpressure_monitor: BackpressureMonitor = None
+batch_ingestor: BatchIngestor = None
+stream_archiver: StreamArchiver = None
+retention_scheduler: RetentionScheduler = None
+memory_pressure_controller: MemoryPressureController = None
+replay_service: ReplayService = None
+message_browser: MessageBrowser = None
+tail_hub: TailHub = None
+filtered_reader: FilteredReader = None
+stream_splitter: StreamSplitter = None
+stream_indexer: StreamIndexer = None
+stream_functions: StreamFunctions = None
+claim_check: ClaimCheck = None
 
 
 async def wait_for_redis(
@@ -46,7 +127,7 @@ async def wait_for_redis(
             await redis_client.ping()
             logger.info(f"✓ Redis connection established (attempt {attempt + 1})")
             return True
-        except (redis.ConnectionError, ConnectionRefusedError, OSError) as e:
+        except (redis.ConnectionError, RedisClusterException, ConnectionRefusedError, OSError) as e:
             if attempt < max_retries - 1:
                 delay = retry_delay * (2 ** min(attempt, 5))  # Exponential backoff, max 32s
                 logger.warning(
@@ -66,40 +147,226 @@ async def wait_for_redis(
 @app.on_event("startup")
 async def startup():
     """Initialize Redis connection and managers"""
-    global redis_client, stream_manager, metrics_collector
-    redis_host = os.getenv("REDIS_HOST", "redis")
-    redis_port = int(os.getenv("REDIS_PORT", "6379"))
-    redis_password = os.getenv("REDIS_PASSWORD", "redispassword")
+    global settings, redis_client, raw_redis_client, read_client, replica_router
+    global stream_manager, metrics_collector, group_analytics
+    global backpressure_monitor, batch_ingestor, retention_scheduler, memory_pressure_controller
+    global stream_archiver, replay_service, message_browser, tail_hub
+    global filtered_reader, stream_splitter, stream_indexer, stream_functions, claim_check
+    settings = Settings.from_env()
     
-    logger.info(f"Connecting to Redis at {redis_host}:{redis_port}...")
+    logger.info(f"Connecting to Redis at {settings.redis_host}:{settings.redis_port}...")
     
-    redis_client = redis.Redis(
-        host=redis_host,
-        port=redis_port,
-        password=redis_password,
-        decode_responses=True
-    )
+    redis_client = create_redis_client(settings)
     
     # Wait for Redis to be ready with retry logic
     if not await wait_for_redis(redis_client):
         raise RuntimeError("Failed to connect to Redis. Please ensure Redis is running and accessible.")
+    raw_redis_client = create_redis_client(settings, decode_responses=False)
+    read_client = redis_client
+    replicas = create_replica_clients(settings)
+    if replicas:
+        replica_router = ReplicaRouter(
+            redis_client,
+            replicas,
+            max_staleness_seconds=settings.replica_max_staleness_seconds,
+            check_interval_seconds=settings.replica_check_interval_seconds
+        )
+        replica_router.start()
+        read_client = replica_router.reader
+        logger.info(f"Routing monitoring reads to replicas: {', '.join(replicas)}")
     
     # Initialize managers
     logger.info("Initializing stream manager and metrics collector...")
-    stream_manager = StreamManager(redis_client)
-    metrics_collector = MetricsCollector(redis_client)
+    partitioner = StreamPartitioner(parse_partition_specs(settings.stream_partitions))
+    stream_manager = StreamManager(redis_client, partitioner=partitioner, reader=read_client)
+    metrics_collector = MetricsCollector(read_client, partitioner=partitioner)
+    group_analytics = GroupAnalytics(
+        read_client,
+        partitioner=partitioner,
+        cache_seconds=settings.group_analytics_cache_seconds,
+        history_size=settings.group_analytics_history_size
+    )
+    backpressure_monitor = BackpressureMonitor(
+        redis_client,
+        max_lag=settings.backpressure_max_lag,
+        max_memory_ratio=settings.backpressure_max_memory_ratio,
+        retry_after_seconds=settings.backpressure_retry_after_seconds,
+        check_interval_seconds=settings.backpressure_check_interval_seconds,
+        partitioner=partitioner
+    )
+    stream_functions = StreamFunctions(redis_client)
+    index_streams = [n.strip() for n in settings.index_streams.split(",") if n.strip()]
+    stream_indexer = StreamIndexer(
+        redis_client,
+        [f.strip() for f in settings.index_fields.split(",") if f.strip()],
+        streams=[
+            key for n in index_streams or stream_manager.streams
+            for key in partitioner.partitions(n)
+        ]
+    )
+    if settings.claim_check_url:
+        claim_check = ClaimCheck(
+            blob_store_from_url(settings.claim_check_url),
+            threshold_bytes=settings.claim_check_threshold_bytes
+        )
+    # With the retention scheduler on, writes skip the per-XADD MAXLEN trim
+    publish_max_length = None if settings.retention_enabled else settings.stream_max_length
+    batch_ingestor = BatchIngestor(
+        redis_client,
+        max_length=publish_max_length,
+        partitioner=partitioner,
+        indexer=stream_indexer,
+        functions=stream_functions,
+        dedup=DedupWindow(settings.dedup_window_seconds),
+        claim_check=claim_check
+    )
+    message_browser = MessageBrowser(
+        read_client,
+        batch_size=settings.browse_batch_size,
+        schema_registry=schema_registry,
+        partitioner=partitioner
+    )
+    filtered_reader = FilteredReader(
+        redis_client,
+        schema_registry=schema_registry,
+        partitioner=partitioner,
+        max_groups=settings.consume_max_groups
+    )
+    tail_hub = TailHub(
+        raw_redis_client,
+        block_ms=settings.tail_block_ms,
+        queue_size=settings.tail_queue_size,
+        overflow=settings.tail_overflow_policy,
+        schema_registry=schema_registry,
+        partitioner=partitioner
+    )
     
     # Ensure streams exist
     await stream_manager.ensure_streams_exist()
+    await stream_functions.load()
+    await stream_indexer.load()
+
+    # Load schema versions registered by other Synapse instances
+    await schema_registry.attach(redis_client)
+    install_upcaster_modules(
+        [m.strip() for m in settings.schema_upcaster_modules.split(",") if m.strip()]
+    )
+    if settings.schema_refresh_seconds > 0:
+        schema_registry.start(settings.schema_refresh_seconds)
+    configure_validation(
+        parse_policies(settings.validation_policies),
+        ValidationPolicy.parse(settings.validation_default_policy)
+    )
+
+    if settings.archive_enabled:
+        stream_archiver = StreamArchiver(
+            raw_redis_client,
+            blob_store_from_url(settings.archive_url),
+            streams=[
+                key for n in settings.archive_streams.split(",") if n.strip()
+                for key in partitioner.partitions(n.strip())
+            ],
+            chunk_size=settings.archive_chunk_size,
+            segment_max_entries=settings.archive_segment_max_entries
+        )
+
+    replay_service = ReplayService(
+        raw_redis_client,
+        archiver=stream_archiver,
+        batch_size=settings.replay_batch_size,
+        max_rate=settings.replay_max_rate or None,
+        schema_registry=schema_registry,
+        partitioner=partitioner
+    )
+
+    stream_policies = {
+        stream: RetentionPolicy(
+            max_age_seconds=settings.retention_default_max_age_seconds or None,
+            max_length=settings.stream_max_length
+        )
+        for stream in stream_manager.streams
+    }
+    stream_policies.update(parse_retention_policies(settings.retention_policies))
+
+    if settings.retention_enabled:
+        # Limits are per logical stream; each partition gets its share
+        policies = {
+            key: policy.split(len(partitioner.partitions(stream)))
+            for stream, policy in stream_policies.items()
+            for key in partitioner.partitions(stream)
+        }
+        retention_scheduler = RetentionScheduler(
+            stream_manager,
+            policies,
+            interval_seconds=settings.retention_interval_seconds,
+            jitter_seconds=settings.retention_jitter_seconds,
+            archiver=stream_archiver,
+            indexer=stream_indexer
+        )
+        retention_scheduler.start()
+
+    if settings.memory_pressure_enabled:
+        memory_pressure_controller = MemoryPressureController(
+            stream_manager,
+            priority_order=[
+                key for n in settings.memory_pressure_priority.split(",") if n.strip()
+                for key in partitioner.partitions(n.strip())
+            ],
+            soft_ratio=settings.memory_pressure_soft_ratio,
+            hard_ratio=settings.memory_pressure_hard_ratio,
+            keep_fraction=settings.memory_pressure_keep_fraction,
+            min_length=settings.memory_pressure_min_length,
+            interval_seconds=settings.memory_pressure_interval_seconds,
+            archiver=stream_archiver,
+            indexer=stream_indexer
+        )
+        memory_pressure_controller.start()
+
+    if settings.split_streams:
+        def retain_derived(derived: str, source: str):
+            # Derived streams use their own RETENTION_POLICIES entry, else the source's
+            policy = stream_policies.get(derived) or stream_policies.get(source)
+            if retention_scheduler and policy:
+                retention_scheduler.policies.setdefault(derived, policy)
+
+        stream_splitter = StreamSplitter(
+            redis_client,
+            parse_split_streams(settings.split_streams),
+            partitioner=partitioner,
+            mode=settings.split_mode,
+            max_types=settings.split_max_types,
+            max_length=publish_max_length,
+            on_new_stream=retain_derived
+        )
+        stream_splitter.start()
+    if settings.group_analytics_interval_seconds > 0:
+        group_analytics.start(stream_manager.streams, settings.group_analytics_interval_seconds)
     logger.info("✓ Synapse startup complete")
 
 
 @app.on_event("shutdown")
 async def shutdown():
-    """Close Redis connection"""
-    global redis_client
+    """Stop background tasks and close Redis connection"""
+    global redis_client, raw_redis_client
+    if tail_hub:
+        await tail_hub.stop()
+    if stream_splitter:
+        await stream_splitter.stop()
+    if replay_service:
+        await replay_service.stop()
+    if retention_scheduler:
+        await retention_scheduler.stop()
+    if memory_pressure_controller:
+        await memory_pressure_controller.stop()
+    if group_analytics:
+        await group_analytics.stop()
+    await schema_registry.stop()
+    if replica_router:
+        await replica_router.stop()
     if redis_client:
         await redis_client.close()
+    if raw_redis_client:
+        await raw_redis_client.close()
 
 
 @app.get("/health")
@@ -113,47 +380,584 @@ async def health():
 
 
 @app.get("/streams")
-async def list_streams():
+async def list_streams(request: Request):
     """List all active streams with statistics"""
     stats = await stream_manager.get_all_stream_stats()
-    return {"streams": stats}
+    return cached_json(request, {"streams": stats})
 
 
 @app.get("/streams/{stream_name}/info")
-async def stream_info(stream_name: str):
+async def stream_info(stream_name: str, request: Request):
     """Get stream information"""
     try:
-        info = await redis_client.xinfo_stream(stream_name)
-        return dict(info)
+        info = await read_client.xinfo_stream(stream_name)
+        return cached_json(request, dict(info))
     except Exception as e:
         return {"error": str(e)}
 
 
+@app.get("/streams/{stream_name}/groups")
+async def stream_groups(stream_name: str, request: Request):
+    """
+    Consumer group health: lag, pending entries and consumers per group
+
+    Each group reports its lag and pending count (summed over partitions),
+    the age of its oldest pending entry, each consumer's idle time and
+    pending count, and the lag trend (growing, draining or steady) with an
+    estimated time to drain from recent samples.
+    """
+    return cached_json(request, await group_analytics.report(stream_name))
+
+
 @app.get("/streams/{stream_name}/messages")
-async def get_messages(stream_name: str, count: int = 10):
-    """Get recent messages from stream"""
+async def get_messages(
+    stream_name: str,
+    count: int = Query(10, ge=1, le=1000000),
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    cursor: Optional[str] = None,
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    filter: Optional[str] = None,
+    fields: Optional[str] = None,
+    stream: Optional[bool] = None
+):
+    """
+    Get messages from stream, newest first by default
+
+    `start`/`end` bound the range (stream IDs, epoch ms or ISO dates),
+    `cursor` is the `next_cursor` of the previous page, `filter` is
+    "field=value[|value],..." and `fields` projects a comma-separated list.
+    Pages above the streaming threshold (or with stream=true) are sent as
+    NDJSON ending in a {"next_cursor": ...} line.
+    """
     try:
-        messages = await redis_client.xrevrange(stream_name, count=count)
+        query = PageQuery(
+            stream_name=stream_name,
+            count=count,
+            start_id=parse_position(start),
+            end_id=parse_position(end, end=True),
+            cursor=cursor,
+            descending=order == "desc",
+            filters=parse_filter(filter),
+            fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        )
+        if cursor:
+            stream_manager.partitioner.parse_cursor(stream_name, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    state = PageState()
+    if stream or (stream is None and count > settings.browse_stream_threshold):
+        async def body():
+            async for msg_id, data in message_browser.iter_page(query, state):
+                yield json_line({"id": msg_id, "data": data})
+            yield json_line({"next_cursor": state.next_cursor, "scanned": state.scanned})
+
+        return StreamingResponse(body(), media_type="application/x-ndjson")
+
+    try:
+        messages = [
+            {"id": msg_id, "data": data}
+            async for msg_id, data in message_browser.iter_page(query, state)
+        ]
         return {
             "stream": stream_name,
-            "messages": [
-                {"id": msg_id, "data": data}
-                for msg_id, data in messages
-            ]
+            "messages": messages,
+            "next_cursor": state.next_cursor
         }
     except Exception as e:
         return {"error": str(e)}
 
 
+def _tail_params(stream_name: str, filter_spec: Optional[str], last_id: Optional[str]):
+    """Parse tail filter and check the resume cursor, mapping bad input to HTTP 400"""
+    try:
+        if last_id:
+            stream_manager.partitioner.parse_cursor(stream_name, last_id)
+        return parse_filter(filter_spec), last_id
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/streams/{stream_name}/tail")
+async def tail_stream(
+    stream_name: str,
+    request: Request,
+    filter: Optional[str] = None,
+    last_id: Optional[str] = None,
+    overflow: Optional[str] = Query(None, pattern="^(drop|disconnect)$")
+):
+    """
+    Follow new entries as server-sent events
+
+    `filter` is "field=value[|value],...". Each event's id is a resume
+    cursor (per partition on a partitioned stream); `last_id` (or the
+    Last-Event-ID header on reconnect) resumes after it. A client whose queue
+    fills either loses its oldest entries or, with overflow=disconnect,
+    receives an "overflow" event and is disconnected.
+    """
+    if stream_name not in stream_manager.streams:
+        raise HTTPException(status_code=404, detail=f"Unknown stream '{stream_name}'")
+    filters, resume_after = _tail_params(
+        stream_name, filter, last_id or request.headers.get("last-event-id")
+    )
+
+    async def body():
+        subscriber = await tail_hub.subscribe(stream_name, filters, resume_after, overflow)
+        try:
+            async for entry in tail_hub.events(subscriber, settings.tail_heartbeat_seconds):
+                if entry is None:
+                    yield b": keepalive\n\n"
+                    continue
+                entry_id, data = entry
+                yield b"id: %s\ndata: %s\n\n" % (
+                    tail_hub.cursor(subscriber).encode(), dumps(entry_body(entry_id, data))
+                )
+            if subscriber.overflowed:
+                yield b"event: overflow\ndata: {}\n\n"
+        finally:
+            await tail_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.websocket("/streams/{stream_name}/tail/ws")
+async def tail_stream_ws(
+    websocket: WebSocket,
+    stream_name: str,
+    filter: Optional[str] = None,
+    last_id: Optional[str] = None,
+    overflow: Optional[str] = None
+):
+    """WebSocket equivalent of /tail: one JSON text frame per entry, with its resume cursor"""
+    if stream_name not in stream_manager.streams:
+        await websocket.close(code=1008, reason=f"Unknown stream '{stream_name}'")
+        return
+    try:
+        subscriber = await tail_hub.subscribe(stream_name, parse_filter(filter), last_id, overflow)
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    await websocket.accept()
+
+    async def send_entries():
+        async for entry_id, data in tail_hub.events(subscriber):
+            body = {**entry_body(entry_id, data), "cursor": tail_hub.cursor(subscriber)}
+            await websocket.send_text(dumps(body).decode())
+        if subscriber.overflowed:
+            await websocket.close(code=1013, reason="Client too slow")
+
+    async def wait_for_disconnect():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    tasks = [asyncio.create_task(send_entries()), asyncio.create_task(wait_for_disconnect())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+        await tail_hub.unsubscribe(subscriber)
+
+
+@app.get("/streams/{stream_name}/groups/{group_name}/consume")
+async def consume_filtered(
+    stream_name: str,
+    group_name: str,
+    consumer: str,
+    filter: Optional[str] = None,
+    count: int = Query(100, ge=1, le=1000),
+    block_ms: int = Query(5000, ge=0, le=30000),
+    start: str = "$"
+):
+    """
+    Read a consumer group's next entries that match `filter`
+
+    Filtering runs in a Redis script: non-matching entries are acked there
+    and never sent. Returned entries stay pending until acked through
+    /ack. The group is created at `start` if it doesn't exist. Messages
+    from a partitioned stream carry the partition to acknowledge them on.
+    """
+    if stream_name not in stream_manager.streams:
+        raise HTTPException(status_code=404, detail=f"Unknown stream '{stream_name}'")
+    try:
+        filters = parse_filter(filter)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        await filtered_reader.ensure_group(stream_name, group_name, start)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    entries = await filtered_reader.read(
+        stream_name, group_name, consumer, filters, count=count, block_ms=block_ms
+    )
+    EVENTS_CONSUMED.labels(stream_name, group_name).inc(len(entries))
+    partitioned = stream_manager.partitioner.is_partitioned(stream_name)
+    return {
+        "stream": stream_name,
+        "group": group_name,
+        "messages": [
+            {"id": entry_id, "data": data, **({"partition": key} if partitioned else {})}
+            for key, entry_id, data in entries
+        ]
+    }
+
+
+class AckRequest(BaseModel):
+    """Entry IDs to acknowledge for a consumer group (and their partition, if partitioned)"""
+    ids: List[str]
+    partition: Optional[str] = None
+
+
+@app.post("/streams/{stream_name}/groups/{group_name}/ack")
+async def ack_entries(stream_name: str, group_name: str, request: AckRequest):
+    """Acknowledge entries delivered by /consume"""
+    if stream_name not in stream_manager.streams:
+        raise HTTPException(status_code=404, detail=f"Unknown stream '{stream_name}'")
+    key = request.partition or stream_name
+    if key not in stream_manager.partitioner.partitions(stream_name):
+        raise HTTPException(
+            status_code=400,
+            detail=f"'{key}' is not a partition of '{stream_name}'; pass the message's partition"
+        )
+    if not request.ids:
+        return {"acked": 0}
+    started = time.perf_counter()
+    acked = await filtered_reader.ack(key, group_name, *request.ids)
+    REDIS_RTT.labels("ack").observe(time.perf_counter() - started)
+    ACK_BATCH_SIZE.labels("http").observe(len(request.ids))
+    return {"acked": acked}
+
+
+@app.get("/index/{field}/{value}")
+async def lookup_index(
+    field: str,
+    value: str,
+    stream: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    count: int = Query(100, ge=1, le=1000),
+    order: str = Query("desc", pattern="^(asc|desc)$")
+):
+    """
+    Entries whose `field` equals `value`, across every indexed stream
+
+    Only fields listed in INDEX_FIELDS are indexed. `stream` narrows the
+    lookup to one logical stream; `start`/`end` take the same positions as
+    /messages.
+    """
+    if field not in stream_indexer.fields:
+        raise HTTPException(status_code=404, detail=f"Field '{field}' is not indexed")
+    try:
+        start_id = parse_position(start)
+        end_id = parse_position(end, end=True)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    entries = await stream_indexer.lookup(
+        field,
+        value,
+        streams=stream_manager.partitioner.partitions(stream) if stream else None,
+        start_id=start_id,
+        end_id=end_id,
+        count=count,
+        descending=order == "desc"
+    )
+    return {
+        "field": field,
+        "value": value,
+        "messages": [
+            {"stream": stream_key, "id": entry_id, "data": data}
+            for stream_key, entry_id, data in entries
+        ]
+    }
+
+
+@app.post("/streams/{stream_name}/events")
+async def publish_events(stream_name: str, request: Request):
+    """
+    Publish a batch of events to a stream
+
+    Accepts a JSON array (or single object) or an NDJSON body. Events are
+    validated individually and written with one pipelined XADD batch.
+    Retries of an event with an idempotency key are reported as duplicates
+    with the original ID instead of being written again.
+    """
+    if stream_name not in stream_manager.streams:
+        raise HTTPException(status_code=404, detail=f"Unknown stream '{stream_name}'")
+
+    signal = await backpressure_monitor.check(stream_name)
+    if signal is not None:
+        return JSONResponse(
+            status_code=429,
+            content={"error": "backpressure", "reason": signal.reason},
+            headers={"Retry-After": str(signal.retry_after_seconds)}
+        )
+
+    try:
+        events = parse_events(await request.body(), request.headers.get("content-type"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(events) > settings.ingest_max_batch:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(events)} events exceeds limit of {settings.ingest_max_batch}"
+        )
+
+    results = await batch_ingestor.ingest(
+        stream_name, events, producer=request.headers.get("x-producer-id")
+    )
+    accepted = sum(1 for r in results if "id" in r and not r.get("duplicate"))
+    duplicates = sum(1 for r in results if r.get("duplicate"))
+    return {
+        "stream": stream_name,
+        "accepted": accepted,
+        "duplicates": duplicates,
+        "rejected": len(results) - accepted - duplicates,
+        "results": results
+    }
+
+
+class ReplayRequest(BaseModel):
+    """Programmatic replay of a range into another stream"""
+    target_stream: str
+    target_group: Optional[str] = None
+    start: Optional[str] = None
+    end: Optional[str] = None
+    filter: Optional[str] = None
+    rate: Optional[float] = None
+
+
+def _replay_range(start: Optional[str], end: Optional[str], filter_spec: Optional[str]):
+    """Parse replay bounds and filter, mapping bad input to HTTP 400"""
+    try:
+        return parse_position(start), parse_position(end, end=True), parse_filter(filter_spec)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/streams/{stream_name}/replay")
+async def replay_stream(
+    stream_name: str,
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to"),
+    filter: Optional[str] = None,
+    rate: Optional[float] = None
+):
+    """
+    Stream a time range as NDJSON, reading archived segments then Redis
+
+    `from`/`to` accept stream IDs, epoch milliseconds or ISO dates;
+    `filter` is "field=value,field=a|b"; `rate` caps events per second.
+    """
+    if stream_name not in stream_manager.streams:
+        raise HTTPException(status_code=404, detail=f"Unknown stream '{stream_name}'")
+    start_id, end_id, filters = _replay_range(start, end, filter)
+    rate = rate if rate is not None else settings.replay_default_rate
+
+    async def body():
+        entries = replay_service.iter_events(stream_name, start_id, end_id, filters)
+        async for entry_id, data in replay_service.paced(entries, rate):
+            yield json_line(entry_body(entry_id, data))
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+@app.post("/streams/{stream_name}/replay")
+async def start_replay(stream_name: str, request: ReplayRequest):
+    """Replay a range into a target stream (and optional consumer group) in the background"""
+    for name in (stream_name, request.target_stream):
+        if name not in stream_manager.streams:
+            raise HTTPException(status_code=404, detail=f"Unknown stream '{name}'")
+    start_id, end_id, filters = _replay_range(request.start, request.end, request.filter)
+    job_id = replay_service.start_job(
+        stream_name,
+        request.target_stream,
+        start_id=start_id,
+        end_id=end_id,
+        filters=filters,
+        rate=request.rate if request.rate is not None else settings.replay_default_rate,
+        target_group=request.target_group
+    )
+    return replay_service.jobs[job_id]
+
+
+@app.get("/replays/{job_id}")
+async def replay_status(job_id: str):
+    """Get the progress of a replay job"""
+    job = replay_service.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown replay job '{job_id}'")
+    return job
+
+
+@app.delete("/replays/{job_id}")
+async def cancel_replay(job_id: str):
+    """Cancel a running replay job"""
+    if not await replay_service.cancel_job(job_id):
+        raise HTTPException(status_code=404, detail=f"No running replay job '{job_id}'")
+    return replay_service.jobs[job_id]
+
+
+async def collect_stream_lengths():
+    """Set the stream length gauges"""
+    stats = await stream_manager.get_all_stream_stats()
+    STREAM_LENGTH.clear()
+    for s in stats:
+        if "error" not in s:
+            STREAM_LENGTH.labels(s["name"]).set(s["length"])
+
+
+async def collect_group_health():
+    """Set the consumer group gauges from group analytics (cached briefly)"""
+    reports = [await group_analytics.report(name) for name in stream_manager.streams]
+    for gauge in (GROUP_LAG, GROUP_PENDING, GROUP_OLDEST_PENDING):
+        gauge.clear()
+    for report in reports:
+        for group in report["groups"]:
+            labels = (report["stream"], group["name"])
+            if group["lag"] is not None:
+                GROUP_LAG.labels(*labels).set(group["lag"])
+            GROUP_PENDING.labels(*labels).set(group["pending"])
+            age_ms = group["oldest_pending_age_ms"] or 0
+            GROUP_OLDEST_PENDING.labels(*labels).set(age_ms / 1000)
+
+
+async def measure_redis_rtt():
+    """Time a PING to the primary"""
+    started = time.perf_counter()
+    await redis_client.ping()
+    REDIS_RTT.labels("ping").observe(time.perf_counter() - started)
+
+
+registry.add_collector(collect_stream_lengths)
+registry.add_collector(collect_group_health)
+registry.add_collector(measure_redis_rtt)
+
+
+@app.get("/metrics/prometheus")
+async def prometheus_metrics():
+    """
+    Metrics in the Prometheus text format
+
+    Counters and histograms are updated in-process as events flow; stream
+    lengths, consumer group lag and Redis RTT are refreshed on each scrape.
+    """
+    await registry.collect()
+    return Response(registry.expose(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/metrics")
-async def get_metrics():
+async def get_metrics(request: Request):
     """Get streaming service metrics"""
     stats = await stream_manager.get_all_stream_stats()
+    await registry.collect()
     inference_metrics = await metrics_collector.get_inference_metrics()
+    event_counts = await stream_functions.event_counts(
+        {name: stream_manager.partitioner.partitions(name) for name in stream_manager.streams},
+        client=read_client
+    )
     
-    return {
+    return cached_json(request, {
         "total_streams": len(stats),
         "streams": {s["name"]: s for s in stats},
-        "inference_metrics": inference_metrics
+        "inference_metrics": inference_metrics,
+        "ingestion": {
+            "accepted": batch_ingestor.accepted,
+            "rejected": batch_ingestor.rejected,
+            "duplicates": batch_ingestor.duplicates,
+            "dedup": batch_ingestor.dedup.stats(),
+            "claim_check": claim_check.stats() if claim_check else None,
+            "backpressure": backpressure_monitor.stats()
+        },
+        "validation": sampling_validator.stats(),
+        "retention": retention_scheduler.stats() if retention_scheduler else None,
+        "archive": stream_archiver.stats() if stream_archiver else None,
+        "tail": tail_hub.stats(),
+        "filtered_reads": filtered_reader.stats(),
+        "split": stream_splitter.stats() if stream_splitter else None,
+        "index": stream_indexer.stats() if stream_indexer.fields else None,
+        "functions": stream_functions.stats(),
+        "replicas": replica_router.stats() if replica_router else None,
+        "event_counts": event_counts,
+        "memory_pressure": (
+            memory_pressure_controller.stats() if memory_pressure_controller else None
+        ),
+        "runtime": registry.snapshot()
+    })
+
+
+@app.get("/schemas")
+async def list_schemas(request: Request):
+    """List registered schema subjects with their latest version"""
+    await schema_registry.load()
+    return cached_json(request, {
+        "subjects": {
+            subject: {
+                "version": schema_registry.latest(subject).version,
+                "schema_id": schema_registry.latest(subject).schema_id,
+            }
+            for subject in schema_registry.subjects()
+        },
+        "cache": schema_registry.stats()
+    })
+
+
+@app.get("/upcasters")
+async def list_upcasters():
+    """List registered upcasters (declarative ones with their spec)"""
+    await schema_registry.load()
+    return {"upcasters": schema_registry.upcasters()}
+
+
+@app.post("/upcasters/{subject:path}")
+async def register_upcaster(subject: str, from_version: int, spec: Dict[str, Any]):
+    """
+    Register a declarative upcaster from `from_version` to the next version
+
+    The body is {"rename": {old: new}, "defaults": {field: value}, "drop":
+    [field]}. It is stored in Redis; events are upcast wherever they are
+    read (consume, browse, tail, replay).
+    """
+    try:
+        await schema_registry.register_declared_upcaster(subject, from_version, spec)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"subject": subject, "from_version": from_version, "spec": spec}
+
+
+@app.get("/schemas/{subject:path}")
+async def get_schema_versions(subject: str):
+    """Get all versions of a schema subject"""
+    await schema_registry.load()
+    versions = schema_registry.versions(subject)
+    if not versions:
+        raise HTTPException(status_code=404, detail=f"Unknown subject '{subject}'")
+    return {
+        "subject": subject,
+        "versions": [
+            {"version": v.version, "schema_id": v.schema_id, "fields": v.fields}
+            for v in versions
+        ]
     }
 
+
+@app.post("/schemas/{subject:path}")
+async def register_schema(subject: str, fields: Dict[str, Dict[str, Any]]):
+    """Register a new schema version for a subject"""
+    try:
+        version = await schema_registry.register(subject, fields)
+    except SchemaCompatibilityError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"subject": subject, "version": version.version, "schema_id": version.schema_id}
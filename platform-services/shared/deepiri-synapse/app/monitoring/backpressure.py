@@ -0,0 +1,102 @@
+"""
+Backpressure monitor for Synapse
+Decides when ingestion should be refused because consumers or Redis can't keep up
+"""
+import time
+import redis.asyncio as redis
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from ..connection import memory_info
+from ..streams.partitions import StreamPartitioner
+from .prometheus import CACHE_LOOKUPS
+
+
+@dataclass
+class BackpressureSignal:
+    """Why a write was refused and when to retry"""
+    reason: str
+    retry_after_seconds: int
+
+
+class BackpressureMonitor:
+    """Checks stream lag and Redis memory against thresholds (results cached briefly)"""
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        max_lag: int = 50000,
+        max_memory_ratio: float = 0.9,
+        retry_after_seconds: int = 1,
+        check_interval_seconds: float = 1.0,
+        partitioner: Optional[StreamPartitioner] = None
+    ):
+        """Initialize backpressure monitor"""
+        self.redis = redis_client
+        self.partitioner = partitioner or StreamPartitioner()
+        self.max_lag = max_lag
+        self.max_memory_ratio = max_memory_ratio
+        self.retry_after_seconds = retry_after_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self._memory: Tuple[float, float] = (0.0, 0.0)  # (checked_at, ratio)
+        self._lag: Dict[str, Tuple[float, int]] = {}
+        self.rejections = 0
+
+    async def memory_ratio(self) -> float:
+        """Fraction of maxmemory in use (0 when maxmemory is unlimited)"""
+        checked_at, ratio = self._memory
+        now = time.monotonic()
+        if now - checked_at < self.check_interval_seconds:
+            CACHE_LOOKUPS.labels("backpressure_memory", "hit").inc()
+            return ratio
+        CACHE_LOOKUPS.labels("backpressure_memory", "miss").inc()
+        memory = await memory_info(self.redis)
+        maxmemory = memory["maxmemory"]
+        ratio = memory["used_memory"] / maxmemory if maxmemory else 0.0
+        self._memory = (now, ratio)
+        return ratio
+
+    async def stream_lag(self, stream_name: str) -> int:
+        """Largest consumer group lag on a stream (or any of its partitions)"""
+        cached = self._lag.get(stream_name)
+        now = time.monotonic()
+        if cached and now - cached[0] < self.check_interval_seconds:
+            CACHE_LOOKUPS.labels("backpressure_lag", "hit").inc()
+            return cached[1]
+        CACHE_LOOKUPS.labels("backpressure_lag", "miss").inc()
+        lag = 0
+        for key in self.partitioner.partitions(stream_name):
+            try:
+                groups = await self.redis.xinfo_groups(key)
+            except redis.ResponseError:
+                groups = []
+            lag = max([lag, *(int(g.get("lag") or 0) for g in groups)])
+        self._lag[stream_name] = (now, lag)
+        return lag
+
+    async def check(self, stream_name: str) -> Optional[BackpressureSignal]:
+        """Return a signal when writes to the stream should be refused"""
+        ratio = await self.memory_ratio()
+        if ratio >= self.max_memory_ratio:
+            self.rejections += 1
+            return BackpressureSignal(
+                reason=f"redis memory at {ratio:.0%} of maxmemory",
+                retry_after_seconds=self.retry_after_seconds
+            )
+
+        lag = await self.stream_lag(stream_name)
+        if lag >= self.max_lag:
+            self.rejections += 1
+            return BackpressureSignal(
+                reason=f"consumer lag {lag} on '{stream_name}' exceeds {self.max_lag}",
+                retry_after_seconds=self.retry_after_seconds
+            )
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Backpressure state for the metrics endpoint"""
+        return {
+            "memory_ratio": self._memory[1],
+            "stream_lag": {name: lag for name, (_, lag) in self._lag.items()},
+            "rejections": self.rejections,
+        }
@@ -0,0 +1,222 @@
+"""
+Consumer group analytics for Synapse
+Per-group lag, pending entries and consumer health, with a short lag history
+"""
+import asyncio
+import logging
+import time
+import redis.asyncio as redis
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from ..streams.ids import parse_id
+from ..streams.partitions import StreamPartitioner
+from .prometheus import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+# Lag changing slower than this (entries per second) counts as steady
+STEADY_RATE = 0.01
+
+
+def lag_trend(samples: List[Tuple[float, int]]) -> Dict[str, Any]:
+    """
+    Direction and rate of a lag series of (timestamp, lag) samples
+
+    The rate is the least-squares slope over the samples, so one bursty
+    poll doesn't flip the trend. Time to drain extrapolates the current
+    lag at that rate and is only given while the lag is shrinking.
+    """
+    if len(samples) < 2 or samples[-1][0] == samples[0][0]:
+        return {"trend": "unknown", "rate_per_second": None, "time_to_drain_seconds": None}
+    n = len(samples)
+    mean_t = sum(t for t, _ in samples) / n
+    mean_lag = sum(lag for _, lag in samples) / n
+    spread = sum((t - mean_t) ** 2 for t, _ in samples)
+    rate = sum((t - mean_t) * (lag - mean_lag) for t, lag in samples) / spread
+
+    lag = samples[-1][1]
+    if abs(rate) < STEADY_RATE:
+        trend = "steady"
+    else:
+        trend = "growing" if rate > 0 else "draining"
+    time_to_drain = None
+    if lag == 0:
+        time_to_drain = 0.0
+    elif trend == "draining":
+        time_to_drain = lag / -rate
+    return {"trend": trend, "rate_per_second": rate, "time_to_drain_seconds": time_to_drain}
+
+
+def _merge_consumers(consumers: Dict[str, Dict[str, Any]], replies: List[Dict[str, Any]]):
+    """Fold one partition's XINFO CONSUMERS into per-name totals"""
+    for reply in replies:
+        consumer = consumers.setdefault(
+            reply["name"], {"name": reply["name"], "pending": 0, "idle_ms": None}
+        )
+        consumer["pending"] += int(reply.get("pending") or 0)
+        # The most recently active partition says whether the consumer is alive
+        idle = reply.get("idle")
+        if idle is not None and (consumer["idle_ms"] is None or int(idle) < consumer["idle_ms"]):
+            consumer["idle_ms"] = int(idle)
+        inactive = reply.get("inactive")  # Redis 7.2+; -1 before any successful read
+        if inactive is not None and 0 <= int(inactive) < consumer.get("inactive_ms", float("inf")):
+            consumer["inactive_ms"] = int(inactive)
+
+
+class GroupAnalytics:
+    """
+    Reports how well each consumer group of a stream keeps up
+
+    A report takes two pipelined round trips whatever the partition and
+    group count: XINFO GROUPS for every partition, then XINFO CONSUMERS and
+    an XPENDING summary for every group found. Reports are cached for
+    `cache_seconds`. Each fresh report (and each background sample, when
+    `start` runs one) adds the group's lag to a history of `history_size`
+    samples, from which the lag trend and time to drain are estimated.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        partitioner: Optional[StreamPartitioner] = None,
+        cache_seconds: float = 2.0,
+        history_size: int = 60
+    ):
+        """Initialize group analytics"""
+        self.redis = redis_client
+        self.partitioner = partitioner or StreamPartitioner()
+        self.cache_seconds = cache_seconds
+        self.history_size = history_size
+        self._cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._history: Dict[Tuple[str, str], Deque[Tuple[float, int]]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def _collect(self, stream_name: str) -> Dict[str, Dict[str, Any]]:
+        """Raw per-group figures for every partition of a stream"""
+        keys = self.partitioner.partitions(stream_name)
+        pipe = self.redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.xinfo_groups(key)
+        replies = await pipe.execute(raise_on_error=False)
+
+        found: List[Tuple[str, Dict[str, Any]]] = []
+        for key, reply in zip(keys, replies):
+            if isinstance(reply, Exception):
+                continue  # The partition doesn't exist yet
+            found.extend((key, group) for group in reply)
+        if not found:
+            return {}
+
+        pipe = self.redis.pipeline(transaction=False)
+        for key, group in found:
+            pipe.xinfo_consumers(key, group["name"])
+            pipe.xpending(key, group["name"])
+        replies = await pipe.execute(raise_on_error=False)
+
+        now_ms = int(time.time() * 1000)
+        groups: Dict[str, Dict[str, Any]] = {}
+        for i, (key, group) in enumerate(found):
+            consumers, pending = replies[2 * i], replies[2 * i + 1]
+            if isinstance(consumers, Exception) or isinstance(pending, Exception):
+                continue  # Group deleted between the two round trips
+            name = group["name"]
+            stats = groups.setdefault(name, {
+                "name": name,
+                "lag": 0,
+                "pending": 0,
+                "oldest_pending_age_ms": None,
+                "consumers": {},
+                "partitions": {},
+            })
+            lag = group.get("lag")
+            stats["lag"] = None if lag is None or stats["lag"] is None else stats["lag"] + int(lag)
+            stats["pending"] += int(pending.get("pending") or 0)
+            oldest = pending.get("min")
+            if oldest:
+                age = max(0, now_ms - parse_id(oldest)[0])
+                stats["oldest_pending_age_ms"] = max(stats["oldest_pending_age_ms"] or 0, age)
+            _merge_consumers(stats["consumers"], consumers)
+            stats["partitions"][key] = {
+                "lag": None if lag is None else int(lag),
+                "pending": int(pending.get("pending") or 0),
+                "last_delivered_id": group.get("last-delivered-id"),
+            }
+        return groups
+
+    def _record(self, stream_name: str, group: str, now: float, lag: Optional[int]):
+        history = self._history.get((stream_name, group))
+        if history is None:
+            history = self._history[(stream_name, group)] = deque(maxlen=self.history_size)
+        if lag is not None:
+            history.append((now, lag))
+
+    async def report(self, stream_name: str) -> Dict[str, Any]:
+        """
+        Lag, pending and consumer figures for each group of a stream
+
+        `lag` is None when Redis can't tell (before 7.0, or after entries
+        were deleted mid-stream); `oldest_pending_age_ms` is the age of the
+        oldest delivered-but-unacked entry, from its ID. Consumers present
+        on several partitions are merged by name.
+        """
+        now = time.time()
+        cached = self._cache.get(stream_name)
+        if cached and now - cached[0] < self.cache_seconds:
+            CACHE_LOOKUPS.labels("group_analytics", "hit").inc()
+            return cached[1]
+        CACHE_LOOKUPS.labels("group_analytics", "miss").inc()
+
+        groups = await self._collect(stream_name)
+        partitioned = self.partitioner.is_partitioned(stream_name)
+        reports = []
+        for name, stats in sorted(groups.items()):
+            self._record(stream_name, name, now, stats["lag"])
+            history = list(self._history[(stream_name, name)])
+            partitions = stats.pop("partitions")
+            stats["consumers"] = sorted(stats["consumers"].values(), key=lambda c: c["name"])
+            if partitioned:
+                stats["partitions"] = partitions
+            else:
+                stats["last_delivered_id"] = partitions[stream_name]["last_delivered_id"]
+            stats.update(lag_trend(history))
+            stats["history"] = [[round(t, 3), lag] for t, lag in history]
+            reports.append(stats)
+
+        # Forget groups that were destroyed
+        for key in [k for k in self._history if k[0] == stream_name and k[1] not in groups]:
+            del self._history[key]
+
+        report = {"stream": stream_name, "groups": reports}
+        if reports:
+            # Streams without groups aren't cached, so arbitrary names can't pile up
+            self._cache[stream_name] = (now, report)
+        else:
+            self._cache.pop(stream_name, None)
+        return report
+
+    async def _loop(self, streams: List[str], interval_seconds: float):
+        while True:
+            for stream_name in streams:
+                try:
+                    await self.report(stream_name)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Sampling consumer groups of {stream_name} failed: {e}")
+            await asyncio.sleep(interval_seconds)
+
+    def start(self, streams: List[str], interval_seconds: float):
+        """Sample the streams' groups in the background so trends build up unpolled"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(streams, interval_seconds))
+
+    async def stop(self):
+        """Stop background sampling"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -3,16 +3,30 @@ Metrics collector for Synapse
 Collects and aggregates streaming metrics
 """
 import redis.asyncio as redis
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 
+from ..streams.partitions import StreamPartitioner
+
 
 class MetricsCollector:
     """Collects metrics from streams"""
     
-    def __init__(self, redis_client: redis.Redis):
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        partitioner: Optional[StreamPartitioner] = None
+    ):
         """Initialize metrics collector"""
         self.redis = redis_client
+        self.partitioner = partitioner or StreamPartitioner()
+    
+    async def _recent_messages(self, stream_name: str, cutoff_id: int) -> List[Any]:
+        """Recent messages of a stream, across all of its partitions"""
+        messages = []
+        for key in self.partitioner.partitions(stream_name):
+            messages.extend(await self.redis.xrange(key, min=f"{cutoff_id}-0", count=1000))
+        return messages
     
     async def get_stream_metrics(
         self,
@@ -25,11 +39,7 @@ class MetricsCollector:
             cutoff_time = datetime.utcnow() - timedelta(minutes=time_window_minutes)
             cutoff_id = int(cutoff_time.timestamp() * 1000)
             
-            messages = await self.redis.xrange(
-                stream_name,
-                min=f"{cutoff_id}-0",
-                count=1000
-            )
+            messages = await self._recent_messages(stream_name, cutoff_id)
             
             return {
                 "stream": stream_name,
@@ -46,11 +56,7 @@ class MetricsCollector:
             cutoff_time = datetime.utcnow() - timedelta(minutes=time_window_minutes)
             cutoff_id = int(cutoff_time.timestamp() * 1000)
             
-            messages = await self.redis.xrange(
-                "inference-events",
-                min=f"{cutoff_id}-0",
-                count=1000
-            )
+            messages = await self._recent_messages("inference-events", cutoff_id)
             
             if not messages:
                 return {
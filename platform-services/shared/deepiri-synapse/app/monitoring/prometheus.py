@@ -0,0 +1,338 @@
+"""
+In-process metrics for Synapse
+Counters, gauges and histograms rendered in the Prometheus text format
+"""
+import inspect
+import logging
+import math
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Seconds: Redis round trips through handler runs
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _CounterValue:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        """Add to the counter"""
+        self.value += amount
+
+
+class _GaugeValue(_CounterValue):
+    __slots__ = ()
+
+    def set(self, value: float):
+        """Set the gauge"""
+        self.value = value
+
+    def dec(self, amount: float = 1.0):
+        """Subtract from the gauge"""
+        self.value -= amount
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Per bucket; made cumulative on render
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """Record one observation"""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metric:
+    """
+    One metric family and its labelled series
+
+    `labels(...)` returns the series for a set of label values; callers on
+    hot paths can keep the returned object and update it directly. A
+    metric without label names is its own single series.
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        """Initialize metric"""
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], Any] = {}
+        self._default = None if self.labelnames else self.labels()
+
+    def _new_series(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: Any) -> Any:
+        """The series for these label values (created on first use)"""
+        key = tuple(str(v) for v in values)
+        series = self._series.get(key)
+        if series is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {key}")
+            series = self._series[key] = self._new_series()
+        return series
+
+    def clear(self):
+        """Drop every labelled series (for gauges rebuilt on each collection)"""
+        if self.labelnames:
+            self._series.clear()
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, series in self._series.items():
+            lines.append(f"{self.name}{_label_text(self.labelnames, key)} {_format_value(series.value)}")
+        return lines
+
+    def render(self) -> str:
+        """Text exposition of this family"""
+        header = f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.kind}\n"
+        return header + "".join(line + "\n" for line in self._samples())
+
+    def snapshot(self) -> Any:
+        """JSON-friendly values: a number, or a map of joined label values to numbers"""
+        if not self.labelnames:
+            return self._default.value
+        return {",".join(key): series.value for key, series in self._series.items()}
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def _new_series(self) -> _CounterValue:
+        return _CounterValue()
+
+    def inc(self, amount: float = 1.0):
+        """Add to an unlabelled counter"""
+        self._default.value += amount
+
+
+class Gauge(Metric):
+    """Value that can go up and down"""
+
+    kind = "gauge"
+
+    def _new_series(self) -> _GaugeValue:
+        return _GaugeValue()
+
+    def set(self, value: float):
+        """Set an unlabelled gauge"""
+        self._default.value = value
+
+
+class Histogram(Metric):
+    """Distribution of observations over fixed buckets"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        """Initialize histogram"""
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, help_text, labelnames)
+
+    def _new_series(self) -> _HistogramValue:
+        return _HistogramValue(self.bounds)
+
+    def observe(self, value: float):
+        """Record an observation on an unlabelled histogram"""
+        self._default.observe(value)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.bounds + (math.inf,), series.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {cumulative}"
+                )
+            labels = _label_text(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series.sum)}")
+            lines.append(f"{self.name}_count{labels} {series.count}")
+        return lines
+
+    def snapshot(self) -> Any:
+        def summary(series: _HistogramValue) -> Dict[str, Any]:
+            return {
+                "count": series.count,
+                "sum": series.sum,
+                "avg": series.sum / series.count if series.count else 0.0,
+            }
+        if not self.labelnames:
+            return summary(self._default)
+        return {",".join(key): summary(series) for key, series in self._series.items()}
+
+
+Collector = Callable[[], Union[None, Awaitable[None]]]
+
+
+class MetricsRegistry:
+    """
+    Metric families plus the collectors that refresh gauges before a scrape
+
+    Updates are plain arithmetic on the event loop thread, so the hot path
+    takes no locks; work done in worker threads doesn't record metrics.
+    Values derived from Redis (stream lengths, lag) are refreshed by
+    collectors only when the registry is read.
+    """
+
+    def __init__(self):
+        """Initialize metrics registry"""
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Collector] = []
+
+    def _register(self, metric: Metric) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Register a counter"""
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """Register a gauge"""
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        """Register a histogram"""
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def add_collector(self, collector: Collector):
+        """Run `collector` (sync or async) before every read of the registry"""
+        self._collectors.append(collector)
+
+    async def collect(self):
+        """Run the collectors; one failing leaves its metrics at their last values"""
+        for collector in self._collectors:
+            try:
+                result = collector()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.warning(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+
+    def get(self, name: str) -> Optional[Metric]:
+        """A registered metric by name"""
+        return self._metrics.get(name)
+
+    def expose(self) -> str:
+        """Prometheus text exposition (format 0.0.4)"""
+        return "".join(metric.render() for metric in self._metrics.values())
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Every metric's current values, for the JSON metrics endpoint"""
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+
+# Process-wide registry and the instruments updated on Synapse's hot paths
+registry = MetricsRegistry()
+
+EVENTS_PUBLISHED = registry.counter(
+    "synapse_events_published_total", "Events written to a stream", ("stream",)
+)
+EVENTS_DUPLICATE = registry.counter(
+    "synapse_events_duplicate_total", "Publishes dropped as retries of an earlier event", ("stream",)
+)
+EVENTS_REJECTED = registry.counter(
+    "synapse_events_rejected_total", "Ingested events refused by validation", ("stream",)
+)
+EVENTS_CONSUMED = registry.counter(
+    "synapse_events_consumed_total", "Entries delivered to consumers", ("stream", "group")
+)
+EVENTS_COALESCED = registry.counter(
+    "synapse_events_coalesced_total",
+    "Entries superseded by a later event for the same key",
+    ("stream", "group")
+)
+PUBLISH_QUEUE_WAIT = registry.histogram(
+    "synapse_publish_queue_wait_seconds",
+    "Time publishes waited for an in-flight slot",
+    ("stream",)
+)
+PUBLISH_DROPPED = registry.counter(
+    "synapse_publish_dropped_total", "Publishes dropped with every in-flight slot taken", ("stream",)
+)
+PUBLISH_SPILLED = registry.counter(
+    "synapse_publish_spilled_total", "Publishes written to the outbox instead of Redis", ("stream",)
+)
+PUBLISH_THROTTLED = registry.counter(
+    "synapse_publish_throttled_total", "Publishes delayed for consumer group lag", ("stream",)
+)
+HANDLER_DURATION = registry.histogram(
+    "synapse_handler_duration_seconds", "Event handler run time", ("stream",)
+)
+HANDLER_ERRORS = registry.counter(
+    "synapse_handler_errors_total", "Event handlers that raised", ("stream",)
+)
+ACK_BATCH_SIZE = registry.histogram(
+    "synapse_ack_batch_size", "Entries acknowledged per XACK", ("source",), buckets=SIZE_BUCKETS
+)
+REDIS_RTT = registry.histogram(
+    "synapse_redis_rtt_seconds", "Round-trip time of Redis calls", ("operation",)
+)
+CACHE_LOOKUPS = registry.counter(
+    "synapse_cache_lookups_total", "In-process cache lookups", ("cache", "result")
+)
+STREAM_LENGTH = registry.gauge(
+    "synapse_stream_length", "Entries in a stream (summed over partitions)", ("stream",)
+)
+GROUP_LAG = registry.gauge(
+    "synapse_consumer_group_lag", "Entries not yet delivered to a consumer group", ("stream", "group")
+)
+GROUP_PENDING = registry.gauge(
+    "synapse_consumer_group_pending", "Delivered but unacknowledged entries", ("stream", "group")
+)
+GROUP_OLDEST_PENDING = registry.gauge(
+    "synapse_consumer_group_oldest_pending_seconds",
+    "Age of a group's oldest unacknowledged entry",
+    ("stream", "group")
+)
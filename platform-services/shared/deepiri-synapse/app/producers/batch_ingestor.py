@@ -0,0 +1,168 @@
+"""
+Batch ingestor for Synapse
+Validates a batch of events and writes it with one pipelined round trip
+"""
+import json
+import time
+import redis.asyncio as redis
+from typing import Any, Dict, List, Optional
+
+from ..monitoring.prometheus import (
+    EVENTS_DUPLICATE, EVENTS_PUBLISHED, EVENTS_REJECTED, REDIS_RTT
+)
+from ..schemas.validators import validate_event
+from ..storage.claim_check import ClaimCheck
+from ..streams.functions import PublishEntry, StreamFunctions
+from ..streams.indexer import StreamIndexer
+from ..streams.partitions import StreamPartitioner
+from .idempotency import DedupWindow
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+def parse_events(body: bytes, content_type: Optional[str]) -> List[Any]:
+    """
+    Parse a request body into a list of events
+
+    Accepts a JSON array, a single JSON object, or NDJSON (one object per line).
+
+    Raises:
+        ValueError: If the body can't be parsed
+    """
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    text = body.decode("utf-8")
+
+    if media_type in NDJSON_CONTENT_TYPES:
+        events = []
+        for line_no, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON on line {line_no}: {e}")
+        return events
+
+    try:
+        payload = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON body: {e}")
+    return payload if isinstance(payload, list) else [payload]
+
+
+def encode_fields(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten an event to Redis stream field values (nested values become JSON)"""
+    fields = {}
+    for key, value in event.items():
+        if value is None:
+            continue
+        if isinstance(value, (dict, list)):
+            fields[key] = json.dumps(value, separators=(",", ":"))
+        elif isinstance(value, bool):
+            fields[key] = "true" if value else "false"
+        else:
+            fields[key] = value
+    return fields
+
+
+class BatchIngestor:
+    """
+    Writes validated event batches to a stream
+
+    Each stream key's share of a batch is one publish_batch call, and all of
+    them go out in one pipeline.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        max_length: Optional[int] = 10000,
+        partitioner: Optional[StreamPartitioner] = None,
+        indexer: Optional[StreamIndexer] = None,
+        functions: Optional[StreamFunctions] = None,
+        dedup: Optional[DedupWindow] = None,
+        claim_check: Optional[ClaimCheck] = None
+    ):
+        """Initialize batch ingestor (large field values are offloaded via `claim_check`)"""
+        self.redis = redis_client
+        self.max_length = max_length
+        self.partitioner = partitioner or StreamPartitioner()
+        self.indexer = indexer
+        self.functions = functions or StreamFunctions(redis_client)
+        self.dedup = dedup
+        self.claim_check = claim_check
+        self.accepted = 0
+        self.rejected = 0
+        self.duplicates = 0
+
+    async def ingest(
+        self,
+        stream_name: str,
+        events: List[Any],
+        producer: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Validate and write events
+
+        Returns:
+            Per-event results in input order, each with either an `id` or an
+            `error`; a retry inside the dedup window gets the first publish's
+            `id` with `duplicate: true` and isn't written again
+        """
+        results: List[Dict[str, Any]] = [{"index": i} for i in range(len(events))]
+        pending = []
+
+        for i, event in enumerate(events):
+            if not isinstance(event, dict):
+                results[i]["error"] = "event must be a JSON object"
+                continue
+            try:
+                validated = validate_event(stream_name, event, producer=producer)
+            except ValueError as e:
+                results[i]["error"] = str(e)
+                continue
+            key = self.partitioner.route(stream_name, validated)
+            fields = encode_fields(validated)
+            if self.claim_check:
+                try:
+                    fields = await self.claim_check.offload(fields)
+                except Exception as e:
+                    results[i]["error"] = f"claim-check offload failed: {e}"
+                    continue
+            pending.append((i, key, fields))
+
+        if pending:
+            batches: Dict[str, List[PublishEntry]] = {}
+            positions: Dict[str, List[int]] = {}
+            for i, key, fields in pending:
+                index_keys = self.indexer.keys_for(key, fields) if self.indexer else []
+                if self.dedup:
+                    entry = self.dedup.entry(key, fields, index_keys, producer=producer)
+                else:
+                    entry = PublishEntry(fields, index_keys)
+                batches.setdefault(key, []).append(entry)
+                positions.setdefault(key, []).append(i)
+            started = time.perf_counter()
+            replies = await self.functions.publish_batches(batches, max_length=self.max_length)
+            REDIS_RTT.labels("publish_batch").observe(time.perf_counter() - started)
+            for key, reply in replies.items():
+                for n, i in enumerate(positions[key]):
+                    if isinstance(reply, Exception):
+                        results[i]["error"] = str(reply)
+                        continue
+                    results[i]["id"], duplicate = reply[n]
+                    if self.dedup:
+                        self.dedup.record(batches[key][n], duplicate)
+                    if duplicate:
+                        results[i]["duplicate"] = True
+
+        accepted = sum(1 for r in results if "id" in r and not r.get("duplicate"))
+        duplicates = sum(1 for r in results if r.get("duplicate"))
+        rejected = len(results) - accepted - duplicates
+        self.accepted += accepted
+        self.duplicates += duplicates
+        self.rejected += rejected
+        EVENTS_PUBLISHED.labels(stream_name).inc(accepted)
+        EVENTS_DUPLICATE.labels(stream_name).inc(duplicates)
+        EVENTS_REJECTED.labels(stream_name).inc(rejected)
+        return results
@@ -2,17 +2,293 @@
 Event publisher for Synapse
 Provides high-level interface for publishing events
 """
+import asyncio
+import logging
+import time
 import redis.asyncio as redis
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
+from ..monitoring.backpressure import BackpressureMonitor
+from ..monitoring.prometheus import (
+    EVENTS_DUPLICATE,
+    EVENTS_PUBLISHED,
+    PUBLISH_DROPPED,
+    PUBLISH_QUEUE_WAIT,
+    PUBLISH_SPILLED,
+    PUBLISH_THROTTLED,
+    REDIS_RTT,
+)
+from ..schemas.registry import SCHEMA_ID_FIELD, SchemaRegistry
+from ..storage.claim_check import ClaimCheck
+from ..streams.functions import PublishEntry, StreamFunctions
+from ..streams.indexer import StreamIndexer
+from ..streams.partitions import StreamPartitioner
+from .idempotency import DedupWindow
+from .outbox import Outbox
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("block", "drop", "spill")
+
 
 class EventPublisher:
     """High-level event publisher"""
     
-    def __init__(self, redis_client: redis.Redis):
-        """Initialize event publisher"""
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        schema_registry: Optional[SchemaRegistry] = None,
+        max_length: Optional[int] = 10000,
+        partitioner: Optional[StreamPartitioner] = None,
+        indexer: Optional[StreamIndexer] = None,
+        functions: Optional[StreamFunctions] = None,
+        dedup: Optional[DedupWindow] = None,
+        outbox: Optional[Outbox] = None,
+        latency_budget_ms: Optional[float] = None,
+        max_in_flight: Optional[int] = None,
+        overflow: str = "block",
+        lag_monitor: Optional[BackpressureMonitor] = None,
+        throttle_lag: Optional[int] = None,
+        max_throttle_ms: float = 1000.0,
+        claim_check: Optional[ClaimCheck] = None
+    ):
+        """
+        Initialize event publisher
+        
+        Pass max_length=None when Synapse's retention scheduler trims the
+        streams, so publishes skip the per-XADD MAXLEN trim. With a
+        partitioner, events go to the partition for their routing key; with
+        an indexer, covered streams update their indexes in the same call.
+        With a dedup window, events carrying `idempotency_key` (or
+        `producer_id` and `sequence`) are published at most once per window;
+        a retry returns the first publish's ID.
+        
+        With an outbox, events that can't reach Redis (or not within
+        `latency_budget_ms`) are written to it instead and the publish
+        returns None; start() runs the task that drains it once Redis is
+        back. Drained events are delivered at least once.
+        
+        `max_in_flight` bounds concurrent publishes. When all slots are
+        taken, `overflow` decides: "block" waits for one (the wait is
+        exported as synapse_publish_queue_wait_seconds), "drop" returns
+        None without publishing, "spill" writes to the outbox. With a `lag_monitor` and
+        `throttle_lag`, publishes to a stream whose consumer group lag is
+        above `throttle_lag` are delayed, growing linearly to
+        `max_throttle_ms` at twice that lag.
+        
+        With a claim check, field values above its threshold (inference
+        inputs/outputs, artifact lists) are stored in its blob store and the
+        entry carries only a reference.
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}'")
+        if overflow == "spill" and outbox is None:
+            raise ValueError("overflow='spill' needs an outbox")
         self.redis = redis_client
+        self.schema_registry = schema_registry
+        self.max_length = max_length
+        self.partitioner = partitioner or StreamPartitioner()
+        self.indexer = indexer
+        self.functions = functions or StreamFunctions(redis_client)
+        self.dedup = dedup
+        self.outbox = outbox
+        self.latency_budget_ms = latency_budget_ms
+        self.max_in_flight = max_in_flight
+        self.overflow = overflow
+        self.lag_monitor = lag_monitor
+        self.throttle_lag = throttle_lag
+        self.max_throttle_ms = max_throttle_ms
+        self.claim_check = claim_check
+        self._slots = asyncio.Semaphore(max_in_flight) if max_in_flight else None
+        self._drain_task: Optional[asyncio.Task] = None
+        self.in_flight = 0
+        self.spilled = 0
+        self.dropped = 0
+        self.throttled = 0
+        self.throttle_ms_total = 0.0
+        self.queue_waits = 0
+        self.queue_wait_ms_total = 0.0
+        self.queue_wait_ms_max = 0.0
+    
+    def _stamp_schema(self, stream_name: str, event: Dict[str, Any]) -> Dict[str, Any]:
+        """Put the latest schema id for the event's subject in its header"""
+        if self.schema_registry is None or SCHEMA_ID_FIELD in event:
+            return event
+        subject = self.schema_registry.resolve_subject(stream_name, event.get("event"))
+        if subject is not None:
+            event[SCHEMA_ID_FIELD] = self.schema_registry.latest(subject).schema_id
+        return event
+    
+    def _entry(self, stream_key: str, event: Dict[str, Any]) -> PublishEntry:
+        index_keys = self.indexer.keys_for(stream_key, event) if self.indexer else []
+        if self.dedup:
+            return self.dedup.entry(stream_key, event, index_keys)
+        return PublishEntry(event, index_keys)
+    
+    async def _publish(self, stream_key: str, event: Dict[str, Any], stream_name: str):
+        entry = self._entry(stream_key, event)
+        started = time.perf_counter()
+        entry_id, duplicate = await self.functions.publish(
+            stream_key, entry, max_length=self.max_length
+        )
+        REDIS_RTT.labels("publish").observe(time.perf_counter() - started)
+        (EVENTS_DUPLICATE if duplicate else EVENTS_PUBLISHED).labels(stream_name).inc()
+        if self.dedup:
+            self.dedup.record(entry, duplicate)
+        return entry_id
+    
+    async def _throttle(self, stream_name: str):
+        """Delay a publish while the stream's consumers are far behind"""
+        if self.lag_monitor is None or not self.throttle_lag:
+            return
+        lag = await self.lag_monitor.stream_lag(stream_name)
+        if lag <= self.throttle_lag:
+            return
+        delay_ms = self.max_throttle_ms * min(1.0, (lag - self.throttle_lag) / self.throttle_lag)
+        self.throttled += 1
+        self.throttle_ms_total += delay_ms
+        PUBLISH_THROTTLED.labels(stream_name).inc()
+        await asyncio.sleep(delay_ms / 1000)
+    
+    async def _xadd(self, stream_name: str, event: Dict[str, Any]):
+        """
+        Append an event with the publish function: trim (only when
+        max_length is set), type counter and index updates in one round trip
+        """
+        await self._throttle(stream_name)
+        if self.claim_check:
+            event = await self.claim_check.offload(event)
+        stream_key = self.partitioner.route(stream_name, event)
+        if self.outbox is not None and not self.outbox.is_open:
+            # Count rows left by a previous run, so new events queue behind them
+            await self.outbox.open()
+        if self.outbox is not None and self.outbox.has_backlog:
+            # Queue behind spilled events so per-key order holds
+            await self.outbox.append(stream_key, event)
+            return None
+        if self._slots is None:
+            return await self._send(stream_key, event, stream_name)
+        
+        if self._slots.locked() and self.overflow != "block":
+            if self.overflow == "drop":
+                self.dropped += 1
+                PUBLISH_DROPPED.labels(stream_name).inc()
+                return None
+            self.spilled += 1
+            PUBLISH_SPILLED.labels(stream_name).inc()
+            await self.outbox.append(stream_key, event)
+            return None
+        started = time.monotonic()
+        async with self._slots:
+            wait_ms = (time.monotonic() - started) * 1000
+            self.queue_waits += 1
+            self.queue_wait_ms_total += wait_ms
+            self.queue_wait_ms_max = max(self.queue_wait_ms_max, wait_ms)
+            PUBLISH_QUEUE_WAIT.labels(stream_name).observe(wait_ms / 1000)
+            self.in_flight += 1
+            try:
+                return await self._send(stream_key, event, stream_name)
+            finally:
+                self.in_flight -= 1
+    
+    async def _send(self, stream_key: str, event: Dict[str, Any], stream_name: str):
+        """Publish to Redis, spilling to the outbox (if any) on failure or timeout"""
+        if self.outbox is None:
+            return await self._publish(stream_key, event, stream_name)
+        budget = self.latency_budget_ms / 1000 if self.latency_budget_ms else None
+        try:
+            return await asyncio.wait_for(
+                self._publish(stream_key, event, stream_name), budget
+            )
+        except (redis.ConnectionError, redis.TimeoutError, asyncio.TimeoutError) as e:
+            self.spilled += 1
+            PUBLISH_SPILLED.labels(stream_name).inc()
+            logger.warning(f"Publishing to {stream_key} failed ({e!r}); spilled to outbox")
+            await self.outbox.append(stream_key, event)
+            return None
+    
+    async def drain_outbox(self, batch_size: int = 500) -> int:
+        """
+        Publish outbox rows to Redis in append order
+        
+        Each batch is one pipelined round trip. Rows of a stream whose call
+        failed stay put and the drain stops, so later rows never overtake
+        them. Returns the number of rows delivered.
+        """
+        delivered = 0
+        while True:
+            rows = await self.outbox.peek(batch_size)
+            if not rows:
+                return delivered
+            batches: Dict[str, List[PublishEntry]] = {}
+            seqs: Dict[str, List[int]] = {}
+            for seq, stream_key, fields in rows:
+                batches.setdefault(stream_key, []).append(self._entry(stream_key, fields))
+                seqs.setdefault(stream_key, []).append(seq)
+            results = await self.functions.publish_batches(batches, max_length=self.max_length)
+            
+            done: List[int] = []
+            failed = None
+            for stream_key, result in results.items():
+                if isinstance(result, Exception):
+                    failed = result
+                    continue
+                done.extend(seqs[stream_key])
+                if self.dedup:
+                    for entry, (_, duplicate) in zip(batches[stream_key], result):
+                        self.dedup.record(entry, duplicate)
+            await self.outbox.delete(done)
+            delivered += len(done)
+            if failed is not None:
+                raise failed
+    
+    async def _drain_loop(self, interval_seconds: float):
+        await self.outbox.open()
+        while True:
+            try:
+                if self.outbox.pending:
+                    drained = await self.drain_outbox()
+                    logger.info(f"Drained {drained} events from the outbox")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Outbox drain stopped, {self.outbox.pending} left: {e}")
+            await asyncio.sleep(interval_seconds)
+    
+    def start(self, drain_interval_seconds: float = 1.0):
+        """Start draining the outbox in the background (no-op without one)"""
+        if self.outbox is not None and self._drain_task is None:
+            self._drain_task = asyncio.create_task(self._drain_loop(drain_interval_seconds))
+    
+    async def stop(self):
+        """Stop the drain task and close the outbox"""
+        if self._drain_task is not None:
+            self._drain_task.cancel()
+            try:
+                await self._drain_task
+            except asyncio.CancelledError:
+                pass
+            self._drain_task = None
+        if self.outbox is not None:
+            await self.outbox.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Publisher metrics"""
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "throttled": self.throttled,
+            "throttle_ms_total": self.throttle_ms_total,
+            "queue_wait_ms": {
+                "count": self.queue_waits,
+                "avg": self.queue_wait_ms_total / self.queue_waits if self.queue_waits else 0.0,
+                "max": self.queue_wait_ms_max,
+            },
+            "outbox": self.outbox.stats() if self.outbox else None,
+        }
     
     async def publish_model_event(
         self,
@@ -29,7 +305,8 @@ class EventPublisher:
             "timestamp": datetime.utcnow().isoformat(),
             **kwargs
         }
-        return await self.redis.xadd("model-events", event, maxlen=10000, approximate=True)
+        event = self._stamp_schema("model-events", event)
+        return await self._xadd("model-events", event)
     
     async def publish_inference_event(
         self,
@@ -47,7 +324,8 @@ class EventPublisher:
             "timestamp": datetime.utcnow().isoformat(),
             **kwargs
         }
-        return await self.redis.xadd("inference-events", event, maxlen=10000, approximate=True)
+        event = self._stamp_schema("inference-events", event)
+        return await self._xadd("inference-events", event)
     
     async def publish_platform_event(
         self,
@@ -63,5 +341,6 @@ class EventPublisher:
             "data": str(data),  # JSON serialization handled by caller
             "timestamp": datetime.utcnow().isoformat()
         }
-        return await self.redis.xadd("platform-events", event, maxlen=10000, approximate=True)
+        event = self._stamp_schema("platform-events", event)
+        return await self._xadd("platform-events", event)
 
@@ -0,0 +1,141 @@
+"""
+Local outbox for Synapse publishers
+SQLite (WAL) spill file for events that couldn't reach Redis in time
+"""
+import asyncio
+import json
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# (row sequence, stream key, fields)
+OutboxRow = Tuple[int, str, Dict[str, Any]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    stream TEXT NOT NULL,
+    fields TEXT NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+
+class Outbox:
+    """
+    Append-only event spill file with group commit
+
+    Appends are collected for up to `flush_interval_ms` and committed in one
+    transaction, so many concurrent publishes share one fsync (WAL with
+    synchronous=FULL). An append returns only once its row is durable. Rows
+    are read back in append order and deleted after they reach Redis.
+    """
+
+    def __init__(self, path: str, flush_interval_ms: float = 5.0):
+        """Initialize outbox"""
+        self.path = path
+        self.flush_interval_ms = flush_interval_ms
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = asyncio.Lock()
+        self._buffer: List[Tuple[str, str, float]] = []
+        self._flushed: Optional[asyncio.Future] = None
+        self.pending = 0
+        self.appended = 0
+        self.drained = 0
+        self.flushes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute(_SCHEMA)
+        return conn
+
+    async def _run(self, fn, *args):
+        """Run a blocking SQLite call off the event loop, one at a time"""
+        async with self._lock:
+            if self._conn is None:
+                self._conn = await asyncio.to_thread(self._connect)
+                self.pending = (await asyncio.to_thread(
+                    lambda: self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()
+                ))[0]
+            return await asyncio.to_thread(fn, *args)
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the file is open (and `pending` counts its rows)"""
+        return self._conn is not None
+
+    @property
+    def has_backlog(self) -> bool:
+        """Whether events are waiting here (committed or about to be); open() first"""
+        return bool(self.pending or self._buffer)
+
+    async def open(self):
+        """Open the file and count rows left by a previous run"""
+        await self._run(lambda: None)
+
+    def _insert(self, rows: List[Tuple[str, str, float]]):
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT INTO outbox (stream, fields, created_at) VALUES (?, ?, ?)", rows
+            )
+
+    async def _flush_later(self, flushed: asyncio.Future):
+        await asyncio.sleep(self.flush_interval_ms / 1000)
+        rows, self._buffer, self._flushed = self._buffer, [], None
+        try:
+            await self._run(self._insert, rows)
+        except Exception as e:
+            flushed.set_exception(e)
+            return
+        self.pending += len(rows)
+        self.appended += len(rows)
+        self.flushes += 1
+        flushed.set_result(None)
+
+    async def append(self, stream_name: str, fields: Dict[str, Any]):
+        """Durably append one event (returns after its group commit)"""
+        self._buffer.append((stream_name, json.dumps(fields), time.time()))
+        if self._flushed is None:
+            self._flushed = asyncio.get_running_loop().create_future()
+            asyncio.create_task(self._flush_later(self._flushed))
+        await asyncio.shield(self._flushed)
+
+    def _select(self, limit: int) -> List[OutboxRow]:
+        rows = self._conn.execute(
+            "SELECT seq, stream, fields FROM outbox ORDER BY seq LIMIT ?", (limit,)
+        ).fetchall()
+        return [(seq, stream, json.loads(fields)) for seq, stream, fields in rows]
+
+    async def peek(self, limit: int) -> List[OutboxRow]:
+        """Oldest rows, in append order"""
+        return await self._run(self._select, limit)
+
+    def _delete(self, seqs: List[int]):
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("DELETE FROM outbox WHERE seq = ?", [(s,) for s in seqs])
+
+    async def delete(self, seqs: List[int]):
+        """Remove rows that reached Redis"""
+        if seqs:
+            await self._run(self._delete, seqs)
+            self.pending -= len(seqs)
+            self.drained += len(seqs)
+
+    async def close(self):
+        """Close the file"""
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Outbox metrics"""
+        return {
+            "pending": self.pending,
+            "appended": self.appended,
+            "drained": self.drained,
+            "flushes": self.flushes,
+        }
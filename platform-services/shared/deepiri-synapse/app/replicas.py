@@ -0,0 +1,209 @@
+"""
+Read-replica routing for Synapse
+Sends monitoring and browse reads to fresh replicas, falling back to the primary
+"""
+import asyncio
+import logging
+import time
+import redis.asyncio as redis
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Written to the primary on every check; its age on a replica is that replica's staleness
+HEARTBEAT_KEY = "synapse:replicas:heartbeat"
+
+
+def _unavailable(error: Exception) -> bool:
+    """Whether a replica failed a read because it can't serve one right now"""
+    if isinstance(error, (redis.ConnectionError, redis.TimeoutError)):
+        return True  # Includes BusyLoadingError while a replica resyncs
+    return isinstance(error, redis.ResponseError) and str(error).startswith("MASTERDOWN")
+
+
+class _Replica:
+    """One replica client and its last measured staleness"""
+
+    def __init__(self, name: str, client: redis.Redis):
+        self.name = name
+        self.client = client
+        self.staleness: Optional[float] = None
+        self.fresh = False
+
+
+class ReplicaRouter:
+    """
+    Routes read-only commands to replicas within a staleness budget
+
+    Every check writes a timestamp to the primary and reads it back from
+    each replica; a replica whose copy is older than `max_staleness_seconds`
+    (or that can't be reached) takes no reads until a later check finds it
+    caught up. The measured age includes up to one check interval, so the
+    budget should be comfortably larger than the interval. Reads go round
+    robin over fresh replicas, and a read that fails because its replica is
+    down is retried on the primary. Until the first check completes, and
+    whenever no replica is fresh, everything reads from the primary.
+
+    Only commands issued through `reader` are routed: writes, consumer group
+    operations and the ingestion path keep using the primary client.
+    """
+
+    def __init__(
+        self,
+        primary: redis.Redis,
+        replicas: Dict[str, redis.Redis],
+        max_staleness_seconds: float = 5.0,
+        check_interval_seconds: float = 1.0
+    ):
+        """Initialize replica router (`replicas` maps a display name to its client)"""
+        self.primary = primary
+        self.replicas = [_Replica(name, client) for name, client in replicas.items()]
+        self.max_staleness_seconds = max_staleness_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self.reader = ReadClient(self)
+        self._next = 0
+        self._task: Optional[asyncio.Task] = None
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.fallbacks = 0
+
+    async def check(self):
+        """Measure every replica's staleness and update which ones take reads"""
+        now = time.time()
+        await self.primary.set(HEARTBEAT_KEY, repr(now))
+        for replica in self.replicas:
+            try:
+                beat = await replica.client.get(HEARTBEAT_KEY)
+            except Exception as e:
+                if replica.fresh:
+                    logger.warning(f"Replica {replica.name} unreachable, reading from primary: {e}")
+                replica.staleness, replica.fresh = None, False
+                continue
+            replica.staleness = now - float(beat) if beat is not None else None
+            fresh = (
+                replica.staleness is not None
+                and replica.staleness <= self.max_staleness_seconds
+            )
+            if fresh != replica.fresh:
+                state = "fresh" if fresh else "stale"
+                logger.info(f"Replica {replica.name} is {state} ({replica.staleness}s behind)")
+            replica.fresh = fresh
+
+    def _pick(self) -> Optional[_Replica]:
+        fresh = [r for r in self.replicas if r.fresh]
+        if not fresh:
+            return None
+        self._next = (self._next + 1) % len(fresh)
+        return fresh[self._next]
+
+    async def run(self, command: Callable[[redis.Redis], Awaitable[Any]]) -> Any:
+        """Run a read on a fresh replica, or on the primary if none can serve it"""
+        replica = self._pick()
+        if replica is not None:
+            try:
+                result = await command(replica.client)
+                self.replica_reads += 1
+                return result
+            except Exception as e:
+                if not _unavailable(e):
+                    raise
+                logger.warning(f"Read on replica {replica.name} failed, retrying on primary: {e}")
+                replica.fresh = False
+                self.fallbacks += 1
+        self.primary_reads += 1
+        return await command(self.primary)
+
+    async def _check_loop(self):
+        while True:
+            try:
+                await self.check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Without a heartbeat there's no staleness bound; read from the primary
+                logger.warning(f"Replica check failed: {e}")
+                for replica in self.replicas:
+                    replica.fresh = False
+            await asyncio.sleep(self.check_interval_seconds)
+
+    def start(self):
+        """Start checking replicas in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._check_loop())
+
+    async def stop(self):
+        """Stop checking and close the replica clients"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self.replicas:
+            await replica.client.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Routing metrics for the metrics endpoint"""
+        return {
+            "max_staleness_seconds": self.max_staleness_seconds,
+            "replicas": {
+                r.name: {"fresh": r.fresh, "staleness_seconds": r.staleness} for r in self.replicas
+            },
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "fallbacks": self.fallbacks,
+        }
+
+
+class _ReadPipeline:
+    """Queues commands and runs them as one pipeline wherever the router sends it"""
+
+    def __init__(self, router: ReplicaRouter, transaction: bool):
+        self._router = router
+        self._transaction = transaction
+        self._commands: List[Any] = []
+
+    def __getattr__(self, name: str):
+        def queue(*args, **kwargs):
+            self._commands.append((name, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self, raise_on_error: bool = True) -> List[Any]:
+        commands, self._commands = self._commands, []
+
+        async def run(client: redis.Redis):
+            pipe = client.pipeline(transaction=self._transaction)
+            for name, args, kwargs in commands:
+                getattr(pipe, name)(*args, **kwargs)
+            return await pipe.execute(raise_on_error=raise_on_error)
+
+        return await self._router.run(run)
+
+    async def __aenter__(self) -> "_ReadPipeline":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._commands = []
+
+
+class ReadClient:
+    """
+    Stand-in for a Redis client that routes every command through a ReplicaRouter
+
+    Only for read-only callers: any attribute is treated as a command.
+    """
+
+    def __init__(self, router: ReplicaRouter):
+        """Initialize read client"""
+        self._router = router
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> _ReadPipeline:
+        """Pipeline whose commands all run on the same node"""
+        return _ReadPipeline(self._router, transaction)
+
+    def __getattr__(self, name: str):
+        async def command(*args, **kwargs):
+            return await self._router.run(lambda client: getattr(client, name)(*args, **kwargs))
+        return command
@@ -0,0 +1,218 @@
+"""
+HTTP response helpers for Synapse
+orjson encoding, negotiated gzip/brotli compression and ETag revalidation
+"""
+import hashlib
+import json
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # Fall back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # Only gzip is offered without brotli
+    brotli = None
+
+# Server-sent events must reach the client frame by frame, uncompressed
+UNCOMPRESSED_CONTENT_TYPES = ("text/event-stream",)
+
+
+def dumps(content: Any) -> bytes:
+    """Encode content as compact JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def json_line(content: Any) -> bytes:
+    """Encode content as one NDJSON line"""
+    return dumps(content) + b"\n"
+
+
+def _text(value: Any) -> Any:
+    return value.decode("utf-8", "replace") if isinstance(value, bytes) else value
+
+
+def entry_body(entry_id: Any, fields: Dict[Any, Any]) -> Dict[str, Any]:
+    """{"id", "data"} of a stream entry, decoding what a bytes-mode client read"""
+    return {"id": _text(entry_id), "data": {_text(k): _text(v) for k, v in fields.items()}}
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson (used as the app's default response class)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def etag_for(body: bytes) -> str:
+    """Weak ETag derived from the encoded body"""
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: compressed and uncompressed variants share a tag
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def cached_json(request: Request, content: Any) -> Response:
+    """
+    JSON response carrying an ETag; 304 when the client already has it
+
+    For polled stats endpoints: the body is still computed, but unchanged
+    results skip the transfer (and compression) entirely.
+    """
+    body = dumps(content)
+    etag = etag_for(body)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick "br" or "gzip" from an Accept-Encoding header (None for identity)"""
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            weights[coding.strip().lower()] = quality
+
+    wildcard = weights.get("*", 0.0)
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best: Tuple[float, Optional[str]] = (0.0, None)
+    for coding in offered:
+        quality = weights.get(coding, wildcard)
+        if quality > best[0]:
+            best = (quality, coding)
+    return best[1]
+
+
+class _Compressor:
+    """Incremental gzip/brotli encoder that flushes after every chunk"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._gz = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._br.process(data) + self._br.flush()
+        return self._gz.compress(data) + self._gz.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._br.finish()
+        return self._gz.flush()
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses with the client's preferred encoding
+
+    Complete bodies below `minimum_size` are sent as-is. Streamed bodies
+    (NDJSON pages and replays) are compressed chunk by chunk with a flush
+    after each, so clients still see every line as it is produced.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4
+    ):
+        """Initialize compression middleware"""
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = negotiate_encoding(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = {k.lower(): v for k, v in start_message.get("headers", [])}
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                skip = (
+                    b"content-encoding" in headers
+                    or start_message["status"] in (204, 304)
+                    or content_type.startswith(UNCOMPRESSED_CONTENT_TYPES)
+                    or (not more_body and len(body) < self.minimum_size)
+                )
+                if skip:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                raw_headers = [
+                    (k, v) for k, v in start_message.get("headers", [])
+                    if k.lower() != b"content-length"
+                ]
+                raw_headers.append((b"content-encoding", encoding.encode()))
+                raw_headers.append((b"vary", b"Accept-Encoding"))
+                if not more_body:
+                    data = compressor.compress(body) + compressor.finish()
+                    raw_headers.append((b"content-length", str(len(data)).encode()))
+                    await send({**start_message, "headers": raw_headers})
+                    await send({"type": "http.response.body", "body": data})
+                    return
+                await send({**start_message, "headers": raw_headers})
+
+            data = compressor.compress(body) if body else b""
+            if not more_body:
+                data += compressor.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
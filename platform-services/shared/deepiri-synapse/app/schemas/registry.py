@@ -0,0 +1,520 @@
+"""
+Versioned schema registry for Synapse
+Stores schema versions in Redis, caches compiled validators in-process
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError, create_model
+
+logger = logging.getLogger(__name__)
+
+# Event header carrying the schema id the producer encoded against
+SCHEMA_ID_FIELD = "schema_id"
+
+# Redis keys for the persisted registry
+SCHEMAS_KEY = "synapse:schemas"
+SUBJECT_VERSIONS_KEY = "synapse:schemas:subjects"
+UPCASTERS_KEY = "synapse:schemas:upcasters"
+
+# Field type names accepted in registered schema definitions
+FIELD_TYPES: Dict[str, Any] = {
+    "string": str,
+    "integer": int,
+    "number": float,
+    "boolean": bool,
+    "object": Dict[str, Any],
+    "array": List[Any],
+    "any": Any,
+}
+
+Upcaster = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+# Operations a declarative upcaster may use, applied in this order
+UPCASTER_OPERATIONS = ("rename", "defaults", "drop")
+
+
+class SchemaCompatibilityError(ValueError):
+    """Raised when a new schema version breaks compatibility"""
+
+
+@dataclass(frozen=True)
+class SchemaVersion:
+    """One registered version of a subject's schema"""
+    subject: str
+    version: int
+    fields: Dict[str, Dict[str, Any]] = field(hash=False)
+    schema_id: str = ""
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "subject": self.subject,
+            "version": self.version,
+            "fields": self.fields,
+            "schema_id": self.schema_id,
+        }, sort_keys=True)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "SchemaVersion":
+        data = json.loads(raw)
+        return cls(
+            subject=data["subject"],
+            version=int(data["version"]),
+            fields=data["fields"],
+            schema_id=data["schema_id"],
+        )
+
+
+def compute_schema_id(subject: str, fields: Dict[str, Dict[str, Any]]) -> str:
+    """Derive a stable schema id from the subject and field definitions"""
+    canonical = json.dumps({"subject": subject, "fields": fields}, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def fields_from_model(model: Type[BaseModel]) -> Dict[str, Dict[str, Any]]:
+    """Describe a pydantic model's fields in registry form"""
+    type_names = {v: k for k, v in FIELD_TYPES.items() if isinstance(v, type)}
+    fields = {}
+    for name, info in model.model_fields.items():
+        annotation = info.annotation
+        type_name = type_names.get(annotation, "any")
+        fields[name] = {"type": type_name, "required": info.is_required()}
+    return fields
+
+
+def check_compatibility(
+    previous: SchemaVersion,
+    fields: Dict[str, Dict[str, Any]]
+) -> List[str]:
+    """
+    Check that a new field set can read events written with the previous one
+
+    New required fields and changed field types break old events; removed
+    fields and new optional fields do not.
+
+    Returns:
+        List of compatibility problems (empty when compatible)
+    """
+    problems = []
+    for name, spec in fields.items():
+        old = previous.fields.get(name)
+        if old is None:
+            if spec.get("required", False) and "default" not in spec:
+                problems.append(f"new required field '{name}' has no default")
+            continue
+        old_type = old.get("type", "any")
+        new_type = spec.get("type", "any")
+        if old_type != new_type and new_type != "any":
+            problems.append(f"field '{name}' changed type {old_type} -> {new_type}")
+    return problems
+
+
+def declarative_upcaster(spec: Dict[str, Any]) -> Upcaster:
+    """
+    Build an upcaster from {"rename": {old: new}, "defaults": {field: value}, "drop": [field]}
+
+    Defaults only fill fields the event doesn't have.
+
+    Raises:
+        ValueError: If the spec has unknown operations or malformed values
+    """
+    unknown = set(spec) - set(UPCASTER_OPERATIONS)
+    if unknown:
+        raise ValueError(f"Unknown upcaster operations: {', '.join(sorted(unknown))}")
+    rename = spec.get("rename") or {}
+    defaults = spec.get("defaults") or {}
+    drop = spec.get("drop") or []
+    if not isinstance(rename, dict) or not all(isinstance(v, str) for v in rename.values()):
+        raise ValueError("'rename' must map field names to field names")
+    if not isinstance(defaults, dict):
+        raise ValueError("'defaults' must map field names to values")
+    if not isinstance(drop, list) or not all(isinstance(f, str) for f in drop):
+        raise ValueError("'drop' must be a list of field names")
+
+    def upcast(event: Dict[str, Any]) -> Dict[str, Any]:
+        for old, new in rename.items():
+            if old in event:
+                event[new] = event.pop(old)
+        for name, value in defaults.items():
+            event.setdefault(name, value)
+        for name in drop:
+            event.pop(name, None)
+        return event
+    return upcast
+
+
+def compile_fields(
+    subject: str,
+    fields: Dict[str, Dict[str, Any]]
+) -> Type[BaseModel]:
+    """Build a pydantic model for a field definition"""
+    definitions = {}
+    for name, spec in fields.items():
+        type_name = spec.get("type", "any")
+        if type_name not in FIELD_TYPES:
+            raise ValueError(f"Unknown field type '{type_name}' for '{name}'")
+        annotation = FIELD_TYPES[type_name]
+        if spec.get("required", False):
+            definitions[name] = (annotation, ...)
+        else:
+            definitions[name] = (Optional[annotation], spec.get("default"))
+    model_name = "".join(part.capitalize() for part in subject.replace("/", "-").split("-"))
+    return create_model(f"{model_name or 'Event'}Schema", **definitions)
+
+
+class SchemaRegistry:
+    """
+    Registry of versioned event schemas
+
+    Subjects are either a stream name ("inference-events") or a stream and
+    event type pair ("model-events/model-ready"). Every version gets a
+    schema id that producers put in the event header; consumers look up
+    the compiled validator by that id and upcast old events on read.
+
+    Upcasters are either Python functions registered in-process (see
+    `register_upcaster`) or declarative specs registered through the API,
+    which are persisted in Redis so every replica applies them.
+    """
+
+    def __init__(self, redis_client=None, cache_size: int = 256):
+        """Initialize schema registry"""
+        self.redis = redis_client
+        self.cache_size = cache_size
+        self._versions: Dict[str, SchemaVersion] = {}
+        self._subjects: Dict[str, List[SchemaVersion]] = {}
+        self._models: Dict[str, Type[BaseModel]] = {}
+        self._compiled: "OrderedDict[str, Type[BaseModel]]" = OrderedDict()
+        self._upcasters: Dict[Tuple[str, int], Upcaster] = {}
+        self._declared: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    # Registration
+
+    def register_model(
+        self,
+        subject: str,
+        model: Type[BaseModel],
+        version: Optional[int] = None
+    ) -> SchemaVersion:
+        """Register a built-in pydantic model as a subject version (local only)"""
+        fields = fields_from_model(model)
+        schema_version = self._add_version(subject, fields, version)
+        self._models[schema_version.schema_id] = model
+        return schema_version
+
+    async def register(
+        self,
+        subject: str,
+        fields: Dict[str, Dict[str, Any]],
+        check: bool = True
+    ) -> SchemaVersion:
+        """
+        Register a new schema version and persist it to Redis
+
+        Raises:
+            SchemaCompatibilityError: If the fields break the latest version
+        """
+        compile_fields(subject, fields)  # Reject unknown types early
+        existing = self._versions.get(compute_schema_id(subject, fields))
+        if existing is not None:
+            return existing
+
+        if self.redis is not None:
+            await self.load()
+
+        latest = self.latest(subject)
+        if check and latest is not None:
+            problems = check_compatibility(latest, fields)
+            if problems:
+                raise SchemaCompatibilityError(
+                    f"Schema for '{subject}' is incompatible with v{latest.version}: "
+                    + "; ".join(problems)
+                )
+
+        next_version = (latest.version if latest else 0) + 1
+        if self.redis is not None:
+            schema_id = compute_schema_id(subject, fields)
+            claimed = await self.redis.hsetnx(
+                SUBJECT_VERSIONS_KEY, f"{subject}:{next_version}", schema_id
+            )
+            if not claimed:
+                raise SchemaCompatibilityError(
+                    f"Version {next_version} of '{subject}' was registered concurrently, retry"
+                )
+        schema_version = self._add_version(subject, fields, next_version)
+        if self.redis is not None:
+            await self.redis.hset(SCHEMAS_KEY, schema_version.schema_id, schema_version.to_json())
+        logger.info(f"Registered schema {subject} v{schema_version.version} ({schema_version.schema_id})")
+        return schema_version
+
+    def register_upcaster(self, subject: str, from_version: int, upcaster: Upcaster):
+        """Register a function migrating events from `from_version` to the next version"""
+        self._upcasters[(subject, from_version)] = upcaster
+        self._declared.pop((subject, from_version), None)
+
+    async def register_declared_upcaster(
+        self,
+        subject: str,
+        from_version: int,
+        spec: Dict[str, Any]
+    ):
+        """
+        Register a declarative upcaster (see `declarative_upcaster`) and persist it to Redis
+
+        Raises:
+            ValueError: If the spec is malformed or the subject has no such version
+        """
+        upcaster = declarative_upcaster(spec)
+        if self.redis is not None:
+            await self.load()
+        if not any(v.version == from_version for v in self._subjects.get(subject, [])):
+            raise ValueError(f"'{subject}' has no version {from_version}")
+        if self.redis is not None:
+            await self.redis.hset(
+                UPCASTERS_KEY, f"{subject}:{from_version}", json.dumps(spec, sort_keys=True)
+            )
+        self._upcasters[(subject, from_version)] = upcaster
+        self._declared[(subject, from_version)] = spec
+        logger.info(f"Registered upcaster for {subject} v{from_version}")
+
+    def upcasters(self) -> List[Dict[str, Any]]:
+        """Registered upcasters, with the spec of declarative ones"""
+        return [
+            {"subject": subject, "from_version": version, "spec": self._declared.get((subject, version))}
+            for subject, version in sorted(self._upcasters)
+        ]
+
+    async def load(self):
+        """Pull schema versions and declarative upcasters persisted in Redis into the local cache"""
+        if self.redis is None:
+            return
+        raw_versions = await self.redis.hgetall(SCHEMAS_KEY)
+        for schema_id, raw in raw_versions.items():
+            if isinstance(schema_id, bytes):
+                schema_id, raw = schema_id.decode(), raw.decode()
+            if schema_id in self._versions:
+                continue
+            schema_version = SchemaVersion.from_json(raw)
+            self._index(schema_version)
+
+        raw_upcasters = await self.redis.hgetall(UPCASTERS_KEY)
+        for name, raw in raw_upcasters.items():
+            if isinstance(name, bytes):
+                name, raw = name.decode(), raw.decode()
+            subject, _, version = name.rpartition(":")
+            key = (subject, int(version))
+            if key in self._upcasters and key not in self._declared:
+                continue  # In-process functions take precedence
+            spec = json.loads(raw)
+            if self._declared.get(key) != spec:
+                self._upcasters[key] = declarative_upcaster(spec)
+                self._declared[key] = spec
+
+    async def attach(self, redis_client):
+        """Bind a Redis client and load persisted versions"""
+        self.redis = redis_client
+        await self.load()
+
+    async def _refresh_loop(self, interval_seconds: float):
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.load()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Reloading schemas failed: {e}")
+
+    def start(self, interval_seconds: float):
+        """Reload from Redis in the background, picking up other replicas' registrations"""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop(interval_seconds))
+
+    async def stop(self):
+        """Stop background reloading"""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    # Lookup
+
+    def get(self, schema_id: str) -> Optional[SchemaVersion]:
+        """Get a schema version by id"""
+        return self._versions.get(schema_id)
+
+    def latest(self, subject: str) -> Optional[SchemaVersion]:
+        """Get the latest version of a subject"""
+        versions = self._subjects.get(subject)
+        return versions[-1] if versions else None
+
+    def versions(self, subject: str) -> List[SchemaVersion]:
+        """Get all versions of a subject, oldest first"""
+        return list(self._subjects.get(subject, []))
+
+    def subjects(self) -> List[str]:
+        """List registered subjects"""
+        return sorted(self._subjects)
+
+    def resolve_subject(self, stream_name: str, event_type: Optional[str]) -> Optional[str]:
+        """Find the subject for an event, preferring the stream/event-type pair"""
+        if event_type:
+            subject = f"{stream_name}/{event_type}"
+            if subject in self._subjects:
+                return subject
+        if stream_name in self._subjects:
+            return stream_name
+        return None
+
+    def validator_for(self, schema_id: str) -> Type[BaseModel]:
+        """Get the compiled validator for a schema id (LRU cached)"""
+        model = self._models.get(schema_id)
+        if model is not None:
+            return model
+
+        compiled = self._compiled.get(schema_id)
+        if compiled is not None:
+            self.cache_hits += 1
+            self._compiled.move_to_end(schema_id)
+            return compiled
+
+        self.cache_misses += 1
+        schema_version = self._versions.get(schema_id)
+        if schema_version is None:
+            raise KeyError(f"Unknown schema id '{schema_id}'")
+        compiled = compile_fields(schema_version.subject, schema_version.fields)
+        self._compiled[schema_id] = compiled
+        if len(self._compiled) > self.cache_size:
+            self._compiled.popitem(last=False)
+        return compiled
+
+    # Read path
+
+    def upcast(self, event_data: Dict[str, Any], schema_version: SchemaVersion) -> Tuple[Dict[str, Any], SchemaVersion]:
+        """Migrate an event written against an old version to the subject's latest"""
+        by_version = {v.version: v for v in self._subjects.get(schema_version.subject, [])}
+        current = schema_version
+        data = event_data
+        while current.version + 1 in by_version:
+            upcaster = self._upcasters.get((current.subject, current.version))
+            if upcaster is None:
+                break
+            data = upcaster(dict(data))
+            current = by_version[current.version + 1]
+            data[SCHEMA_ID_FIELD] = current.schema_id
+        return data, current
+
+    def upcast_fields(self, fields: Dict[Any, Any]) -> Dict[Any, Any]:
+        """
+        Stream entry fields migrated to the latest version of their schema
+
+        For consumers reading entries back from Redis. Entries without a
+        schema id, with an unknown one, or already at a version no upcaster
+        starts from are returned as they are, so the common case costs one
+        lookup. Bytes-mode entries are decoded for the upcasters and
+        re-encoded, so callers get back the kind of dict they passed in.
+        """
+        schema_id = fields.get(SCHEMA_ID_FIELD)
+        raw = schema_id is None
+        if raw:
+            schema_id = fields.get(SCHEMA_ID_FIELD.encode())
+            if schema_id is None:
+                return fields
+            schema_id = schema_id.decode("utf-8", "replace")
+        schema_version = self._versions.get(schema_id)
+        if schema_version is None or (schema_version.subject, schema_version.version) not in self._upcasters:
+            return fields
+
+        if raw:
+            fields = {
+                k.decode("utf-8", "replace"): v.decode("utf-8", "replace") if isinstance(v, bytes) else v
+                for k, v in fields.items()
+            }
+        data, _ = self.upcast(fields, schema_version)
+        if raw:
+            return {
+                k.encode(): v if isinstance(v, bytes) else str(v).encode() for k, v in data.items()
+            }
+        return data
+
+    def validate(
+        self,
+        stream_name: str,
+        event_data: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], Optional[SchemaVersion]]:
+        """
+        Validate an event, upcasting it first when it names an older schema
+
+        Returns:
+            Tuple of (possibly upcast event dict, schema version used)
+
+        Raises:
+            ValueError: If the event is invalid or names an unknown schema
+        """
+        schema_id = event_data.get(SCHEMA_ID_FIELD)
+        if schema_id:
+            schema_version = self._versions.get(schema_id)
+            if schema_version is None:
+                raise ValueError(f"Unknown schema id '{schema_id}'")
+            event_data, schema_version = self.upcast(event_data, schema_version)
+        else:
+            subject = self.resolve_subject(stream_name, event_data.get("event"))
+            if subject is None:
+                return event_data, None
+            schema_version = self.latest(subject)
+
+        model = self.validator_for(schema_version.schema_id)
+        payload = {k: v for k, v in event_data.items() if k != SCHEMA_ID_FIELD}
+        try:
+            model(**payload)
+        except ValidationError as e:
+            raise ValueError(f"Invalid event schema: {e}")
+        return event_data, schema_version
+
+    def stats(self) -> Dict[str, Any]:
+        """Registry cache statistics"""
+        return {
+            "subjects": len(self._subjects),
+            "versions": len(self._versions),
+            "compiled_cached": len(self._compiled),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
+
+    # Internals
+
+    def _add_version(
+        self,
+        subject: str,
+        fields: Dict[str, Dict[str, Any]],
+        version: Optional[int] = None
+    ) -> SchemaVersion:
+        schema_id = compute_schema_id(subject, fields)
+        existing = self._versions.get(schema_id)
+        if existing is not None:
+            return existing
+        next_version = len(self._subjects.get(subject, [])) + 1
+        schema_version = SchemaVersion(
+            subject=subject,
+            version=version or next_version,
+            fields=fields,
+            schema_id=schema_id,
+        )
+        self._index(schema_version)
+        return schema_version
+
+    def _index(self, schema_version: SchemaVersion):
+        self._versions[schema_version.schema_id] = schema_version
+        versions = self._subjects.setdefault(schema_version.subject, [])
+        versions.append(schema_version)
+        versions.sort(key=lambda v: v.version)
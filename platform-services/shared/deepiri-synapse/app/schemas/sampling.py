@@ -0,0 +1,160 @@
+"""
+Sampled validation for Synapse
+Per-stream policies that decide which events pay the full schema validation cost
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Set, Tuple
+
+from .registry import SCHEMA_ID_FIELD, SchemaRegistry
+
+ALWAYS = "always"
+SAMPLE = "sample"
+SHAPE = "shape"
+
+# Producers past the tracking limit are counted under this name
+OTHER_PRODUCERS = "other"
+
+
+@dataclass(frozen=True)
+class ValidationPolicy:
+    """How often events on a stream are validated"""
+    mode: str = ALWAYS
+    sample_every: int = 1
+
+    @classmethod
+    def parse(cls, spec: str) -> "ValidationPolicy":
+        """
+        Parse a policy spec: "always", "sample:<N>" (1-in-N) or "shape"
+        (validate only key sets not seen before)
+        """
+        spec = spec.strip().lower()
+        if spec == ALWAYS:
+            return cls(ALWAYS)
+        if spec == SHAPE:
+            return cls(SHAPE)
+        if spec.startswith(f"{SAMPLE}:"):
+            every = int(spec.split(":", 1)[1])
+            if every < 1:
+                raise ValueError(f"Sample rate must be >= 1 in '{spec}'")
+            return cls(SAMPLE, every)
+        raise ValueError(f"Unknown validation policy '{spec}'")
+
+
+def parse_policies(spec: str) -> Dict[str, ValidationPolicy]:
+    """Parse "stream=policy,stream=policy" into a policy map"""
+    policies = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        stream_name, _, policy = item.partition("=")
+        policies[stream_name.strip()] = ValidationPolicy.parse(policy)
+    return policies
+
+
+class SamplingValidator:
+    """
+    Applies per-stream validation policies and tracks outcomes
+
+    Only the validation step is sampled: every event is still upcast to
+    the latest version of its schema. Outcomes are tracked for at most
+    `max_producers` producer names; later ones are counted as "other".
+    """
+
+    def __init__(
+        self,
+        registry: SchemaRegistry,
+        policies: Optional[Dict[str, ValidationPolicy]] = None,
+        default_policy: ValidationPolicy = ValidationPolicy(),
+        max_shapes: int = 10000,
+        max_producers: int = 1000
+    ):
+        """Initialize sampling validator"""
+        self.registry = registry
+        self.policies = policies or {}
+        self.default_policy = default_policy
+        self.max_shapes = max_shapes
+        self.max_producers = max_producers
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._shapes: Set[Tuple[str, int]] = set()
+        self.by_schema: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"validated": 0, "failed": 0, "skipped": 0}
+        )
+        self.by_producer: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"validated": 0, "failed": 0}
+        )
+
+    def policy_for(self, stream_name: str) -> ValidationPolicy:
+        """Get the policy for a stream"""
+        return self.policies.get(stream_name, self.default_policy)
+
+    def _shape_key(self, stream_name: str, event_data: Dict[str, Any]) -> Tuple[str, int]:
+        shape = (event_data.get("event"), event_data.get(SCHEMA_ID_FIELD), frozenset(event_data))
+        return stream_name, hash(shape)
+
+    def should_validate(self, stream_name: str, event_data: Dict[str, Any]) -> bool:
+        """Decide whether this event gets full validation"""
+        policy = self.policy_for(stream_name)
+        if policy.mode == SAMPLE:
+            self._counters[stream_name] += 1
+            return (self._counters[stream_name] - 1) % policy.sample_every == 0
+        if policy.mode == SHAPE:
+            return self._shape_key(stream_name, event_data) not in self._shapes
+        return True
+
+    def _producer_counts(self, producer: str) -> Dict[str, int]:
+        if producer not in self.by_producer and len(self.by_producer) >= self.max_producers:
+            producer = OTHER_PRODUCERS
+        return self.by_producer[producer]
+
+    def validate(
+        self,
+        stream_name: str,
+        event_data: Dict[str, Any],
+        producer: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Validate an event if its stream policy selects it
+
+        Raises:
+            ValueError: If a selected event is invalid
+        """
+        schema_key = (
+            event_data.get(SCHEMA_ID_FIELD)
+            or self.registry.resolve_subject(stream_name, event_data.get("event"))
+            or stream_name
+        )
+        if not self.should_validate(stream_name, event_data):
+            self.by_schema[schema_key]["skipped"] += 1
+            return self.registry.upcast_fields(event_data)
+
+        producer = producer or event_data.get("producer") or event_data.get("service") or "unknown"
+        counts = self._producer_counts(str(producer))
+        try:
+            validated, _ = self.registry.validate(stream_name, event_data)
+        except ValueError:
+            self.by_schema[schema_key]["failed"] += 1
+            counts["failed"] += 1
+            raise
+
+        self.by_schema[schema_key]["validated"] += 1
+        counts["validated"] += 1
+        if self.policy_for(stream_name).mode == SHAPE:
+            if len(self._shapes) >= self.max_shapes:
+                self._shapes.clear()
+            self._shapes.add(self._shape_key(stream_name, event_data))
+        return validated
+
+    def stats(self) -> Dict[str, Any]:
+        """Validation outcomes with failure rates per schema and per producer"""
+        def with_rate(counts: Dict[str, int]) -> Dict[str, Any]:
+            checked = counts["validated"] + counts["failed"]
+            return {**counts, "failure_rate": counts["failed"] / checked if checked else 0.0}
+
+        return {
+            "policies": {
+                name: policy.mode if policy.mode != SAMPLE else f"{SAMPLE}:{policy.sample_every}"
+                for name, policy in self.policies.items()
+            },
+            "shapes_cached": len(self._shapes),
+            "by_schema": {k: with_rate(v) for k, v in self.by_schema.items()},
+            "by_producer": {k: with_rate(v) for k, v in self.by_producer.items()},
+        }
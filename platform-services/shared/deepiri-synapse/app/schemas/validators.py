@@ -2,8 +2,11 @@
 Event schema validators
 Validates events against deepiri-modelkit schemas
 """
-from typing import Dict, Any
-from pydantic import ValidationError
+import importlib
+from typing import Dict, Any, List, Optional
+
+from .registry import SchemaRegistry
+from .sampling import SamplingValidator, ValidationPolicy
 
 # Import from modelkit (would need to install it)
 try:
@@ -18,43 +21,83 @@ try:
 except ImportError:
     MODELKIT_AVAILABLE = False
 
+try:
+    from deepiri_modelkit.contracts.events import ModelLoadedEvent
+except ImportError:
+    ModelLoadedEvent = None
+
+
+def build_default_registry() -> SchemaRegistry:
+    """Create a registry seeded with the modelkit event models as version 1"""
+    registry = SchemaRegistry()
+    if not MODELKIT_AVAILABLE:
+        return registry
+
+    registry.register_model("model-events/model-ready", ModelReadyEvent)
+    if ModelLoadedEvent is not None:
+        registry.register_model("model-events/model-loaded", ModelLoadedEvent)
+    registry.register_model("inference-events", InferenceEvent)
+    registry.register_model("platform-events", PlatformEvent)
+    registry.register_model("agi-decisions", AGIDecisionEvent)
+    registry.register_model("training-events", TrainingEvent)
+    return registry
+
+
+# Process-wide registry; main.py attaches the Redis client at startup
+schema_registry = build_default_registry()
+
+# Validates every event until configure_validation() installs stream policies
+sampling_validator = SamplingValidator(schema_registry)
+
+
+def configure_validation(
+    policies: Dict[str, ValidationPolicy],
+    default_policy: Optional[ValidationPolicy] = None
+):
+    """Install per-stream validation policies (always, sample 1-in-N, first-seen shape)"""
+    sampling_validator.policies = dict(policies)
+    if default_policy is not None:
+        sampling_validator.default_policy = default_policy
 
-def validate_event(stream_name: str, event_data: Dict[str, Any]) -> Dict[str, Any]:
+
+def install_upcaster_modules(module_names: List[str]):
+    """
+    Import each module and call its register_upcasters(schema_registry)
+
+    The startup hook for upcasters written in Python; declarative ones can
+    be registered through the API instead.
+    """
+    for name in module_names:
+        module = importlib.import_module(name)
+        module.register_upcasters(schema_registry)
+
+
+def validate_event(
+    stream_name: str,
+    event_data: Dict[str, Any],
+    producer: Optional[str] = None
+) -> Dict[str, Any]:
     """
     Validate event against schema
-    
+
+    Events carrying a `schema_id` header are validated against that version
+    (after upcasting to the latest one); others use the latest version
+    registered for the stream or stream/event-type subject. The stream's
+    validation policy may skip events that were sampled out or whose shape
+    already passed.
+
     Args:
         stream_name: Stream name
         event_data: Event data
-    
+        producer: Producer id used for failure-rate metrics
+
     Returns:
-        Validated event dict
-    
+        Validated (possibly upcast) event dict
+
     Raises:
-        ValidationError: If event is invalid
+        ValueError: If event is invalid
     """
-    if not MODELKIT_AVAILABLE:
+    if not MODELKIT_AVAILABLE and not schema_registry.subjects():
         return event_data  # Skip validation if modelkit not available
-    
-    event_type = event_data.get("event")
-    
-    try:
-        if stream_name == "model-events":
-            if event_type == "model-ready":
-                ModelReadyEvent(**event_data)
-            elif event_type == "model-loaded":
-                # ModelLoadedEvent(**event_data)
-                pass
-        elif stream_name == "inference-events":
-            InferenceEvent(**event_data)
-        elif stream_name == "platform-events":
-            PlatformEvent(**event_data)
-        elif stream_name == "agi-decisions":
-            AGIDecisionEvent(**event_data)
-        elif stream_name == "training-events":
-            TrainingEvent(**event_data)
-    except ValidationError as e:
-        raise ValueError(f"Invalid event schema: {e}")
-    
-    return event_data
 
+    return sampling_validator.validate(stream_name, event_data, producer=producer)
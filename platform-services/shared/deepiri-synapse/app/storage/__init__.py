@@ -0,0 +1 @@
+"""Blob and archive storage backends"""
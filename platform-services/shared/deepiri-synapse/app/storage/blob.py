@@ -0,0 +1,167 @@
+"""
+Blob stores for Synapse
+Local filesystem (or mounted volume) and S3/MinIO-compatible object storage
+"""
+import os
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import parse_qs, urlparse
+
+# S3/MinIO support (optional dependency)
+try:
+    import boto3
+    BOTO3_AVAILABLE = True
+except ImportError:
+    BOTO3_AVAILABLE = False
+
+
+class BlobStore(ABC):
+    """Minimal immutable-object store (calls are blocking; use asyncio.to_thread)"""
+
+    @abstractmethod
+    def put(self, key: str, data: bytes):
+        """Write an object"""
+
+    @abstractmethod
+    def get(self, key: str, offset: int = 0, length: Optional[int] = None) -> bytes:
+        """Read an object, or a byte range of it"""
+
+    @abstractmethod
+    def list(self, prefix: str) -> List[str]:
+        """List object keys under a prefix"""
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Delete an object"""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """Check whether an object exists"""
+
+
+class LocalBlobStore(BlobStore):
+    """Objects as files under a root directory"""
+
+    def __init__(self, root: str):
+        """Initialize local blob store"""
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if self.root.resolve() not in path.parents:
+            raise ValueError(f"Blob key escapes store root: {key}")
+        return path
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)  # Readers never see a partial object
+
+    def get(self, key: str, offset: int = 0, length: Optional[int] = None) -> bytes:
+        with open(self._path(key), "rb") as f:
+            f.seek(offset)
+            return f.read() if length is None else f.read(length)
+
+    def list(self, prefix: str) -> List[str]:
+        base = self._path(prefix) if prefix else self.root
+        if not base.exists():
+            return []
+        return sorted(
+            str(p.relative_to(self.root)).replace(os.sep, "/")
+            for p in base.rglob("*")
+            if p.is_file() and not p.name.endswith(".tmp")
+        )
+
+    def delete(self, key: str):
+        self._path(key).unlink(missing_ok=True)
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).is_file()
+
+
+class S3BlobStore(BlobStore):
+    """Objects in an S3-compatible bucket (MinIO in local deployments)"""
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        access_key: Optional[str] = None,
+        secret_key: Optional[str] = None,
+        region: str = "us-east-1"
+    ):
+        """Initialize S3 blob store"""
+        if not BOTO3_AVAILABLE:
+            raise RuntimeError("boto3 is required for s3:// blob stores")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            region_name=region
+        )
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def put(self, key: str, data: bytes):
+        self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data)
+
+    def get(self, key: str, offset: int = 0, length: Optional[int] = None) -> bytes:
+        kwargs = {"Bucket": self.bucket, "Key": self._key(key)}
+        if offset or length is not None:
+            end = "" if length is None else str(offset + length - 1)
+            kwargs["Range"] = f"bytes={offset}-{end}"
+        return self.client.get_object(**kwargs)["Body"].read()
+
+    def list(self, prefix: str) -> List[str]:
+        keys = []
+        strip = len(self.prefix) + 1 if self.prefix else 0
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            keys.extend(obj["Key"][strip:] for obj in page.get("Contents", []))
+        return sorted(keys)
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except self.client.exceptions.ClientError:
+            return False
+
+
+def blob_store_from_url(url: str) -> BlobStore:
+    """
+    Create a blob store from a URL
+
+    - file:///data/synapse-archive (or a plain path) for a local/mounted directory
+    - s3://bucket/prefix?endpoint=http://minio:9000 for S3/MinIO; credentials
+      come from STORAGE_ACCESS_KEY_ID / STORAGE_SECRET_ACCESS_KEY
+    """
+    parsed = urlparse(url)
+    if parsed.scheme in ("", "file"):
+        return LocalBlobStore(parsed.path or url)
+    if parsed.scheme == "s3":
+        query = parse_qs(parsed.query)
+        return S3BlobStore(
+            bucket=parsed.netloc,
+            prefix=parsed.path,
+            endpoint_url=query.get("endpoint", [os.getenv("STORAGE_ENDPOINT")])[0],
+            access_key=os.getenv("STORAGE_ACCESS_KEY_ID"),
+            secret_key=os.getenv("STORAGE_SECRET_ACCESS_KEY"),
+            region=os.getenv("STORAGE_REGION", "us-east-1")
+        )
+    raise ValueError(f"Unsupported blob store URL: {url}")
@@ -0,0 +1,148 @@
+"""
+Claim-check offloading for Synapse
+Large field values go to a blob store; the stream entry keeps a small reference
+"""
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+from ..monitoring.prometheus import CACHE_LOOKUPS
+from .blob import BlobStore
+
+_MARKER = '{"claim_check":'
+
+
+@dataclass(frozen=True)
+class ClaimRef:
+    """Where an offloaded value lives, how to check it, and whether it was bytes"""
+    key: str
+    size: int
+    sha256: str
+    binary: bool = False
+
+    def encode(self) -> str:
+        """Field value that replaces the offloaded one"""
+        ref: Dict[str, Any] = {"key": self.key, "size": self.size, "sha256": self.sha256}
+        if self.binary:
+            ref["binary"] = True
+        return json.dumps({"claim_check": ref}, separators=(",", ":"))
+
+    @classmethod
+    def parse(cls, value: Any) -> Optional["ClaimRef"]:
+        """The reference in a field value, or None for an ordinary value"""
+        if not isinstance(value, str) or not value.startswith(_MARKER):
+            return None
+        try:
+            ref = json.loads(value)["claim_check"]
+            return cls(ref["key"], int(ref["size"]), ref["sha256"], bool(ref.get("binary", False)))
+        except (ValueError, KeyError, TypeError):
+            return None
+
+
+def claim_key(digest: str) -> str:
+    """Content-addressed blob key, so identical payloads are stored once"""
+    return f"claims/{digest[:2]}/{digest}"
+
+
+class ClaimCheck:
+    """
+    Offloads large field values and resolves them back
+
+    Values above `threshold_bytes` are written to the blob store under their
+    SHA-256 and replaced by a ClaimRef. Consumers resolve only the fields
+    they read; resolved values are checked against the hash and kept in an
+    LRU cache of up to `cache_bytes`, since blobs never change. A value
+    offloaded as bytes resolves to bytes, a str to str.
+    """
+
+    def __init__(
+        self,
+        store: BlobStore,
+        threshold_bytes: int = 64 * 1024,
+        cache_bytes: int = 64 * 1024 ** 2
+    ):
+        """Initialize claim check"""
+        self.store = store
+        self.threshold_bytes = threshold_bytes
+        self.cache_bytes = cache_bytes
+        self._cache: "OrderedDict[Tuple[str, bool], Tuple[Union[str, bytes], int]]" = OrderedDict()
+        self._cached_bytes = 0
+        self.offloaded = 0
+        self.offloaded_bytes = 0
+        self.resolved = 0
+        self.cache_hits = 0
+
+    async def offload(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of `fields` with values above the threshold replaced by references"""
+        result = dict(fields)
+        for name, value in fields.items():
+            if not isinstance(value, (str, bytes)):
+                continue
+            data = value.encode("utf-8") if isinstance(value, str) else value
+            if len(data) <= self.threshold_bytes:
+                continue
+            digest = hashlib.sha256(data).hexdigest()
+            key = claim_key(digest)
+            if not await asyncio.to_thread(self.store.exists, key):
+                await asyncio.to_thread(self.store.put, key, data)
+            result[name] = ClaimRef(key, len(data), digest, isinstance(value, bytes)).encode()
+            self.offloaded += 1
+            self.offloaded_bytes += len(data)
+        return result
+
+    async def resolve(self, value: Any) -> Any:
+        """The original value behind a reference (other values pass through)"""
+        ref = ClaimRef.parse(value)
+        if ref is None:
+            return value
+        cache_key = (ref.sha256, ref.binary)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            self._cache.move_to_end(cache_key)
+            self.cache_hits += 1
+            CACHE_LOOKUPS.labels("claim_check", "hit").inc()
+            return cached[0]
+        CACHE_LOOKUPS.labels("claim_check", "miss").inc()
+
+        data = await asyncio.to_thread(self.store.get, ref.key)
+        if len(data) != ref.size or hashlib.sha256(data).hexdigest() != ref.sha256:
+            raise ValueError(f"Claim-check blob {ref.key} doesn't match its reference")
+        resolved = data if ref.binary else data.decode("utf-8")
+        self.resolved += 1
+        self._remember(cache_key, resolved, ref.size)
+        return resolved
+
+    async def resolve_fields(
+        self,
+        fields: Dict[str, Any],
+        names: Optional[Iterable[str]] = None
+    ) -> Dict[str, Any]:
+        """Copy of `fields` with references resolved (only `names`, if given)"""
+        wanted = set(fields) if names is None else set(names) & set(fields)
+        result = dict(fields)
+        for name in wanted:
+            result[name] = await self.resolve(fields[name])
+        return result
+
+    def _remember(self, cache_key: Tuple[str, bool], value: Union[str, bytes], size: int):
+        if size > self.cache_bytes:
+            return
+        self._cache[cache_key] = (value, size)
+        self._cached_bytes += size
+        while self._cached_bytes > self.cache_bytes:
+            _, (_, evicted_size) = self._cache.popitem(last=False)
+            self._cached_bytes -= evicted_size
+
+    def stats(self) -> Dict[str, Any]:
+        """Claim-check metrics for the metrics endpoint"""
+        return {
+            "threshold_bytes": self.threshold_bytes,
+            "offloaded": self.offloaded,
+            "offloaded_bytes": self.offloaded_bytes,
+            "resolved": self.resolved,
+            "cache_hits": self.cache_hits,
+            "cached_bytes": self._cached_bytes,
+        }
@@ -0,0 +1,113 @@
+"""
+Archive segment format for Synapse
+A segment is a run of zlib-compressed columnar chunks plus a sparse JSON index
+"""
+import json
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..streams.ids import parse_id
+
+Entry = Tuple[str, Dict[str, Any]]
+
+SEGMENT_SUFFIX = ".seg"
+INDEX_SUFFIX = ".idx"
+
+
+def _text(value: Any) -> Any:
+    return value.decode("utf-8", "replace") if isinstance(value, bytes) else value
+
+
+def encode_chunk(entries: List[Entry]) -> bytes:
+    """
+    Encode entries as one compressed chunk
+
+    Fields are stored column-wise ({"ids": [...], "columns": {field: [...]}})
+    so repeated field names are written once per chunk and similar values
+    sit next to each other, which compresses well.
+    """
+    ids = []
+    columns: Dict[str, List[Any]] = {}
+    for row, (entry_id, fields) in enumerate(entries):
+        ids.append(_text(entry_id))
+        for name, value in fields.items():
+            column = columns.setdefault(_text(name), [None] * row)
+            column.append(_text(value))
+        for column in columns.values():
+            if len(column) < row + 1:
+                column.append(None)
+    payload = json.dumps({"ids": ids, "columns": columns}, separators=(",", ":"))
+    return zlib.compress(payload.encode("utf-8"), 6)
+
+
+def decode_chunk(data: bytes) -> List[Entry]:
+    """Decode a chunk back into (id, fields) entries"""
+    payload = json.loads(zlib.decompress(data))
+    columns = payload["columns"]
+    entries = []
+    for row, entry_id in enumerate(payload["ids"]):
+        fields = {
+            name: values[row]
+            for name, values in columns.items()
+            if values[row] is not None
+        }
+        entries.append((entry_id, fields))
+    return entries
+
+
+def build_segment(
+    stream_name: str,
+    entries: List[Entry],
+    chunk_size: int = 1000
+) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Build segment bytes and its sparse index
+
+    The index records the first/last ID, byte offset and length of every
+    chunk, so readers can seek straight to the chunk holding an ID.
+    """
+    body = bytearray()
+    chunks = []
+    for start in range(0, len(entries), chunk_size):
+        chunk_entries = entries[start:start + chunk_size]
+        data = encode_chunk(chunk_entries)
+        chunks.append({
+            "first_id": _text(chunk_entries[0][0]),
+            "last_id": _text(chunk_entries[-1][0]),
+            "offset": len(body),
+            "length": len(data),
+            "count": len(chunk_entries),
+        })
+        body.extend(data)
+    index = {
+        "stream": stream_name,
+        "first_id": chunks[0]["first_id"],
+        "last_id": chunks[-1]["last_id"],
+        "count": len(entries),
+        "bytes": len(body),
+        "chunks": chunks,
+    }
+    return bytes(body), index
+
+
+def segment_key(stream_name: str, first_id: str, last_id: str, suffix: str) -> str:
+    """Object key for a segment (or its index)"""
+    return f"{stream_name}/{first_id}_{last_id}{suffix}"
+
+
+def chunks_in_range(
+    index: Dict[str, Any],
+    start_id: Optional[str] = None,
+    end_id: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Chunks of a segment that may hold IDs within [start_id, end_id]"""
+    start = parse_id(start_id) if start_id else None
+    end = parse_id(end_id) if end_id else None
+    selected = []
+    for chunk in index["chunks"]:
+        if start and parse_id(chunk["last_id"]) < start:
+            continue
+        if end and parse_id(chunk["first_id"]) > end:
+            break
+        selected.append(chunk)
+    return selected
@@ -0,0 +1,132 @@
+"""
+Message browser for Synapse
+Cursor-paginated, filtered and projected reads of a stream
+"""
+import redis.asyncio as redis
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from ..schemas.registry import SchemaRegistry
+from .filters import Filters, matches
+from .ids import merge_entries
+from .partitions import StreamPartitioner
+
+Entry = Tuple[str, Dict[str, Any]]
+
+
+@dataclass
+class PageQuery:
+    """One page request against a stream (`cursor` is a previous page's next_cursor)"""
+    stream_name: str
+    count: int = 10
+    start_id: Optional[str] = None
+    end_id: Optional[str] = None
+    cursor: Optional[str] = None
+    descending: bool = True
+    filters: Filters = field(default_factory=dict)
+    fields: Optional[List[str]] = None
+
+
+@dataclass
+class PageState:
+    """Progress of a page read; next_cursor is set once the page is exhausted"""
+    returned: int = 0
+    scanned: int = 0
+    next_cursor: Optional[str] = None
+
+
+class MessageBrowser:
+    """Reads stream pages in fixed-size batches without materializing the page"""
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        batch_size: int = 500,
+        max_scan_factor: int = 10,
+        schema_registry: Optional[SchemaRegistry] = None,
+        partitioner: Optional[StreamPartitioner] = None
+    ):
+        """
+        Initialize message browser
+
+        Filtered pages scan at most `max_scan_factor` x count entries; the
+        cursor then points at the last scanned entry so the next page
+        resumes there instead of rescanning. With a schema registry, entries
+        are upcast to the latest version of their schema before filtering
+        and projection. A partitioned stream is read from every partition
+        and merged by ID; its cursor holds each partition's position.
+        """
+        self.redis = redis_client
+        self.batch_size = batch_size
+        self.max_scan_factor = max_scan_factor
+        self.schema_registry = schema_registry
+        self.partitioner = partitioner or StreamPartitioner()
+
+    async def _read_key(
+        self,
+        key: str,
+        query: PageQuery,
+        bound: Optional[str],
+        count: int
+    ) -> List[Entry]:
+        if query.descending:
+            upper = f"({bound}" if bound else (query.end_id or "+")
+            return await self.redis.xrevrange(key, max=upper, min=query.start_id or "-", count=count)
+        lower = f"({bound}" if bound else (query.start_id or "-")
+        return await self.redis.xrange(key, min=lower, max=query.end_id or "+", count=count)
+
+    async def _read(
+        self,
+        query: PageQuery,
+        bounds: Dict[str, str],
+        count: int
+    ) -> List[Tuple[Any, Dict[str, Any], str]]:
+        """Next `count` entries past each key's bound, as (id, fields, key)"""
+        batches = [
+            [(entry_id, data, key) for entry_id, data in await self._read_key(
+                key, query, bounds.get(key), count
+            )]
+            for key in self.partitioner.partitions(query.stream_name)
+        ]
+        if len(batches) == 1:
+            return batches[0]
+        # The next `count` entries overall are among each partition's next `count`
+        return merge_entries(batches, query.descending)[:count]
+
+    async def iter_page(self, query: PageQuery, state: PageState) -> AsyncIterator[Entry]:
+        """
+        Yield the page's entries, updating `state` as it goes
+
+        Raises:
+            ValueError: If `query.cursor` is malformed
+        """
+        name = query.stream_name
+        bounds = self.partitioner.parse_cursor(name, query.cursor) if query.cursor else {}
+        max_scan = query.count * self.max_scan_factor if query.filters else query.count
+        exhausted = False
+
+        while state.returned < query.count and state.scanned < max_scan:
+            wanted = query.count - state.returned if not query.filters else self.batch_size
+            batch_count = min(self.batch_size, wanted, max_scan - state.scanned)
+            batch = await self._read(query, bounds, batch_count)
+            for entry_id, data, key in batch:
+                if isinstance(entry_id, bytes):
+                    entry_id = entry_id.decode()
+                state.scanned += 1
+                bounds[key] = entry_id
+                if self.schema_registry:
+                    data = self.schema_registry.upcast_fields(data)
+                if query.filters and not matches(data, query.filters):
+                    continue
+                if query.fields is not None:
+                    data = {k: data[k] for k in query.fields if k in data}
+                state.returned += 1
+                yield entry_id, data
+                if state.returned >= query.count:
+                    break
+            else:
+                if len(batch) < batch_count:
+                    exhausted = True  # Consumed the end of the range
+                    break
+
+        state.next_cursor = None if exhausted else self.partitioner.encode_cursor(name, bounds)
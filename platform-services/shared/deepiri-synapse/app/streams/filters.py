@@ -0,0 +1,40 @@
+"""
+Event field filters for Synapse
+Server-side matching used by replay, browsing and tailing
+"""
+from typing import Any, Dict, Optional, Set
+
+Filters = Dict[str, Set[str]]
+
+
+def parse_filter(spec: Optional[str]) -> Filters:
+    """
+    Parse "field=value,field=a|b" into a filter map
+
+    Every field must match; "|" separates accepted values for one field.
+
+    Raises:
+        ValueError: If a clause has no "="
+    """
+    filters: Filters = {}
+    if not spec:
+        return filters
+    for clause in filter(None, (part.strip() for part in spec.split(","))):
+        field, sep, values = clause.partition("=")
+        if not sep or not field.strip():
+            raise ValueError(f"Invalid filter clause '{clause}', expected field=value")
+        filters.setdefault(field.strip(), set()).update(v.strip() for v in values.split("|"))
+    return filters
+
+
+def matches(fields: Dict[Any, Any], filters: Filters) -> bool:
+    """Check an entry's fields (str or bytes, as read) against a filter map"""
+    for field, accepted in filters.items():
+        value = fields.get(field)
+        if value is None:
+            value = fields.get(field.encode("utf-8"))
+        if isinstance(value, bytes):
+            value = value.decode("utf-8", "replace")
+        if value is None or str(value) not in accepted:
+            return False
+    return True
@@ -0,0 +1,306 @@
+"""
+Server-side publish library for Synapse
+Redis Functions (EVALSHA on servers without them) so each publish is one round trip
+"""
+import hashlib
+import logging
+import redis.asyncio as redis
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .indexer import index_registry_key
+from .keys import stream_key
+
+logger = logging.getLogger(__name__)
+
+# Shared by the function library and the script fallback.
+#
+# publish: KEYS stream, counters hash, index registry, then the entry's keys;
+#   ARGV max length ("" for none), then one entry.
+# publish_batch: same KEYS head; ARGV max length, entry count, then entries.
+# An entry is ARGV event type, dedup TTL ms ("" for none), index key count,
+#   field item count, field/value items; its KEYS are the dedup key (when a
+#   TTL is given) followed by its index keys. Each entry returns {id, dup}.
+# ack_and_forward: KEYS source, targets...; ARGV group, entry ID, max length,
+#   then per target a field item count and the items. Returns XACK's reply.
+LIBRARY_BODY = """
+local function xadd(stream, maxlen, fields)
+    local cmd = {'XADD', stream}
+    if maxlen ~= '' then
+        cmd[#cmd + 1] = 'MAXLEN'
+        cmd[#cmd + 1] = '~'
+        cmd[#cmd + 1] = maxlen
+    end
+    cmd[#cmd + 1] = '*'
+    for i = 1, #fields do
+        cmd[#cmd + 1] = fields[i]
+    end
+    return redis.call(unpack(cmd))
+end
+
+local function publish_entry(keys, args, k, a, maxlen)
+    local event_type, dedup_ttl = args[a], args[a + 1]
+    local n_index, n_fields = tonumber(args[a + 2]), tonumber(args[a + 3])
+    local fields = {unpack(args, a + 4, a + 3 + n_fields)}
+    a = a + 4 + n_fields
+
+    local dedup_key
+    if dedup_ttl ~= '' then
+        dedup_key = keys[k]
+        k = k + 1
+        local seen = redis.call('GET', dedup_key)
+        if seen then
+            return seen, 1, k + n_index, a
+        end
+    end
+
+    local id = xadd(keys[1], maxlen, fields)
+    if dedup_key then
+        redis.call('SET', dedup_key, id, 'PX', dedup_ttl)
+    end
+    if event_type ~= '' then
+        redis.call('HINCRBY', keys[2], event_type, 1)
+    end
+    local score = tonumber(string.match(id, '^(%d+)'))
+    for i = k, k + n_index - 1 do
+        redis.call('ZADD', keys[i], score, id)
+        redis.call('SADD', keys[3], keys[i])
+    end
+    return id, 0, k + n_index, a
+end
+
+local function publish(keys, args)
+    local id, dup = publish_entry(keys, args, 4, 2, args[1])
+    return {id, dup}
+end
+
+local function publish_batch(keys, args)
+    local results, k, a = {}, 4, 3
+    for n = 1, tonumber(args[2]) do
+        local id, dup
+        id, dup, k, a = publish_entry(keys, args, k, a, args[1])
+        results[n] = {id, dup}
+    end
+    return results
+end
+
+local function ack_and_forward(keys, args)
+    local a = 4
+    for i = 2, #keys do
+        local n = tonumber(args[a])
+        xadd(keys[i], args[3], {unpack(args, a + 1, a + n)})
+        a = a + 1 + n
+    end
+    return redis.call('XACK', keys[1], args[1], args[2])
+end
+"""
+
+FUNCTION_NAMES = ("publish", "publish_batch", "ack_and_forward")
+
+# Library and function names carry the code's hash, so replicas running
+# different versions can share a server during a rolling deploy
+LIBRARY_VERSION = hashlib.sha1(LIBRARY_BODY.encode("utf-8")).hexdigest()[:12]
+
+
+def library_source(version: str = LIBRARY_VERSION) -> str:
+    """FUNCTION LOAD source registering the versioned functions"""
+    registrations = "\n".join(
+        f"redis.register_function('synapse_{name}_{version}', {name})" for name in FUNCTION_NAMES
+    )
+    return f"#!lua name=synapse_{version}\n{LIBRARY_BODY}\n{registrations}\n"
+
+
+def script_source(name: str) -> str:
+    """EVAL source running one function of the library"""
+    return f"{LIBRARY_BODY}\nreturn {name}(KEYS, ARGV)\n"
+
+
+def counters_key(stream_name: str) -> str:
+    """Hash of published entries per event type"""
+    return stream_key(stream_name, "counters")
+
+
+@dataclass
+class PublishEntry:
+    """One entry for publish/publish_batch"""
+    fields: Dict[str, Any]
+    index_keys: List[str] = field(default_factory=list)
+    dedup_key: Optional[str] = None
+    dedup_ttl_ms: Optional[int] = None
+
+    def encode(self) -> Tuple[List[str], List[Any]]:
+        """Keys and ARGV items of this entry"""
+        keys = ([self.dedup_key] if self.dedup_ttl_ms else []) + self.index_keys
+        items = [item for pair in self.fields.items() for item in pair]
+        args = [
+            self.fields.get("event") or "",
+            self.dedup_ttl_ms or "",
+            len(self.index_keys),
+            len(items),
+            *items,
+        ]
+        return keys, args
+
+
+# (entry ID, whether it was a duplicate of an earlier publish)
+PublishResult = Tuple[str, bool]
+
+
+def _text(value: Any) -> Any:
+    return value.decode("utf-8", "replace") if isinstance(value, bytes) else value
+
+
+def _is_missing_code(error: Exception) -> bool:
+    """Whether a call failed only because the server lost the library"""
+    message = str(error)
+    return "Function not found" in message or "NOSCRIPT" in message
+
+
+class StreamFunctions:
+    """
+    Calls the publish library with FCALL, or EVALSHA where unsupported
+
+    Until `load()` succeeds (or on Redis < 7) calls go through scripts, which
+    redis-py loads on demand, so an unloaded instance still works.
+    """
+
+    def __init__(self, redis_client: redis.Redis):
+        """Initialize stream functions"""
+        self.redis = redis_client
+        self.use_functions = False
+        self._scripts = {
+            name: redis_client.register_script(script_source(name)) for name in FUNCTION_NAMES
+        }
+        self.calls: Dict[str, int] = {name: 0 for name in FUNCTION_NAMES}
+        self.reloads = 0
+
+    async def load(self) -> bool:
+        """Load the function library; False falls back to scripts"""
+        try:
+            await self.redis.function_load(library_source(), replace=True)
+            self.use_functions = True
+        except redis.ResponseError as e:
+            logger.info(f"Redis Functions unavailable, using scripts: {e}")
+            self.use_functions = False
+            for script in self._scripts.values():
+                await self.redis.script_load(script.script)
+        return self.use_functions
+
+    async def _call(self, name: str, keys: Sequence[str], args: Sequence[Any], client: Any = None):
+        self.calls[name] += 1
+        if self.use_functions:
+            target = self.redis if client is None else client
+            return await target.fcall(f"synapse_{name}_{LIBRARY_VERSION}", len(keys), *keys, *args)
+        return await self._scripts[name](keys=keys, args=args, client=client)
+
+    async def _retry_call(self, name: str, keys: Sequence[str], args: Sequence[Any]):
+        try:
+            return await self._call(name, keys, args)
+        except redis.ResponseError as e:
+            # A failed-over or flushed node lost the library; nothing ran
+            if not _is_missing_code(e):
+                raise
+            self.reloads += 1
+            await self.load()
+            return await self._call(name, keys, args)
+
+    def _head(self, stream_name: str) -> List[str]:
+        return [stream_name, counters_key(stream_name), index_registry_key(stream_name)]
+
+    async def publish(
+        self,
+        stream_name: str,
+        entry: PublishEntry,
+        max_length: Optional[int] = None
+    ) -> PublishResult:
+        """XADD with trim, per-type counter, index and dedup updates in one call"""
+        keys, args = entry.encode()
+        entry_id, duplicate = await self._retry_call(
+            "publish", self._head(stream_name) + keys, [max_length or "", *args]
+        )
+        return _text(entry_id), bool(duplicate)
+
+    async def publish_batches(
+        self,
+        batches: Dict[str, List[PublishEntry]],
+        max_length: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Publish several streams' batches in one pipelined round trip
+
+        Returns each stream's list of PublishResult, or the exception its
+        call raised (a batch is written all-or-nothing per stream).
+        """
+        results: Dict[str, Any] = {}
+        todo = dict(batches)
+        for attempt in range(2):
+            pipe = self.redis.pipeline(transaction=False)
+            for stream_name, entries in todo.items():
+                keys, args = self._head(stream_name), [max_length or "", len(entries)]
+                for entry in entries:
+                    entry_keys, entry_args = entry.encode()
+                    keys.extend(entry_keys)
+                    args.extend(entry_args)
+                await self._call("publish_batch", keys, args, client=pipe)
+            replies = await pipe.execute(raise_on_error=False)
+            for stream_name, reply in zip(todo, replies):
+                if isinstance(reply, Exception):
+                    results[stream_name] = reply
+                else:
+                    results[stream_name] = [(_text(i), bool(dup)) for i, dup in reply]
+            todo = {
+                name: todo[name] for name in todo
+                if isinstance(results[name], Exception) and _is_missing_code(results[name])
+            }
+            if not todo or attempt:
+                break
+            self.reloads += 1
+            await self.load()
+        return results
+
+    async def ack_and_forward(
+        self,
+        stream_name: str,
+        group_name: str,
+        entry_id: str,
+        forwards: List[Tuple[str, Dict[str, Any]]],
+        max_length: Optional[int] = None
+    ) -> int:
+        """Append an entry's forwards to their streams and ack it, in one call"""
+        args: List[Any] = [group_name, entry_id, max_length or ""]
+        for _, fields in forwards:
+            items = [item for pair in fields.items() for item in pair]
+            args.extend([len(items), *items])
+        return await self._retry_call(
+            "ack_and_forward", [stream_name] + [target for target, _ in forwards], args
+        )
+
+    async def event_counts(
+        self,
+        streams: Dict[str, List[str]],
+        client: Any = None
+    ) -> Dict[str, Dict[str, int]]:
+        """Published entries per event type, summed over each stream's keys"""
+        pipe = (self.redis if client is None else client).pipeline(transaction=False)
+        for keys in streams.values():
+            for key in keys:
+                pipe.hgetall(counters_key(key))
+        replies = iter(await pipe.execute())
+        counts: Dict[str, Dict[str, int]] = {}
+        for stream_name, keys in streams.items():
+            totals: Dict[str, int] = {}
+            for _ in keys:
+                for event_type, n in next(replies).items():
+                    event_type = _text(event_type)
+                    totals[event_type] = totals.get(event_type, 0) + int(n)
+            counts[stream_name] = totals
+        return counts
+
+    def stats(self) -> Dict[str, Any]:
+        """Library metrics for the metrics endpoint"""
+        return {
+            "version": LIBRARY_VERSION,
+            "mode": "function" if self.use_functions else "script",
+            "calls": dict(self.calls),
+            "reloads": self.reloads,
+        }
@@ -0,0 +1,105 @@
+"""
+Redis stream ID helpers
+"""
+import heapq
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Iterable, List, Optional, Sequence, Tuple, Union
+
+# Largest sequence number Redis allows within one millisecond
+MAX_SEQ = 2 ** 64 - 1
+
+
+def parse_id(stream_id: str) -> Tuple[int, int]:
+    """
+    Split "ms-seq" into integers (a bare "ms" means sequence 0)
+
+    Raises:
+        ValueError: If the value is not a stream ID
+    """
+    ms, _, seq = stream_id.partition("-")
+    if not ms.isdigit() or not (seq or "0").isdigit():
+        raise ValueError(f"Invalid stream ID '{stream_id}'")
+    return int(ms), int(seq or 0)
+
+
+def id_text(stream_id: Union[str, bytes]) -> str:
+    """Entry ID as text (bytes-mode clients return bytes)"""
+    return stream_id.decode() if isinstance(stream_id, bytes) else stream_id
+
+
+def _order_key(stream_id: Union[str, bytes], descending: bool) -> Tuple[int, int]:
+    ms, seq = parse_id(id_text(stream_id))
+    return (-ms, -seq) if descending else (ms, seq)
+
+
+def merge_entries(
+    batches: Iterable[Sequence[Tuple[Any, Any]]],
+    descending: bool = False
+) -> List[Tuple[Any, Any]]:
+    """Merge entry lists that are each in ID order (e.g. one per partition) into one"""
+    return list(heapq.merge(*batches, key=lambda e: _order_key(e[0], descending)))
+
+
+async def merge_entry_streams(
+    sources: Sequence[AsyncIterator[Tuple[Any, Any]]],
+    descending: bool = False
+) -> AsyncIterator[Tuple[Any, Any]]:
+    """Merge async entry iterators that are each in ID order, holding one entry per source"""
+    heap = []
+    for index, source in enumerate(sources):
+        entry = await anext(source, None)
+        if entry is not None:
+            heap.append((_order_key(entry[0], descending), index, entry))
+    heapq.heapify(heap)
+    while heap:
+        _, index, entry = heapq.heappop(heap)
+        yield entry
+        following = await anext(sources[index], None)
+        if following is not None:
+            heapq.heappush(heap, (_order_key(following[0], descending), index, following))
+
+
+def format_id(ms: int, seq: int = 0) -> str:
+    """Join milliseconds and sequence into a stream ID"""
+    return f"{ms}-{seq}"
+
+
+def next_id(stream_id: str) -> str:
+    """Smallest ID strictly greater than stream_id"""
+    ms, seq = parse_id(stream_id)
+    return format_id(ms, seq + 1)
+
+
+def id_from_ms(ms: int) -> str:
+    """First possible ID at a millisecond timestamp"""
+    return format_id(ms, 0)
+
+
+def parse_position(value: Optional[str], end: bool = False) -> Optional[str]:
+    """
+    Turn a user-supplied position into a stream ID
+
+    Accepts a stream ID ("1700000000000-0"), epoch milliseconds
+    ("1700000000000") or an ISO-8601 date/time ("2025-01-01",
+    "2025-01-01T12:00:00Z", naive values are UTC). Timestamps used as an
+    end bound include every entry of that millisecond.
+
+    Raises:
+        ValueError: If the value is not a recognised position
+    """
+    if not value or value in ("-", "+"):
+        return None
+    if "-" in value and value.replace("-", "").isdigit() and value.count("-") == 1:
+        parse_id(value)
+        return value
+    if value.isdigit():
+        ms = int(value)
+    else:
+        try:
+            moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            raise ValueError(f"Invalid stream position '{value}'")
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        ms = int(moment.timestamp() * 1000)
+    return format_id(ms, MAX_SEQ) if end else id_from_ms(ms)
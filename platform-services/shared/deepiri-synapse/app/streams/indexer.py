@@ -0,0 +1,174 @@
+"""
+Secondary indexes for Synapse
+Sorted sets of entry IDs per field value, written by the publish library with the XADD
+"""
+import logging
+import redis.asyncio as redis
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .ids import parse_id
+from .keys import stream_key
+
+logger = logging.getLogger(__name__)
+
+# Longer values (payload blobs, not identifiers) are not indexed
+MAX_VALUE_LENGTH = 256
+
+# KEYS[1] index registry set, KEYS[2] index key: forget the key once Redis
+# has dropped it as empty (atomic, so a concurrent ZADD isn't orphaned)
+FORGET_EMPTY_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    return redis.call('SREM', KEYS[1], KEYS[2])
+end
+return 0
+"""
+
+
+def index_key(stream_name: str, field: str, value: str) -> str:
+    """Sorted set of entry IDs whose `field` equals `value`"""
+    return stream_key(stream_name, "idx", field, value)
+
+
+def index_registry_key(stream_name: str) -> str:
+    """Set of a stream's index keys, walked when trimming"""
+    return stream_key(stream_name, "idx")
+
+
+def index_keys(stream_name: str, fields: Dict[str, Any], indexed: Iterable[str]) -> List[str]:
+    """Index keys an entry belongs to (missing, empty and oversized values are skipped)"""
+    keys = []
+    for field in indexed:
+        value = fields.get(field)
+        if value is not None and value != "" and len(str(value)) <= MAX_VALUE_LENGTH:
+            keys.append(index_key(stream_name, field, str(value)))
+    return keys
+
+
+def _text(value: Any) -> Any:
+    return value.decode("utf-8", "replace") if isinstance(value, bytes) else value
+
+
+class StreamIndexer:
+    """
+    Maintains per-field secondary indexes on streams
+
+    Each index is a sorted set scored by the entry's millisecond timestamp,
+    so "events for model X in the last day" is a ZRANGEBYSCORE plus one
+    batched lookup of the matching IDs instead of a scan of the stream.
+    Entries are indexed by the publish library (see functions.py) in the
+    same call as their XADD; index keys share the stream's hash tag, so
+    that call stays in one slot.
+    """
+
+    def __init__(self, redis_client: redis.Redis, fields: List[str], streams: Iterable[str]):
+        """Initialize stream indexer"""
+        self.redis = redis_client
+        self.fields = list(fields)
+        self.streams = set(streams)
+        self._forget = redis_client.register_script(FORGET_EMPTY_SCRIPT)
+        self.lookups = 0
+        self.trimmed = 0
+
+    def covers(self, stream_name: str) -> bool:
+        """Whether writes to a stream key are indexed"""
+        return bool(self.fields) and stream_name in self.streams
+
+    async def load(self):
+        """Load the trim script up front (on a cluster, pipelines can't recover from NOSCRIPT)"""
+        if self.fields:
+            await self.redis.script_load(FORGET_EMPTY_SCRIPT)
+
+    def keys_for(self, stream_name: str, fields: Dict[str, Any]) -> List[str]:
+        """Index keys a new entry of a stream key belongs to"""
+        return index_keys(stream_name, fields, self.fields) if self.covers(stream_name) else []
+
+    async def lookup(
+        self,
+        field: str,
+        value: str,
+        streams: Optional[Iterable[str]] = None,
+        start_id: Optional[str] = None,
+        end_id: Optional[str] = None,
+        count: int = 100,
+        descending: bool = True
+    ) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """
+        Entries whose `field` equals `value`, as (stream, id, fields)
+
+        Index ranges for every stream go out in one pipeline, then the
+        matching entries are fetched in a second one.
+        """
+        self.lookups += 1
+        streams = sorted(self.streams if streams is None else set(streams) & self.streams)
+        low = parse_id(start_id)[0] if start_id else "-inf"
+        high = parse_id(end_id)[0] if end_id else "+inf"
+
+        pipe = self.redis.pipeline(transaction=False)
+        for stream_name in streams:
+            key = index_key(stream_name, field, value)
+            if descending:
+                pipe.zrevrangebyscore(key, high, low, start=0, num=count)
+            else:
+                pipe.zrangebyscore(key, low, high, start=0, num=count)
+        id_lists = await pipe.execute()
+
+        candidates = [
+            (stream_name, _text(entry_id))
+            for stream_name, ids in zip(streams, id_lists)
+            for entry_id in ids
+        ]
+        # Millisecond scores can't separate IDs within one ms; bound by ID too
+        if start_id:
+            candidates = [c for c in candidates if parse_id(c[1]) >= parse_id(start_id)]
+        if end_id:
+            candidates = [c for c in candidates if parse_id(c[1]) <= parse_id(end_id)]
+        candidates.sort(key=lambda c: parse_id(c[1]), reverse=descending)
+        candidates = candidates[:count]
+
+        pipe = self.redis.pipeline(transaction=False)
+        for stream_name, entry_id in candidates:
+            pipe.xrange(stream_name, min=entry_id, max=entry_id)
+        entries = await pipe.execute()
+        # IDs trimmed from the stream but not yet from the index are skipped
+        return [
+            (stream_name, entry_id, found[0][1])
+            for (stream_name, entry_id), found in zip(candidates, entries)
+            if found
+        ]
+
+    async def trim(self, stream_name: str, batch_size: int = 500) -> int:
+        """Drop index members older than the stream's first entry"""
+        first = await self.redis.xrange(stream_name, count=1)
+        cutoff = f"({parse_id(_text(first[0][0]))[0]}" if first else "+inf"
+        registry = index_registry_key(stream_name)
+
+        removed = 0
+        batch: List[str] = []
+
+        async def flush():
+            nonlocal removed
+            pipe = self.redis.pipeline(transaction=False)
+            for key in batch:
+                pipe.zremrangebyscore(key, "-inf", cutoff)
+            for key in batch:
+                await self._forget(keys=[registry, key], client=pipe)
+            replies = await pipe.execute()
+            removed += sum(replies[:len(batch)])
+            batch.clear()
+
+        async for key in self.redis.sscan_iter(registry, count=batch_size):
+            batch.append(_text(key))
+            if len(batch) >= batch_size:
+                await flush()
+        if batch:
+            await flush()
+        self.trimmed += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Index metrics for the metrics endpoint"""
+        return {
+            "fields": self.fields,
+            "lookups": self.lookups,
+            "trimmed": self.trimmed,
+        }
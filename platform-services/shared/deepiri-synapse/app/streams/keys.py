@@ -0,0 +1,21 @@
+"""
+Redis key layout for Synapse auxiliary data
+Keys that belong to a stream carry the stream name as a hash tag
+
+On a Redis Cluster this keeps a stream and everything derived from it
+(archive watermark and lock, and any per-stream index, retry or aggregate
+key) in one slot, so scripts and multi-key commands touching them are
+valid. Each partition ("inference-events:3") is its own tag and slot.
+Service-wide keys (e.g. the schema registry's "synapse:schemas") are
+only ever used one key per command.
+"""
+
+
+def stream_key(stream_name: str, *parts: str) -> str:
+    """
+    Build an auxiliary key for a stream, e.g. synapse:{inference-events}:archive
+
+    The `{stream_name}` hash tag makes Redis Cluster hash the key by the
+    stream name, so it lands in the same slot as the stream itself.
+    """
+    return ":".join(["synapse", "{" + stream_name + "}", *parts])
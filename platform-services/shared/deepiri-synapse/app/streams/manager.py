@@ -6,13 +6,24 @@ import redis.asyncio as redis
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 
+from ..connection import memory_info
+from .ids import parse_id
+from .partitions import StreamPartitioner
+
 
 class StreamManager:
     """Manages Redis Streams lifecycle and operations"""
     
-    def __init__(self, redis_client: redis.Redis):
-        """Initialize stream manager"""
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        partitioner: Optional[StreamPartitioner] = None,
+        reader: Optional[redis.Redis] = None
+    ):
+        """Initialize stream manager (stats are read through `reader`, e.g. a replica)"""
         self.redis = redis_client
+        self.reader = reader or redis_client
+        self.partitioner = partitioner or StreamPartitioner()
         self.streams = [
             "model-events",
             "inference-events",
@@ -21,9 +32,13 @@ class StreamManager:
             "training-events"
         ]
     
+    def physical_streams(self) -> List[str]:
+        """Redis keys of all streams, with partitioned streams expanded"""
+        return [p for stream in self.streams for p in self.partitioner.partitions(stream)]
+    
     async def ensure_streams_exist(self):
         """Ensure all required streams exist"""
-        for stream in self.streams:
+        for stream in self.physical_streams():
             try:
                 await self.redis.xinfo_stream(stream)
             except redis.ResponseError:
@@ -31,10 +46,28 @@ class StreamManager:
                 await self.redis.xadd(stream, {"created": datetime.utcnow().isoformat()})
     
     async def get_stream_stats(self, stream_name: str) -> Dict[str, Any]:
-        """Get statistics for a stream"""
+        """Get statistics for a stream (summed over its partitions, if any)"""
+        if not self.partitioner.is_partitioned(stream_name):
+            return await self._get_key_stats(stream_name)
+        
+        partitions = [await self._get_key_stats(p) for p in self.partitioner.partitions(stream_name)]
+        healthy = [p for p in partitions if "error" not in p]
+        firsts = [p["first_entry"] for p in healthy if p.get("first_entry")]
+        lasts = [p["last_entry"] for p in healthy if p.get("last_entry")]
+        return {
+            "name": stream_name,
+            "length": sum(p["length"] for p in healthy),
+            "groups": max((p["groups"] for p in healthy), default=0),
+            "first_entry": min(firsts, key=lambda e: parse_id(e[0]), default=None),
+            "last_entry": max(lasts, key=lambda e: parse_id(e[0]), default=None),
+            "partitions": partitions
+        }
+    
+    async def _get_key_stats(self, stream_name: str) -> Dict[str, Any]:
+        """Get statistics for one stream key"""
         try:
-            info = await self.redis.xinfo_stream(stream_name)
-            length = await self.redis.xlen(stream_name)
+            info = await self.reader.xinfo_stream(stream_name)
+            length = await self.reader.xlen(stream_name)
             
             return {
                 "name": stream_name,
@@ -54,9 +87,24 @@ class StreamManager:
             stats.append(stat)
         return stats
     
-    async def trim_stream(self, stream_name: str, max_length: int = 10000):
+    async def trim_stream(self, stream_name: str, max_length: int = 10000) -> int:
         """Trim stream to max length"""
-        await self.redis.xtrim(stream_name, maxlen=max_length, approximate=True)
+        return await self.redis.xtrim(stream_name, maxlen=max_length, approximate=True)
+    
+    async def trim_stream_before(self, stream_name: str, min_id: str) -> int:
+        """Trim entries with IDs lower than min_id (XTRIM MINID)"""
+        return await self.redis.xtrim(stream_name, minid=min_id, approximate=True)
+    
+    async def memory_info(self) -> Dict[str, int]:
+        """Redis used_memory and maxmemory in bytes (the fullest node on a cluster)"""
+        return await memory_info(self.redis)
+    
+    async def memory_usage(self, stream_name: str) -> Optional[int]:
+        """Bytes used by a stream (MEMORY USAGE), or None if unavailable"""
+        try:
+            return await self.redis.memory_usage(stream_name)
+        except redis.ResponseError:
+            return None
     
     async def create_consumer_group(
         self,
@@ -64,17 +112,17 @@ class StreamManager:
         group_name: str,
         start_id: str = "0"
     ):
-        """Create consumer group for stream"""
-        try:
-            await self.redis.xgroup_create(
-                stream_name,
-                group_name,
-                id=start_id,
-                mkstream=True
-            )
-            return True
-        except redis.ResponseError as e:
-            if "BUSYGROUP" in str(e):
-                return True  # Group already exists
-            raise
+        """Create consumer group for stream (on every partition)"""
+        for key in self.partitioner.partitions(stream_name):
+            try:
+                await self.redis.xgroup_create(
+                    key,
+                    group_name,
+                    id=start_id,
+                    mkstream=True
+                )
+            except redis.ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise  # BUSYGROUP: group already exists
+        return True
 
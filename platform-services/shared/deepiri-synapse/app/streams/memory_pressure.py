@@ -0,0 +1,194 @@
+"""
+Memory pressure controller for Synapse
+Tightens trimming on low-priority streams as Redis approaches maxmemory
+"""
+import asyncio
+import json
+import logging
+import math
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .archiver import StreamArchiver
+from .indexer import StreamIndexer
+from .manager import StreamManager
+
+logger = logging.getLogger(__name__)
+
+# Highest priority first; trimming starts from the end of the list
+DEFAULT_PRIORITY_ORDER = [
+    "model-events",
+    "agi-decisions",
+    "platform-events",
+    "training-events",
+    "inference-events",
+]
+
+
+class MemoryPressureController:
+    """
+    Samples Redis memory and progressively trims streams under pressure
+
+    Between `soft_ratio` and `hard_ratio` of maxmemory, the number of streams
+    trimmed grows linearly from the lowest-priority one to all of them. Each
+    trimmed stream keeps `keep_fraction` of its entries (never fewer than
+    `min_length`), so repeated samples under pressure keep tightening.
+    Every action is published to `event_stream` as a platform event (to
+    its partition, when that stream is partitioned).
+
+    Off by default: on a Redis shared with other services, their memory
+    counts toward the ratio too, so only enable it where Synapse's streams
+    are what fills Redis.
+    """
+
+    def __init__(
+        self,
+        stream_manager: StreamManager,
+        priority_order: Optional[List[str]] = None,
+        soft_ratio: float = 0.75,
+        hard_ratio: float = 0.9,
+        keep_fraction: float = 0.5,
+        min_length: int = 1000,
+        interval_seconds: float = 10.0,
+        event_stream: str = "platform-events",
+        archiver: Optional[StreamArchiver] = None,
+        indexer: Optional[StreamIndexer] = None
+    ):
+        """Initialize memory pressure controller"""
+        self.stream_manager = stream_manager
+        self.archiver = archiver
+        self.indexer = indexer
+        self.priority_order = priority_order or list(DEFAULT_PRIORITY_ORDER)
+        self.soft_ratio = soft_ratio
+        self.hard_ratio = hard_ratio
+        self.keep_fraction = keep_fraction
+        self.min_length = min_length
+        self.interval_seconds = interval_seconds
+        self.event_stream = event_stream
+        self._task: Optional[asyncio.Task] = None
+        self.memory_ratio = 0.0
+        self.level = 0
+        self.actions_taken = 0
+        self.entries_trimmed = 0
+        self.last_sample: Dict[str, Any] = {}
+
+    def streams_to_tighten(self, ratio: float) -> List[str]:
+        """Pick the lowest-priority streams to trim for a memory ratio"""
+        if ratio < self.soft_ratio:
+            return []
+        span = max(self.hard_ratio - self.soft_ratio, 1e-9)
+        pressure = min((ratio - self.soft_ratio) / span, 1.0)
+        count = max(1, math.ceil(pressure * len(self.priority_order)))
+        return list(reversed(self.priority_order))[:count]
+
+    async def sample(self) -> Dict[str, Any]:
+        """Sample INFO memory and per-stream MEMORY USAGE"""
+        memory = await self.stream_manager.memory_info()
+        maxmemory = memory["maxmemory"]
+        ratio = memory["used_memory"] / maxmemory if maxmemory else 0.0
+        streams = {}
+        for stream_name in self.priority_order:
+            streams[stream_name] = await self.stream_manager.memory_usage(stream_name)
+        self.memory_ratio = ratio
+        self.last_sample = {
+            "memory_ratio": ratio,
+            "stream_bytes": streams,
+            "sampled_at": time.time(),
+            **memory,
+        }
+        return self.last_sample
+
+    async def run_once(self) -> List[Dict[str, Any]]:
+        """Sample memory and trim streams if under pressure"""
+        sample = await self.sample()
+        targets = self.streams_to_tighten(sample["memory_ratio"])
+        previous_level, self.level = self.level, len(targets)
+        if self.level != previous_level:
+            await self._log_action("memory-pressure-level", {
+                "level": self.level,
+                "previous_level": previous_level,
+                "memory_ratio": sample["memory_ratio"],
+            })
+
+        actions = []
+        for stream_name in targets:
+            length = await self.stream_manager.redis.xlen(stream_name)
+            target = max(int(length * self.keep_fraction), self.min_length)
+            if length <= target:
+                continue
+            if self.archiver and self.archiver.covers(stream_name):
+                trimmed = await self.archiver.trim_to_length(stream_name, target)
+            else:
+                trimmed = await self.stream_manager.trim_stream(stream_name, target)
+            if self.indexer and self.indexer.covers(stream_name):
+                await self.indexer.trim(stream_name)
+            action = {
+                "stream": stream_name,
+                "length_before": length,
+                "max_length": target,
+                "trimmed": trimmed,
+                "stream_bytes": sample["stream_bytes"].get(stream_name),
+                "memory_ratio": sample["memory_ratio"],
+            }
+            actions.append(action)
+            self.actions_taken += 1
+            self.entries_trimmed += trimmed
+            logger.warning(
+                f"Memory pressure {sample['memory_ratio']:.0%}: trimmed {trimmed} "
+                f"entries from {stream_name} (max_length={target})"
+            )
+            await self._log_action("memory-pressure-trim", action)
+        return actions
+
+    async def _log_action(self, action: str, details: Dict[str, Any]):
+        """Record a controller action as a platform event"""
+        event = {
+            "event": "platform",
+            "service": "synapse",
+            "action": action,
+            "details": json.dumps(details),
+            "timestamp": datetime.utcnow().isoformat(),
+        }
+        stream_key = self.stream_manager.partitioner.route(self.event_stream, event)
+        try:
+            await self.stream_manager.redis.xadd(stream_key, event)
+        except Exception as e:
+            # Publishing can fail exactly when memory is exhausted
+            logger.error(f"Failed to record {action} event: {e}")
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Memory pressure check failed: {e}")
+
+    def start(self):
+        """Start the background controller task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        """Stop the background controller task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Controller state for the metrics endpoint"""
+        return {
+            "memory_ratio": self.memory_ratio,
+            "level": self.level,
+            "actions_taken": self.actions_taken,
+            "entries_trimmed": self.entries_trimmed,
+            "priority_order": self.priority_order,
+            "sampled_at": self.last_sample.get("sampled_at"),
+        }
@@ -0,0 +1,136 @@
+"""
+Stream partitioning for Synapse
+Splits a logical stream into hash-routed sub-streams ("inference-events:0".."N-1")
+"""
+import itertools
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+from .ids import parse_position
+
+
+@dataclass(frozen=True)
+class PartitionSpec:
+    """Partition count and routing field for one logical stream"""
+    count: int
+    key_field: Optional[str] = None
+
+    @classmethod
+    def parse(cls, spec: str) -> "PartitionSpec":
+        """Parse "8" or "8:model_name" """
+        count, _, key_field = spec.partition(":")
+        spec_count = int(count)
+        if spec_count < 1:
+            raise ValueError(f"Partition count must be at least 1, got {spec_count}")
+        return cls(spec_count, key_field.strip() or None)
+
+
+def parse_partition_specs(spec: str) -> Dict[str, PartitionSpec]:
+    """Parse "stream=count[:key_field],..." into a spec map"""
+    specs = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        stream_name, _, value = item.partition("=")
+        specs[stream_name.strip()] = PartitionSpec.parse(value)
+    return specs
+
+
+def partition_name(stream_name: str, index: int) -> str:
+    """Redis key of one partition of a stream"""
+    return f"{stream_name}:{index}"
+
+
+def partition_index(key: Any, count: int) -> int:
+    """Stable partition for a routing key (the same in every process)"""
+    return zlib.crc32(str(key).encode("utf-8")) % count
+
+
+class StreamPartitioner:
+    """
+    Maps logical streams to their partitions
+
+    Events with the same routing key always land on the same partition, so
+    per-key order holds while writes and reads spread over several keys
+    (and, on a cluster, several slots). Events without the key are spread
+    round-robin. Streams without a spec stay a single key.
+    """
+
+    def __init__(self, specs: Optional[Dict[str, PartitionSpec]] = None):
+        """Initialize partitioner"""
+        self.specs = specs or {}
+        self._round_robin: Dict[str, Iterator[int]] = {
+            name: itertools.cycle(range(spec.count)) for name, spec in self.specs.items()
+        }
+
+    def is_partitioned(self, stream_name: str) -> bool:
+        """Whether a logical stream is split into partitions"""
+        return stream_name in self.specs
+
+    def partitions(self, stream_name: str) -> List[str]:
+        """Physical stream keys behind a logical stream"""
+        spec = self.specs.get(stream_name)
+        if spec is None:
+            return [stream_name]
+        return [partition_name(stream_name, i) for i in range(spec.count)]
+
+    def route(self, stream_name: str, event: Dict[str, Any]) -> str:
+        """Physical stream an event should be written to"""
+        spec = self.specs.get(stream_name)
+        if spec is None:
+            return stream_name
+        key = event.get(spec.key_field) if spec.key_field else None
+        if key is None:
+            return partition_name(stream_name, next(self._round_robin[stream_name]))
+        return partition_name(stream_name, partition_index(key, spec.count))
+
+    def encode_cursor(self, stream_name: str, positions: Dict[str, str]) -> Optional[str]:
+        """
+        Cursor for read positions keyed by stream key
+
+        A single-key stream's cursor is its entry ID. A partitioned stream's
+        lists each partition's last ID ("0:1700000000000-0,1:..."), since
+        partitions assign IDs independently and one ID can't bound them all.
+        """
+        if not self.is_partitioned(stream_name):
+            return positions.get(stream_name)
+        pairs = [
+            f"{index}:{positions[key]}"
+            for index, key in enumerate(self.partitions(stream_name)) if key in positions
+        ]
+        return ",".join(pairs) or None
+
+    def parse_cursor(self, stream_name: str, cursor: str) -> Dict[str, str]:
+        """
+        Read positions by stream key from a cursor
+
+        Accepts what encode_cursor produced, or a single position (stream
+        ID, epoch ms or ISO date) applied to every partition.
+
+        Raises:
+            ValueError: If the cursor is malformed or names a partition the stream doesn't have
+        """
+        keys = self.partitions(stream_name)
+        if ":" not in cursor:
+            position = parse_position(cursor)
+            return {key: position for key in keys} if position else {}
+        if not self.is_partitioned(stream_name):
+            raise ValueError(f"Invalid cursor '{cursor}' for unpartitioned stream '{stream_name}'")
+        positions = {}
+        for pair in cursor.split(","):
+            index, _, stream_id = pair.partition(":")
+            if not index.isdigit() or int(index) >= len(keys):
+                raise ValueError(f"Invalid partition in cursor '{cursor}'")
+            position = parse_position(stream_id)
+            if position is None:
+                raise ValueError(f"Invalid stream ID in cursor '{cursor}'")
+            positions[keys[int(index)]] = position
+        return positions
+
+    def assign(self, stream_name: str, consumer_index: int, consumer_count: int) -> List[str]:
+        """Partitions owned by one of `consumer_count` consumers"""
+        if stream_name not in self.specs:
+            return [stream_name]  # Consumer groups already balance a single key
+        return [
+            name for i, name in enumerate(self.partitions(stream_name))
+            if i % consumer_count == consumer_index
+        ]
@@ -0,0 +1,257 @@
+"""
+Event replay for Synapse
+Reads a time range across the archive and Redis, paced to a target rate
+"""
+import asyncio
+import logging
+import time
+import uuid
+import redis.asyncio as redis
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from ..schemas.registry import SchemaRegistry
+from .archiver import StreamArchiver
+from .filters import Filters, matches
+from .ids import id_text, merge_entry_streams, parse_id
+from .partitions import StreamPartitioner
+
+logger = logging.getLogger(__name__)
+
+Entry = Tuple[str, Dict[str, Any]]
+
+
+class RatePacer:
+    """Sleeps just enough to keep delivery at or below `rate` events per second"""
+
+    def __init__(self, rate: Optional[float] = None):
+        """Initialize rate pacer (no rate means unpaced)"""
+        self.rate = rate
+        self._started = time.monotonic()
+        self._sent = 0
+
+    async def wait(self, count: int = 1):
+        """Account for `count` events, sleeping if ahead of schedule"""
+        if not self.rate:
+            return
+        self._sent += count
+        ahead = self._sent / self.rate - (time.monotonic() - self._started)
+        if ahead > 0:
+            await asyncio.sleep(ahead)
+
+
+class ReplayService:
+    """Replays stream history from archived segments and the live Redis range"""
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        archiver: Optional[StreamArchiver] = None,
+        batch_size: int = 500,
+        max_rate: Optional[float] = None,
+        max_jobs: int = 100,
+        schema_registry: Optional[SchemaRegistry] = None,
+        partitioner: Optional[StreamPartitioner] = None
+    ):
+        """
+        Initialize replay service
+
+        Entries are upcast through `schema_registry`, if given. Partitioned
+        streams are read from every partition and merged by ID, and replays
+        into a partitioned target are routed like published events.
+        """
+        self.redis = redis_client
+        self.archiver = archiver
+        self.schema_registry = schema_registry
+        self.partitioner = partitioner or StreamPartitioner()
+        self.batch_size = batch_size
+        self.max_rate = max_rate
+        self.max_jobs = max_jobs
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def effective_rate(self, rate: Optional[float]) -> Optional[float]:
+        """Clamp a requested rate to the configured maximum"""
+        if self.max_rate and (not rate or rate > self.max_rate):
+            return self.max_rate
+        return rate or None
+
+    async def iter_events(
+        self,
+        stream_name: str,
+        start_id: Optional[str] = None,
+        end_id: Optional[str] = None,
+        filters: Optional[Filters] = None
+    ) -> AsyncIterator[Entry]:
+        """
+        Yield entries in ID order within [start_id, end_id]
+
+        Archived segments are read first, then Redis from just past the last
+        archived entry, one batch at a time, so memory stays bounded.
+        """
+        keys = self.partitioner.partitions(stream_name)
+        if len(keys) == 1:
+            source = self._iter_key(keys[0], start_id, end_id, filters)
+        else:
+            source = merge_entry_streams(
+                [self._iter_key(key, start_id, end_id, filters) for key in keys]
+            )
+        async for entry in source:
+            yield entry
+
+    async def _iter_key(
+        self,
+        stream_key: str,
+        start_id: Optional[str],
+        end_id: Optional[str],
+        filters: Optional[Filters]
+    ) -> AsyncIterator[Entry]:
+        last_id = None
+        if self.archiver and self.archiver.covers(stream_key):
+            async for entry_id, fields in self.archiver.iter_range(stream_key, start_id, end_id):
+                last_id = entry_id
+                if self.schema_registry:
+                    fields = self.schema_registry.upcast_fields(fields)
+                if not filters or matches(fields, filters):
+                    yield entry_id, fields
+
+        lower = f"({last_id}" if last_id else (start_id or "-")
+        upper = end_id or "+"
+        while True:
+            batch = await self.redis.xrange(stream_key, min=lower, max=upper, count=self.batch_size)
+            if not batch:
+                return
+            for entry_id, fields in batch:
+                entry_id = id_text(entry_id)
+                if last_id and parse_id(entry_id) <= parse_id(last_id):
+                    continue  # Still in Redis but already served from the archive
+                if self.schema_registry:
+                    fields = self.schema_registry.upcast_fields(fields)
+                if not filters or matches(fields, filters):
+                    yield entry_id, fields
+            if len(batch) < self.batch_size:
+                return
+            lower = f"({id_text(batch[-1][0])}"
+
+    async def paced(
+        self,
+        entries: AsyncIterator[Entry],
+        rate: Optional[float] = None
+    ) -> AsyncIterator[Entry]:
+        """Pace an entry iterator to `rate` events per second"""
+        pacer = RatePacer(self.effective_rate(rate))
+        async for entry in entries:
+            await pacer.wait()
+            yield entry
+
+    async def replay_into(
+        self,
+        stream_name: str,
+        target_stream: str,
+        start_id: Optional[str] = None,
+        end_id: Optional[str] = None,
+        filters: Optional[Filters] = None,
+        rate: Optional[float] = None,
+        target_group: Optional[str] = None,
+        progress: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Re-publish a range into a target stream
+
+        With `target_group`, the group is created on the target stream at its
+        current end before writing, so its consumers receive exactly the
+        replayed events. Each copy carries `replay_of` with the original ID.
+        """
+        if target_group:
+            for key in self.partitioner.partitions(target_stream):
+                try:
+                    await self.redis.xgroup_create(key, target_group, id="$", mkstream=True)
+                except redis.ResponseError as e:
+                    if "BUSYGROUP" not in str(e):
+                        raise
+
+        if end_id is None:
+            # Pin the end so replaying into the source stream can't chase itself
+            newest_ids = []
+            for key in self.partitioner.partitions(stream_name):
+                newest = await self.redis.xrevrange(key, count=1)
+                if newest:
+                    newest_ids.append(id_text(newest[0][0]))
+            if not newest_ids:
+                return progress if progress is not None else {"replayed": 0, "last_id": None}
+            end_id = max(newest_ids, key=parse_id)
+
+        progress = progress if progress is not None else {}
+        progress.update({"replayed": 0, "last_id": None})
+        pacer = RatePacer(self.effective_rate(rate))
+        batch: List[Entry] = []
+
+        async def flush():
+            pipe = self.redis.pipeline(transaction=False)
+            for entry_id, fields in batch:
+                copy = {**fields, "replay_of": entry_id}
+                # Route on text so bytes-mode fields hash like the published event
+                routing = {id_text(k): id_text(v) for k, v in fields.items()}
+                pipe.xadd(self.partitioner.route(target_stream, routing), copy)
+            await pipe.execute()
+            progress["replayed"] += len(batch)
+            progress["last_id"] = batch[-1][0]
+            batch.clear()
+
+        async for entry in self.iter_events(stream_name, start_id, end_id, filters):
+            batch.append(entry)
+            await pacer.wait()
+            if len(batch) >= self.batch_size:
+                await flush()
+        if batch:
+            await flush()
+        return progress
+
+    def start_job(self, stream_name: str, target_stream: str, **kwargs) -> str:
+        """Run replay_into in the background and return a job id"""
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            "id": job_id,
+            "stream": stream_name,
+            "target_stream": target_stream,
+            "status": "running",
+            "started_at": time.time(),
+        }
+        self.jobs[job_id] = job
+        finished = [j for j in self.jobs.values() if j["status"] != "running"]
+        for old in finished[:max(0, len(self.jobs) - self.max_jobs)]:
+            self.jobs.pop(old["id"], None)
+
+        async def run():
+            try:
+                await self.replay_into(stream_name, target_stream, progress=job, **kwargs)
+                job["status"] = "completed"
+            except asyncio.CancelledError:
+                job["status"] = "cancelled"
+                raise
+            except Exception as e:
+                logger.error(f"Replay job {job_id} failed: {e}")
+                job["status"] = "failed"
+                job["error"] = str(e)
+            finally:
+                job["finished_at"] = time.time()
+                self._tasks.pop(job_id, None)
+
+        self._tasks[job_id] = asyncio.create_task(run())
+        return job_id
+
+    async def cancel_job(self, job_id: str) -> bool:
+        """Cancel a running replay job"""
+        task = self._tasks.get(job_id)
+        if task is None:
+            return False
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return True
+
+    async def stop(self):
+        """Cancel all running replay jobs"""
+        for job_id in list(self._tasks):
+            await self.cancel_job(job_id)
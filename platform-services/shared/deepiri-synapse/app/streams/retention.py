@@ -0,0 +1,201 @@
+"""
+Retention engine for Synapse
+Enforces per-stream age, length and memory limits from a background scheduler
+"""
+import asyncio
+import logging
+import random
+import math
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional
+
+from .archiver import StreamArchiver
+from .ids import id_from_ms
+from .indexer import StreamIndexer
+from .manager import StreamManager
+
+logger = logging.getLogger(__name__)
+
+_SIZE_UNITS = {"kb": 1024, "mb": 1024 ** 2, "gb": 1024 ** 3}
+_AGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def _parse_size(value: str) -> int:
+    value = value.strip().lower()
+    for unit, factor in _SIZE_UNITS.items():
+        if value.endswith(unit):
+            return int(float(value[:-len(unit)]) * factor)
+    return int(value)
+
+
+def _parse_age(value: str) -> int:
+    value = value.strip().lower()
+    if value[-1:] in _AGE_UNITS:
+        return int(float(value[:-1]) * _AGE_UNITS[value[-1]])
+    return int(value)
+
+
+@dataclass
+class RetentionPolicy:
+    """Retention limits for one stream (None disables a limit)"""
+    max_age_seconds: Optional[int] = None
+    max_length: Optional[int] = None
+    max_memory_bytes: Optional[int] = None
+
+    @classmethod
+    def parse(cls, spec: str) -> "RetentionPolicy":
+        """Parse "age:7d;length:100000;memory:256mb" (any subset)"""
+        policy = cls()
+        for item in filter(None, (part.strip() for part in spec.split(";"))):
+            key, _, value = item.partition(":")
+            key = key.strip().lower()
+            if key == "age":
+                policy.max_age_seconds = _parse_age(value)
+            elif key == "length":
+                policy.max_length = int(value)
+            elif key == "memory":
+                policy.max_memory_bytes = _parse_size(value)
+            else:
+                raise ValueError(f"Unknown retention limit '{key}'")
+        return policy
+
+    def split(self, partitions: int) -> "RetentionPolicy":
+        """Per-partition share of this policy's length and memory limits"""
+        return replace(
+            self,
+            max_length=math.ceil(self.max_length / partitions) if self.max_length else None,
+            max_memory_bytes=(
+                math.ceil(self.max_memory_bytes / partitions) if self.max_memory_bytes else None
+            )
+        )
+
+
+def parse_retention_policies(spec: str) -> Dict[str, RetentionPolicy]:
+    """Parse "stream=policy,stream=policy" into a policy map"""
+    policies = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        stream_name, _, policy = item.partition("=")
+        policies[stream_name.strip()] = RetentionPolicy.parse(policy)
+    return policies
+
+
+class RetentionScheduler:
+    """Periodically trims streams to their retention policies"""
+
+    def __init__(
+        self,
+        stream_manager: StreamManager,
+        policies: Dict[str, RetentionPolicy],
+        interval_seconds: float = 60.0,
+        jitter_seconds: float = 10.0,
+        archiver: Optional[StreamArchiver] = None,
+        indexer: Optional[StreamIndexer] = None
+    ):
+        """Initialize retention scheduler"""
+        self.stream_manager = stream_manager
+        self.archiver = archiver
+        self.indexer = indexer
+        self.policies = policies
+        self.interval_seconds = interval_seconds
+        self.jitter_seconds = jitter_seconds
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.errors = 0
+        self.last_run: Dict[str, Any] = {}
+        self.trimmed_total: Dict[str, int] = {}
+
+    async def enforce(self, stream_name: str, policy: RetentionPolicy) -> Dict[str, int]:
+        """Apply one policy to one stream, returning entries trimmed per limit"""
+        trimmed = {"age": 0, "length": 0, "memory": 0}
+
+        # Archived streams export the trimmed range to the cold tier first
+        if self.archiver and self.archiver.covers(stream_name):
+            trim_before = self.archiver.trim_before
+            trim_to_length = self.archiver.trim_to_length
+        else:
+            trim_before = self.stream_manager.trim_stream_before
+            trim_to_length = self.stream_manager.trim_stream
+
+        if policy.max_age_seconds:
+            cutoff_ms = int((time.time() - policy.max_age_seconds) * 1000)
+            trimmed["age"] = await trim_before(stream_name, id_from_ms(cutoff_ms))
+
+        if policy.max_length:
+            trimmed["length"] = await trim_to_length(stream_name, policy.max_length)
+
+        if policy.max_memory_bytes:
+            usage = await self.stream_manager.memory_usage(stream_name)
+            if usage and usage > policy.max_memory_bytes:
+                length = await self.stream_manager.redis.xlen(stream_name)
+                if length:
+                    bytes_per_entry = usage / length
+                    target = int(policy.max_memory_bytes / bytes_per_entry)
+                    trimmed["memory"] = await trim_to_length(stream_name, max(target, 1))
+
+        # Indexes follow the stream, including entries MAXLEN trimmed on write
+        if self.indexer and self.indexer.covers(stream_name):
+            await self.indexer.trim(stream_name)
+        return trimmed
+
+    async def run_once(self) -> Dict[str, Any]:
+        """Enforce every policy once and record per-run metrics"""
+        started = time.monotonic()
+        per_stream: Dict[str, Any] = {}
+        # Copied: policies for derived streams can be added while a run awaits
+        for stream_name, policy in list(self.policies.items()):
+            try:
+                trimmed = await self.enforce(stream_name, policy)
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Retention failed for {stream_name}: {e}")
+                per_stream[stream_name] = {"error": str(e)}
+                continue
+            per_stream[stream_name] = trimmed
+            self.trimmed_total[stream_name] = (
+                self.trimmed_total.get(stream_name, 0) + sum(trimmed.values())
+            )
+
+        self.runs += 1
+        self.last_run = {
+            "finished_at": time.time(),
+            "duration_ms": (time.monotonic() - started) * 1000,
+            "streams": per_stream,
+        }
+        return self.last_run
+
+    async def _loop(self):
+        while True:
+            # Jitter keeps several Synapse replicas from trimming in lockstep
+            await asyncio.sleep(self.interval_seconds + random.uniform(0, self.jitter_seconds))
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Retention run failed: {e}")
+
+    def start(self):
+        """Start the background retention task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        """Stop the background retention task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Retention metrics for the metrics endpoint"""
+        return {
+            "runs": self.runs,
+            "errors": self.errors,
+            "trimmed_total": dict(self.trimmed_total),
+            "last_run": self.last_run,
+        }
@@ -0,0 +1,213 @@
+"""
+Per-type stream splitter for Synapse
+Copies (or moves) events into derived streams keyed by their `event` field
+"""
+import asyncio
+import logging
+import re
+import socket
+import redis.asyncio as redis
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .partitions import StreamPartitioner
+
+logger = logging.getLogger(__name__)
+
+Entry = Tuple[str, Dict[str, Any]]
+
+SPLITTER_GROUP = "synapse-splitter"
+SPLIT_MODES = ("copy", "move")
+
+# Event types become part of a key name; anything else is left unsplit
+_TYPE_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+def derived_stream(stream_name: str, event_type: str) -> str:
+    """
+    Name of the derived stream for one event type, e.g. model-events:type:model-ready
+
+    The "type" segment keeps derived names apart from partition keys
+    ("stream:N"), so an event typed "0" can't land in partition 0.
+    """
+    return f"{stream_name}:type:{event_type}"
+
+
+def parse_split_streams(spec: str) -> Dict[str, Optional[Set[str]]]:
+    """
+    Parse "stream[=type|type],..." into a map of source stream to allowed types
+
+    A stream without types is split on every event type it carries.
+    """
+    streams: Dict[str, Optional[Set[str]]] = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        stream_name, _, types = item.partition("=")
+        allowed = {t.strip() for t in types.split("|") if t.strip()}
+        streams[stream_name.strip()] = allowed or None
+    return streams
+
+
+class StreamSplitter:
+    """
+    Fans source streams out into per-event-type derived streams
+
+    Each source key is read through the `synapse-splitter` consumer group,
+    so several Synapse replicas share the work and a restart resumes where
+    it stopped. Entries are acked only after their copy is written (a crash
+    in between can duplicate a copy, never lose one). In "move" mode the
+    source entry is deleted once copied.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        streams: Dict[str, Optional[Set[str]]],
+        partitioner: Optional[StreamPartitioner] = None,
+        mode: str = "copy",
+        max_types: int = 100,
+        max_length: Optional[int] = None,
+        batch_size: int = 500,
+        block_ms: int = 5000,
+        on_new_stream: Optional[Callable[[str, str], None]] = None
+    ):
+        """
+        Initialize stream splitter
+
+        `on_new_stream(derived, source)` is called the first time a derived
+        stream is written, e.g. to give it a retention policy.
+        """
+        if mode not in SPLIT_MODES:
+            raise ValueError(f"Unknown split mode '{mode}'")
+        self.redis = redis_client
+        self.streams = streams
+        self.partitioner = partitioner or StreamPartitioner()
+        self.mode = mode
+        self.max_types = max_types
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.on_new_stream = on_new_stream
+        self.consumer_name = socket.gethostname()
+        self._tasks: List[asyncio.Task] = []
+        self._derived: Dict[str, Set[str]] = {name: set() for name in streams}
+        self.split: Dict[str, int] = {}
+        self.unsplit = 0
+        self.errors = 0
+
+    def _target(self, stream_name: str, fields: Dict[str, Any]) -> Optional[str]:
+        """Derived stream for an entry, or None to leave it unsplit"""
+        event_type = fields.get("event")
+        allowed = self.streams.get(stream_name)
+        if not event_type or not _TYPE_PATTERN.match(event_type):
+            return None
+        if allowed is not None and event_type not in allowed:
+            return None
+        derived = derived_stream(stream_name, event_type)
+        return derived if self._register(stream_name, derived) else None
+
+    def _register(self, stream_name: str, derived: str) -> bool:
+        """Track a derived stream; False once the source has max_types of them"""
+        known = self._derived[stream_name]
+        if derived in known:
+            return True
+        if len(known) >= self.max_types:
+            return False
+        known.add(derived)
+        if self.on_new_stream:
+            self.on_new_stream(derived, stream_name)
+        return True
+
+    async def split_entries(self, stream_name: str, key: str, entries: List[Entry]) -> int:
+        """Copy one batch of a source key into derived streams, then ack it"""
+        pipe = self.redis.pipeline(transaction=False)
+        copied = 0
+        for entry_id, fields in entries:
+            if not fields:
+                continue  # Pending entry deleted from the source since it was read
+            target = self._target(stream_name, fields)
+            if target is None:
+                self.unsplit += 1
+                continue
+            if self.max_length:
+                pipe.xadd(target, fields, maxlen=self.max_length, approximate=True)
+            else:
+                pipe.xadd(target, fields)
+            self.split[target] = self.split.get(target, 0) + 1
+            copied += 1
+        await pipe.execute()
+
+        ids = [entry_id for entry_id, _ in entries]
+        await self.redis.xack(key, SPLITTER_GROUP, *ids)
+        if self.mode == "move":
+            await self.redis.xdel(key, *ids)
+        return copied
+
+    async def _ensure_group(self, key: str):
+        try:
+            await self.redis.xgroup_create(key, SPLITTER_GROUP, id="$", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def _read(self, key: str, start: str) -> List[Entry]:
+        response = await self.redis.xreadgroup(
+            SPLITTER_GROUP,
+            self.consumer_name,
+            {key: start},
+            count=self.batch_size,
+            block=None if start == "0" else self.block_ms
+        )
+        results = response.items() if isinstance(response, dict) else (response or [])
+        return [entry for _, entries in results for entry in entries]
+
+    async def _loop(self, stream_name: str, key: str):
+        ready = False
+        start = "0"  # Entries this consumer read but never acked come first
+        while True:
+            try:
+                if not ready:
+                    await self._ensure_group(key)
+                    ready = True
+                entries = await self._read(key, start)
+                if start == "0" and not entries:
+                    start = ">"
+                    continue
+                if entries:
+                    await self.split_entries(stream_name, key, entries)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Splitting {key} failed: {e}")
+                start = "0"  # Retry the unacked batch
+                await asyncio.sleep(1)
+
+    def start(self):
+        """Start one reader task per source key"""
+        if self._tasks:
+            return
+        for stream_name, allowed in self.streams.items():
+            for event_type in sorted(allowed or ()):
+                self._register(stream_name, derived_stream(stream_name, event_type))
+        for stream_name in self.streams:
+            for key in self.partitioner.partitions(stream_name):
+                self._tasks.append(asyncio.create_task(self._loop(stream_name, key)))
+
+    async def stop(self):
+        """Stop all reader tasks"""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Any]:
+        """Splitter metrics for the metrics endpoint"""
+        return {
+            "mode": self.mode,
+            "split": dict(self.split),
+            "unsplit": self.unsplit,
+            "errors": self.errors,
+        }
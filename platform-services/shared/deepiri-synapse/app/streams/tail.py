@@ -0,0 +1,304 @@
+"""
+Live tailing for Synapse
+One blocking XREAD per stream, fanned out to every subscribed client
+"""
+import asyncio
+import logging
+import redis.asyncio as redis
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from ..schemas.registry import SchemaRegistry
+from .filters import Filters, matches
+from .ids import id_text, merge_entry_streams
+from .partitions import StreamPartitioner
+
+logger = logging.getLogger(__name__)
+
+Entry = Tuple[str, Dict[str, Any]]
+
+OVERFLOW_POLICIES = ("drop", "disconnect")
+
+# Queued for a subscriber to end its event iterator
+_CLOSED = None
+
+
+class TailSubscriber:
+    """One client of a stream tail, with its own bounded queue"""
+
+    def __init__(
+        self,
+        stream_name: str,
+        filters: Optional[Filters] = None,
+        queue_size: int = 1000,
+        overflow: str = "drop"
+    ):
+        """
+        Initialize subscriber
+
+        With overflow "drop", a full queue discards its oldest entry to make
+        room; with "disconnect", the subscriber is closed instead.
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}'")
+        self.stream_name = stream_name
+        self.stream_keys: List[str] = [stream_name]
+        self.filters = filters or {}
+        self.overflow = overflow
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.resume_after: Dict[str, str] = {}
+        self.resume_until: Dict[str, str] = {}
+        # Last ID yielded (or the start) per stream key, for TailHub.cursor
+        self.positions: Dict[str, str] = {}
+        self.dropped = 0
+        self.overflowed = False
+
+
+class _StreamTail:
+    """Shared reader state for one stream"""
+
+    def __init__(self, stream_name: str, cursor: str):
+        self.stream_name = stream_name
+        self.cursor = cursor
+        self.subscribers: Set[TailSubscriber] = set()
+        self.task: Optional[asyncio.Task] = None
+
+
+class TailHub:
+    """
+    Fans live stream entries out to subscribers
+
+    A stream's reader starts with its first subscriber and stops with its
+    last, so Redis sees one XREAD BLOCK per tailed stream regardless of how
+    many clients are attached. Slow clients only ever fill their own queue.
+    Works with a bytes-mode client: entry IDs are yielded as text, fields
+    as read (upcast through `schema_registry` when given). A partitioned
+    stream is tailed through one reader per partition feeding the same
+    subscriber queue; live entries keep per-partition order.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        block_ms: int = 5000,
+        batch_size: int = 500,
+        queue_size: int = 1000,
+        overflow: str = "drop",
+        schema_registry: Optional[SchemaRegistry] = None,
+        partitioner: Optional[StreamPartitioner] = None
+    ):
+        """Initialize tail hub"""
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}'")
+        self.redis = redis_client
+        self.schema_registry = schema_registry
+        self.partitioner = partitioner or StreamPartitioner()
+        self.block_ms = block_ms
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self._tails: Dict[str, _StreamTail] = {}
+        self._lock = asyncio.Lock()
+        self.delivered = 0
+        self.dropped = 0
+        self.disconnected = 0
+        self.errors = 0
+
+    async def subscribe(
+        self,
+        stream_name: str,
+        filters: Optional[Filters] = None,
+        resume_after: Optional[str] = None,
+        overflow: Optional[str] = None
+    ) -> TailSubscriber:
+        """
+        Attach a subscriber to a stream's live tail
+
+        With `resume_after` (a cursor from TailHub.cursor, or one position
+        for every partition), entries after it up to the reader's current
+        position are read back first, so a reconnecting client sees no gap.
+
+        Raises:
+            ValueError: If `resume_after` is malformed
+        """
+        subscriber = TailSubscriber(
+            stream_name, filters, self.queue_size, overflow or self.overflow
+        )
+        subscriber.stream_keys = self.partitioner.partitions(stream_name)
+        if resume_after:
+            subscriber.resume_after = self.partitioner.parse_cursor(stream_name, resume_after)
+        async with self._lock:
+            for key in subscriber.stream_keys:
+                tail = self._tails.get(key)
+                if tail is None:
+                    # Start from a concrete ID (not "$") so resumes have an upper bound
+                    newest = await self.redis.xrevrange(key, count=1)
+                    tail = _StreamTail(key, id_text(newest[0][0]) if newest else "0-0")
+                    tail.task = asyncio.create_task(self._read_loop(tail))
+                    self._tails[key] = tail
+                if key in subscriber.resume_after:
+                    subscriber.resume_until[key] = tail.cursor
+                subscriber.positions[key] = subscriber.resume_after.get(key, tail.cursor)
+                tail.subscribers.add(subscriber)
+        return subscriber
+
+    def cursor(self, subscriber: TailSubscriber) -> Optional[str]:
+        """Resume position after the entries yielded so far (the SSE event id)"""
+        return self.partitioner.encode_cursor(subscriber.stream_name, subscriber.positions)
+
+    async def unsubscribe(self, subscriber: TailSubscriber):
+        """Detach a subscriber, stopping each reader it was the last one on"""
+        stopped = []
+        async with self._lock:
+            for key in subscriber.stream_keys:
+                tail = self._tails.get(key)
+                if tail is None:
+                    continue
+                tail.subscribers.discard(subscriber)
+                if not tail.subscribers:
+                    del self._tails[key]
+                    stopped.append(tail)
+        for tail in stopped:
+            tail.task.cancel()
+            try:
+                await tail.task
+            except asyncio.CancelledError:
+                pass
+
+    async def _resumed(
+        self,
+        subscriber: TailSubscriber,
+        key: str
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any], str]]:
+        lower = f"({subscriber.resume_after[key]}"
+        while True:
+            batch = await self.redis.xrange(
+                key, min=lower, max=subscriber.resume_until[key], count=self.batch_size
+            )
+            for entry_id, fields in batch:
+                yield id_text(entry_id), fields, key
+            if len(batch) < self.batch_size:
+                return
+            lower = f"({id_text(batch[-1][0])}"
+
+    async def events(
+        self,
+        subscriber: TailSubscriber,
+        heartbeat_seconds: Optional[float] = None
+    ) -> AsyncIterator[Optional[Entry]]:
+        """
+        Yield the subscriber's entries: the resumed range first, then live ones
+
+        Yields None after `heartbeat_seconds` without an entry, so callers
+        can send keepalives. Ends when the subscriber is closed.
+        """
+        if subscriber.resume_after:
+            resumed = merge_entry_streams(
+                [self._resumed(subscriber, key) for key in subscriber.resume_until]
+            )
+            async for entry_id, fields, key in resumed:
+                subscriber.positions[key] = entry_id
+                if self.schema_registry:
+                    fields = self.schema_registry.upcast_fields(fields)
+                if not subscriber.filters or matches(fields, subscriber.filters):
+                    yield entry_id, fields
+
+        while True:
+            try:
+                entry = await asyncio.wait_for(subscriber.queue.get(), heartbeat_seconds)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if entry is _CLOSED:
+                return
+            entry_id, fields, key = entry
+            subscriber.positions[key] = entry_id
+            yield entry_id, fields
+
+    def _offer(self, subscriber: TailSubscriber, entry: Tuple[str, Dict[str, Any], str]) -> bool:
+        """Queue an entry for a subscriber; False once it must be disconnected"""
+        try:
+            subscriber.queue.put_nowait(entry)
+            self.delivered += 1
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        if subscriber.overflow == "disconnect":
+            subscriber.overflowed = True
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(_CLOSED)
+            self.disconnected += 1
+            return False
+
+        subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(entry)
+        subscriber.dropped += 1
+        self.dropped += 1
+        self.delivered += 1
+        return True
+
+    def _dispatch(self, tail: _StreamTail, entry: Entry):
+        entry_id, fields = entry
+        if self.schema_registry:
+            fields = self.schema_registry.upcast_fields(fields)
+        # Queued with its key so events() can track per-partition positions
+        entry = (entry_id, fields, tail.stream_name)
+        for subscriber in list(tail.subscribers):
+            if subscriber.overflowed:
+                # Disconnected through another partition's reader
+                tail.subscribers.discard(subscriber)
+                continue
+            if subscriber.filters and not matches(fields, subscriber.filters):
+                continue
+            if not self._offer(subscriber, entry):
+                tail.subscribers.discard(subscriber)
+
+    async def _read_loop(self, tail: _StreamTail):
+        while True:
+            try:
+                response = await self.redis.xread(
+                    {tail.stream_name: tail.cursor},
+                    count=self.batch_size,
+                    block=self.block_ms
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Tail read failed for {tail.stream_name}: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            # RESP2 returns [[stream, entries]], RESP3 {stream: entries}
+            results = response.items() if isinstance(response, dict) else (response or [])
+            for _, entries in results:
+                for entry_id, fields in entries:
+                    tail.cursor = id_text(entry_id)
+                    self._dispatch(tail, (tail.cursor, fields))
+
+    async def stop(self):
+        """Stop all readers and close every subscriber"""
+        async with self._lock:
+            tails = list(self._tails.values())
+            self._tails.clear()
+        for tail in tails:
+            tail.task.cancel()
+            try:
+                await tail.task
+            except asyncio.CancelledError:
+                pass
+            for subscriber in tail.subscribers:
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                subscriber.queue.put_nowait(_CLOSED)
+
+    def stats(self) -> Dict[str, Any]:
+        """Tail metrics for the metrics endpoint"""
+        return {
+            "subscribers": {name: len(t.subscribers) for name, t in self._tails.items()},
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "disconnected": self.disconnected,
+            "read_errors": self.errors,
+        }
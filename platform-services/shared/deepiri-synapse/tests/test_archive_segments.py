@@ -0,0 +1,46 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.storage.blob import LocalBlobStore  # noqa: E402
+from app.storage.segments import (  # noqa: E402
+    build_segment,
+    chunks_in_range,
+    decode_chunk,
+    encode_chunk,
+)
+
+ENTRIES = [
+    (f"1700000000{i:03d}-0", {"event": "training", "epoch": str(i), **({"loss": "0.5"} if i % 2 else {})})
+    for i in range(25)
+]
+
+
+class TestSegments(unittest.TestCase):
+    def test_chunk_round_trip_keeps_sparse_fields(self):
+        self.assertEqual(decode_chunk(encode_chunk(ENTRIES)), ENTRIES)
+
+    def test_index_locates_chunks_by_id(self):
+        body, index = build_segment("training-events", ENTRIES, chunk_size=10)
+        self.assertEqual(len(index["chunks"]), 3)
+        self.assertEqual(index["count"], 25)
+        selected = chunks_in_range(index, ENTRIES[12][0], ENTRIES[14][0])
+        self.assertEqual([c["first_id"] for c in selected], [ENTRIES[10][0]])
+
+        chunk = selected[0]
+        with tempfile.TemporaryDirectory() as root:
+            store = LocalBlobStore(root)
+            store.put("training-events/seg", body)
+            data = store.get("training-events/seg", chunk["offset"], chunk["length"])
+        self.assertEqual(decode_chunk(data), ENTRIES[10:20])
+
+    def test_local_store_rejects_escaping_keys(self):
+        with tempfile.TemporaryDirectory() as root:
+            with self.assertRaises(ValueError):
+                LocalBlobStore(root).put("../outside", b"x")
+
+
+if __name__ == "__main__":
+    unittest.main()
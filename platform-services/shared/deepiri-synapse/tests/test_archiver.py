@@ -0,0 +1,96 @@
+import asyncio
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.storage.blob import LocalBlobStore  # noqa: E402
+from app.streams.archiver import StreamArchiver  # noqa: E402
+from app.streams.keys import stream_key  # noqa: E402
+
+WATERMARK = stream_key("model-events", "archive", "watermark")
+LOCK = stream_key("model-events", "archive", "lock")
+
+
+class FakeRedis:
+    """Just enough of a client for trim_before and the archive lock"""
+
+    def __init__(self, watermark=None, locked_by=None):
+        self.values = {}
+        if watermark:
+            self.values[WATERMARK] = watermark
+        if locked_by:
+            self.values[LOCK] = locked_by
+        self.trimmed_to = None
+
+    def register_script(self, source):
+        async def release(keys, args):
+            if self.values.get(keys[0]) == args[0]:
+                del self.values[keys[0]]
+                return 1
+            return 0
+        return release
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def xrange(self, stream_name, min="-", max="+", count=None):
+        return []
+
+    async def xtrim(self, stream_name, minid=None, approximate=True):
+        self.trimmed_to = minid
+        return 0
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class TestTrimBefore(unittest.TestCase):
+    def archiver(self, client, root):
+        return StreamArchiver(client, LocalBlobStore(root), ["model-events"])
+
+    def test_lock_held_elsewhere_trims_only_to_watermark(self):
+        client = FakeRedis(watermark="100-0", locked_by="other-replica")
+        with tempfile.TemporaryDirectory() as root:
+            run(self.archiver(client, root).trim_before("model-events", "500-0"))
+        self.assertEqual(client.trimmed_to, "100-1")
+        self.assertEqual(client.values[LOCK], "other-replica")
+
+    def test_nothing_archived_trims_nothing(self):
+        client = FakeRedis(locked_by="other-replica")
+        with tempfile.TemporaryDirectory() as root:
+            self.assertEqual(run(self.archiver(client, root).trim_before("model-events", "500-0")), 0)
+        self.assertIsNone(client.trimmed_to)
+
+    def test_watermark_past_min_id_trims_to_min_id(self):
+        client = FakeRedis(watermark="900-0")
+        with tempfile.TemporaryDirectory() as root:
+            run(self.archiver(client, root).trim_before("model-events", "500-0"))
+        self.assertEqual(client.trimmed_to, "500-0")
+        self.assertNotIn(LOCK, client.values)
+
+    def test_expired_lock_taken_over_is_not_released(self):
+        client = FakeRedis(watermark="900-0")
+        original_xrange = client.xrange
+
+        async def xrange(*args, **kwargs):
+            # Our lock expires mid-run and another replica takes it
+            client.values[LOCK] = "other-replica"
+            return await original_xrange(*args, **kwargs)
+
+        client.xrange = xrange
+        with tempfile.TemporaryDirectory() as root:
+            run(self.archiver(client, root).archive_range("model-events"))
+        self.assertEqual(client.values[LOCK], "other-replica")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+try:
+    import fakeredis  # Runs the publish scripts when lupa is installed
+except ImportError:
+    fakeredis = None
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app import main  # noqa: E402
+from app.config import Settings  # noqa: E402
+from app.monitoring.backpressure import BackpressureSignal  # noqa: E402
+from app.producers.batch_ingestor import BatchIngestor, encode_fields, parse_events  # noqa: E402
+from app.producers.idempotency import DedupWindow  # noqa: E402
+from app.streams.partitions import PartitionSpec, StreamPartitioner  # noqa: E402
+
+
+class TestParseEvents(unittest.TestCase):
+    def test_json_array_and_single_object(self):
+        self.assertEqual(len(parse_events(b'[{"event": "a"}, {"event": "b"}]', "application/json")), 2)
+        self.assertEqual(parse_events(b'{"event": "a"}', None), [{"event": "a"}])
+
+    def test_ndjson_skips_blank_lines(self):
+        body = b'{"event": "a"}\n\n{"event": "b"}\n'
+        events = parse_events(body, "application/x-ndjson; charset=utf-8")
+        self.assertEqual([e["event"] for e in events], ["a", "b"])
+
+    def test_ndjson_reports_bad_line(self):
+        with self.assertRaisesRegex(ValueError, "line 2"):
+            parse_events(b'{"event": "a"}\n{oops', "application/x-ndjson")
+
+    def test_encode_fields_flattens_nested_values(self):
+        fields = encode_fields({"input": {"text": "hi"}, "ok": True, "skip": None, "n": 3})
+        self.assertEqual(fields, {"input": '{"text":"hi"}', "ok": "true", "n": 3})
+
+
+def model_ready(version, **fields):
+    return {"event": "model-ready", "model_name": "m1", "version": str(version), **fields}
+
+
+@unittest.skipUnless(fakeredis, "fakeredis not installed")
+class TestIngest(unittest.TestCase):
+    def run_ingest(self, scenario, **kwargs):
+        async def run():
+            client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+            pipelines = []
+            pipeline = client.pipeline
+
+            def counted(*args, **kw):
+                pipelines.append(1)
+                return pipeline(*args, **kw)
+            client.pipeline = counted
+            ingestor = BatchIngestor(client, **kwargs)
+            return await scenario(client, ingestor), len(pipelines)
+        return asyncio.run(run())
+
+    def test_partitions_written_in_one_pipeline(self):
+        partitioner = StreamPartitioner({"model-events": PartitionSpec(count=2)})
+
+        async def scenario(client, ingestor):
+            results = await ingestor.ingest("model-events", [model_ready(i) for i in range(4)])
+            lengths = [await client.xlen(f"model-events:{i}") for i in range(2)]
+            return results, lengths, ingestor.functions.calls["publish_batch"]
+
+        (results, lengths, calls), pipelines = self.run_ingest(scenario, partitioner=partitioner)
+        self.assertEqual([r["index"] for r in results], [0, 1, 2, 3])
+        self.assertTrue(all("id" in r for r in results))
+        self.assertEqual(lengths, [2, 2])
+        self.assertEqual((calls, pipelines), (2, 1))
+
+    def test_per_event_errors(self):
+        async def scenario(client, ingestor):
+            results = await ingestor.ingest("model-events", [model_ready(1), "oops", model_ready(2)])
+            return results, await client.xlen("model-events")
+
+        (results, length), _ = self.run_ingest(scenario)
+        self.assertEqual(results[1], {"index": 1, "error": "event must be a JSON object"})
+        self.assertIn("id", results[0])
+        self.assertIn("id", results[2])
+        self.assertEqual(length, 2)
+
+    def test_failed_stream_call_fails_only_its_events(self):
+        partitioner = StreamPartitioner({"model-events": PartitionSpec(count=2)})
+
+        async def scenario(client, ingestor):
+            await client.set("model-events:0", "not a stream")
+            events = [model_ready(i) for i in range(4)]
+            return await ingestor.ingest("model-events", events), ingestor.rejected
+
+        (results, rejected), _ = self.run_ingest(scenario, partitioner=partitioner)
+        failed = [r for r in results if "error" in r]
+        self.assertEqual(len(failed), 2)
+        self.assertIn("WRONGTYPE", failed[0]["error"])
+        self.assertEqual(rejected, 2)
+
+    def test_retry_is_reported_as_duplicate(self):
+        async def scenario(client, ingestor):
+            first = await ingestor.ingest("model-events", [model_ready(1, idempotency_key="k1")])
+            retry = await ingestor.ingest(
+                "model-events", [model_ready(1, idempotency_key="k1"), model_ready(2)]
+            )
+            return first, retry, await client.xlen("model-events")
+
+        (first, retry, length), _ = self.run_ingest(scenario, dedup=DedupWindow(60))
+        self.assertEqual(retry[0], {"index": 0, "id": first[0]["id"], "duplicate": True})
+        self.assertNotIn("duplicate", retry[1])
+        self.assertEqual(length, 2)
+
+
+class Overloaded:
+    async def check(self, stream_name):
+        return BackpressureSignal(reason="lag", retry_after_seconds=5)
+
+
+class Idle:
+    async def check(self, stream_name):
+        return None
+
+
+class TestPublishEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.saved = main.settings, main.stream_manager, main.backpressure_monitor
+        main.settings = Settings(ingest_max_batch=2)
+        main.stream_manager = SimpleNamespace(streams={"model-events": {}})
+        self.client = TestClient(main.app)
+
+    def tearDown(self):
+        main.settings, main.stream_manager, main.backpressure_monitor = self.saved
+
+    def test_backpressure_returns_429(self):
+        main.backpressure_monitor = Overloaded()
+        response = self.client.post("/streams/model-events/events", json=[model_ready(1)])
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["retry-after"], "5")
+        self.assertEqual(response.json()["reason"], "lag")
+
+    def test_oversized_batch_returns_413(self):
+        main.backpressure_monitor = Idle()
+        events = [model_ready(i) for i in range(3)]
+        response = self.client.post("/streams/model-events/events", json=events)
+        self.assertEqual(response.status_code, 413)
+
+
+if __name__ == "__main__":
+    unittest.main()
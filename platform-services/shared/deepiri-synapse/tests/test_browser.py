@@ -0,0 +1,148 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.streams.browser import MessageBrowser, PageQuery, PageState  # noqa: E402
+from app.streams.ids import parse_id  # noqa: E402
+from app.streams.partitions import PartitionSpec, StreamPartitioner  # noqa: E402
+
+
+class FakeRedis:
+    """XRANGE/XREVRANGE over in-memory streams, honouring exclusive bounds"""
+
+    def __init__(self, streams):
+        self.streams = streams
+
+    def _select(self, stream_name, low, high, count, reverse):
+        def position(bound, default):
+            if bound in ("-", "+"):
+                return default, False
+            if bound.startswith("("):
+                return parse_id(bound[1:]), True
+            return parse_id(bound), False
+
+        low_id, low_open = position(low, (0, 0))
+        high_id, high_open = position(high, (2 ** 64, 0))
+        entries = [
+            (entry_id, fields) for entry_id, fields in self.streams.get(stream_name, [])
+            if (low_id < parse_id(entry_id) or not low_open and low_id == parse_id(entry_id))
+            and (parse_id(entry_id) < high_id or not high_open and high_id == parse_id(entry_id))
+        ]
+        if reverse:
+            entries.reverse()
+        return entries[:count]
+
+    async def xrange(self, stream_name, min="-", max="+", count=None):
+        return self._select(stream_name, min, max, count, reverse=False)
+
+    async def xrevrange(self, stream_name, max="+", min="-", count=None):
+        return self._select(stream_name, min, max, count, reverse=True)
+
+
+def read_page(browser, query):
+    async def collect():
+        state = PageState()
+        entries = [entry async for entry in browser.iter_page(query, state)]
+        return entries, state.next_cursor
+    return asyncio.run(collect())
+
+
+def events(count):
+    return [
+        (f"{i}-0", {"n": str(i), "model_name": "a" if i % 3 == 0 else "b", "payload": "x"})
+        for i in range(1, count + 1)
+    ]
+
+
+class TestPages(unittest.TestCase):
+    def setUp(self):
+        self.browser = MessageBrowser(
+            FakeRedis({"model-events": events(10)}), batch_size=3, max_scan_factor=2
+        )
+
+    def test_cursor_pages_through_the_stream(self):
+        query = PageQuery("model-events", count=4)
+        pages = []
+        while True:
+            entries, cursor = read_page(self.browser, query)
+            pages.append([e[0] for e in entries])
+            if cursor is None:
+                break
+            query.cursor = cursor
+        self.assertEqual(pages, [
+            ["10-0", "9-0", "8-0", "7-0"], ["6-0", "5-0", "4-0", "3-0"], ["2-0", "1-0"]
+        ])
+
+    def test_full_page_keeps_cursor_at_last_entry(self):
+        entries, cursor = read_page(self.browser, PageQuery("model-events", count=3, descending=False))
+        self.assertEqual(cursor, "3-0")
+        self.assertEqual(entries[-1][0], cursor)
+
+    def test_end_of_range_clears_cursor(self):
+        query = PageQuery("model-events", count=5, start_id="7-0", descending=False)
+        entries, cursor = read_page(self.browser, query)
+        self.assertEqual([e[0] for e in entries], ["7-0", "8-0", "9-0", "10-0"])
+        self.assertIsNone(cursor)
+
+    def test_filtered_page_stops_at_scan_limit(self):
+        # count=2 scans at most 4 entries: 10, 9 (match), 8, 7
+        query = PageQuery("model-events", count=2, filters={"model_name": {"a"}})
+        entries, cursor = read_page(self.browser, query)
+        self.assertEqual([e[0] for e in entries], ["9-0"])
+        self.assertEqual(cursor, "7-0")
+
+        query.cursor = cursor
+        entries, cursor = read_page(self.browser, query)
+        self.assertEqual([e[0] for e in entries], ["6-0", "3-0"])
+        self.assertEqual(cursor, "3-0")
+
+    def test_projection(self):
+        query = PageQuery("model-events", count=2, fields=["n", "missing"])
+        entries, _ = read_page(self.browser, query)
+        self.assertEqual(entries, [("10-0", {"n": "10"}), ("9-0", {"n": "9"})])
+
+
+class TestPartitionedPages(unittest.TestCase):
+    def setUp(self):
+        client = FakeRedis({
+            "inference-events:0": [("1-0", {"n": "1"}), ("4-0", {"n": "4"}), ("5-0", {"n": "5"})],
+            "inference-events:1": [("2-0", {"n": "2"}), ("3-0", {"n": "3"}), ("6-0", {"n": "6"})],
+        })
+        partitioner = StreamPartitioner({"inference-events": PartitionSpec(count=2)})
+        self.browser = MessageBrowser(client, batch_size=2, partitioner=partitioner)
+
+    def test_pages_merge_partitions_by_id(self):
+        query = PageQuery("inference-events", count=4, descending=False)
+        entries, cursor = read_page(self.browser, query)
+        self.assertEqual([e[0] for e in entries], ["1-0", "2-0", "3-0", "4-0"])
+
+        query.cursor = cursor
+        entries, _ = read_page(self.browser, query)
+        self.assertEqual([e[0] for e in entries], ["5-0", "6-0"])
+
+    def test_shared_ids_are_not_skipped_at_page_boundary(self):
+        # Partitions generate IDs independently, so both can hold "2-0"
+        client = FakeRedis({
+            "inference-events:0": [("1-0", {"p": "0"}), ("2-0", {"p": "0"})],
+            "inference-events:1": [("2-0", {"p": "1"}), ("3-0", {"p": "1"})],
+        })
+        self.browser.redis = client
+        query = PageQuery("inference-events", count=2, descending=False)
+        seen = []
+        while True:
+            entries, cursor = read_page(self.browser, query)
+            seen.extend((e[0], e[1]["p"]) for e in entries)
+            if cursor is None:
+                break
+            query.cursor = cursor
+        self.assertEqual(sorted(seen), [("1-0", "0"), ("2-0", "0"), ("2-0", "1"), ("3-0", "1")])
+
+    def test_descending_across_partitions(self):
+        entries, _ = read_page(self.browser, PageQuery("inference-events", count=3))
+        self.assertEqual([e[0] for e in entries], ["6-0", "5-0", "4-0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
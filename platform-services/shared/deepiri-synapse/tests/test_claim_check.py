@@ -0,0 +1,122 @@
+import asyncio
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.consumers.event_router import EventRouter  # noqa: E402
+from app.storage.blob import LocalBlobStore  # noqa: E402
+from app.storage.claim_check import ClaimCheck, ClaimRef  # noqa: E402
+
+
+class CountingStore(LocalBlobStore):
+    def __init__(self, root):
+        super().__init__(root)
+        self.gets = []
+
+    def get(self, key):
+        self.gets.append(key)
+        return super().get(key)
+
+
+class FakeRedis:
+    """Acks only; the router's scripts are never called"""
+
+    def __init__(self):
+        self.acked = []
+
+    def register_script(self, source):
+        return None
+
+    async def xack(self, stream, group, msg_id):
+        self.acked.append(msg_id)
+
+
+class TestClaimCheck(unittest.TestCase):
+    def test_offload_and_resolve(self):
+        async def scenario(root):
+            store = LocalBlobStore(root)
+            claims = ClaimCheck(store, threshold_bytes=100)
+            big = "x" * 1000
+            fields = await claims.offload({"event": "inference", "output": big})
+            self.assertEqual(fields["event"], "inference")
+            ref = ClaimRef.parse(fields["output"])
+            self.assertEqual(ref.size, 1000)
+            self.assertTrue(store.exists(ref.key))
+
+            # Identical payloads share one blob
+            again = await claims.offload({"output": big})
+            self.assertEqual(again["output"], fields["output"])
+            self.assertEqual(len(store.list("claims/")), 1)
+
+            resolved = await claims.resolve_fields(fields)
+            self.assertEqual(resolved["output"], big)
+            self.assertEqual(await claims.resolve(fields["output"]), big)
+            self.assertEqual(claims.resolved, 1)
+            self.assertEqual(claims.cache_hits, 1)
+
+            store.put(ref.key, b"y" * 1000)
+            fresh = ClaimCheck(store, threshold_bytes=100)
+            with self.assertRaises(ValueError):
+                await fresh.resolve(fields["output"])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            asyncio.run(scenario(tmp))
+
+    def test_bytes_resolve_to_bytes(self):
+        async def scenario(root):
+            claims = ClaimCheck(LocalBlobStore(root), threshold_bytes=10)
+            blob = bytes(range(256)) * 4
+            text = "y" * 100
+            fields = await claims.offload({"blob": blob, "text": text})
+            self.assertTrue(ClaimRef.parse(fields["blob"]).binary)
+            self.assertFalse(ClaimRef.parse(fields["text"]).binary)
+            for _ in range(2):  # Miss, then cache hit
+                resolved = await claims.resolve_fields(fields)
+                self.assertEqual(resolved, {"blob": blob, "text": text})
+
+            # Same content offloaded as text and as bytes keeps each type
+            as_text = await claims.offload({"v": "z" * 100})
+            as_bytes = await claims.offload({"v": b"z" * 100})
+            self.assertEqual(await claims.resolve(as_text["v"]), "z" * 100)
+            self.assertEqual(await claims.resolve(as_bytes["v"]), b"z" * 100)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            asyncio.run(scenario(tmp))
+
+    def test_router_resolves_only_declared_fields(self):
+        async def scenario(root):
+            store = CountingStore(root)
+            claims = ClaimCheck(store, threshold_bytes=10)
+            fields = await claims.offload({"event": "inference", "input": "i" * 50, "output": "o" * 50})
+            router = EventRouter(FakeRedis(), claim_check=claims)
+            seen = []
+
+            async def summary(event):
+                seen.append(("summary", event["input"], event["output"]))
+
+            async def outputs(event):
+                seen.append(("outputs", event["output"]))
+
+            router.register_handler("inference-events", summary, claim_fields=[])
+            router.register_handler("inference-events", outputs, claim_fields=["output"])
+            await router._deliver("inference-events", "g", "inference-events", "1-0", fields)
+
+            self.assertEqual(seen, [
+                ("summary", fields["input"], fields["output"]),
+                ("outputs", "o" * 50),
+            ])
+            self.assertEqual(len(store.gets), 1)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            asyncio.run(scenario(tmp))
+
+    def test_ordinary_values_pass_through(self):
+        self.assertIsNone(ClaimRef.parse('{"claim_check": "nope"}'))
+        self.assertIsNone(ClaimRef.parse("plain"))
+        self.assertEqual(asyncio.run(ClaimCheck(None).resolve("plain")), "plain")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import sys
+import unittest
+from pathlib import Path
+
+from redis.crc import key_slot
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.connection import group_by_slot  # noqa: E402
+from app.streams.keys import stream_key  # noqa: E402
+from app.streams.partitions import partition_name  # noqa: E402
+
+
+def slot(key: str) -> int:
+    return key_slot(key.encode())
+
+
+class TestClusterKeyLayout(unittest.TestCase):
+    def test_auxiliary_keys_share_the_stream_slot(self):
+        for stream_name in ("inference-events", partition_name("inference-events", 3)):
+            self.assertEqual(slot(stream_key(stream_name, "archive", "watermark")), slot(stream_name))
+            self.assertEqual(slot(stream_key(stream_name, "idx", "model_id", "m1")), slot(stream_name))
+
+    def test_group_by_slot(self):
+        partitions = [partition_name("inference-events", i) for i in range(8)]
+        keys = partitions + [stream_key(partitions[0], "archive", "lock")]
+        groups = group_by_slot(keys)
+        self.assertEqual(sum(len(g) for g in groups), len(keys))
+        for group in groups:
+            self.assertEqual(len({slot(key) for key in group}), 1)
+        self.assertIn([partitions[0], keys[-1]], groups)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.consumers.coalescing import Coalescer  # noqa: E402
+from app.consumers.event_router import EventRouter  # noqa: E402
+from app.monitoring.prometheus import EVENTS_COALESCED, EVENTS_CONSUMED  # noqa: E402
+from app.streams.ids import parse_id  # noqa: E402
+
+
+class PendingRedis:
+    """A consumer's pending entries left by an earlier run; no new entries arrive"""
+
+    def __init__(self, pending):
+        self.pending = pending
+        self.acked = []
+
+    def register_script(self, source):
+        return None
+
+    async def xreadgroup(self, group, consumer, streams, count=None, block=None):
+        reply = []
+        for key, cursor in streams.items():
+            if cursor == ">":
+                await asyncio.sleep(block / 1000)
+                continue
+            msgs = [
+                (msg_id, data) for msg_id, data in self.pending.get(key, [])
+                if parse_id(msg_id) > parse_id(cursor) and (key, msg_id) not in self.acked
+            ]
+            if msgs:
+                reply.append([key, msgs[:count]])
+        return reply
+
+    async def xack(self, stream, group, *msg_ids):
+        self.acked.extend((stream, msg_id) for msg_id in msg_ids)
+
+
+class TestCoalescer(unittest.TestCase):
+    def test_latest_per_key_after_window(self):
+        c = Coalescer("model_id", window_seconds=2.0)
+        self.assertEqual(c.offer("s", "1-0", {"model_id": "m1", "v": "1"}, now=0.0), (None, []))
+        self.assertEqual(c.offer("s", "2-0", {"model_id": "m1", "v": "2"}, now=1.0), (None, [("s", "1-0")]))
+        self.assertEqual(c.due(now=1.5), [])
+        self.assertEqual(c.next_deadline(), 2.0)
+        self.assertEqual(c.due(now=2.0), [("s", "2-0", {"model_id": "m1", "v": "2"})])
+        self.assertEqual(c.stats()["coalesced"], 1)
+        self.assertIsNone(c.next_deadline())
+
+    def test_merge_mode(self):
+        c = Coalescer("model_id", window_seconds=1.0, mode="merge")
+        c.offer("s", "1-0", {"model_id": "m1", "a": "1"}, now=0.0)
+        # Merged entries are only handed back once the merged event is out
+        self.assertEqual(c.offer("s", "2-0", {"model_id": "m1", "b": "2"}, now=0.1), (None, []))
+        self.assertEqual(c.due(now=1.0), [("s", "2-0", {"model_id": "m1", "a": "1", "b": "2"})])
+        self.assertEqual(c.take_merged("s", "2-0"), ["1-0"])
+        self.assertEqual(c.take_merged("s", "2-0"), [])
+
+    def test_unkeyed_and_other_types_pass_through(self):
+        c = Coalescer("model_id", window_seconds=1.0, event_types={"model-ready"})
+        ready, _ = c.offer("s", "1-0", {"event": "model-ready"}, now=0.0)
+        self.assertEqual(ready, ("s", "1-0", {"event": "model-ready"}))
+        ready, _ = c.offer("s", "2-0", {"event": "model-failed", "model_id": "m1"}, now=0.0)
+        self.assertIsNotNone(ready)
+        with self.assertRaises(ValueError):
+            Coalescer("model_id", 1.0, mode="first")
+
+
+class TestRouterCoalescing(unittest.TestCase):
+    def test_restart_redelivers_held_entries_merged(self):
+        client = PendingRedis({"model-events": [
+            ("1-0", {"model_id": "m1", "a": "1"}),
+            ("2-0", {"model_id": "m1", "b": "2"}),
+        ]})
+        router = EventRouter(client)
+        router.coalesce("model-events", "model_id", window_seconds=0.01, mode="merge")
+        seen = []
+
+        async def handler(event):
+            seen.append(event)
+
+        router.register_handler("model-events", handler)
+        coalesced = EVENTS_COALESCED.labels("model-events", "restart")
+        consumed = EVENTS_CONSUMED.labels("model-events", "restart")
+        before = coalesced.value, consumed.value
+
+        async def scenario():
+            task = asyncio.create_task(router.start_consuming("model-events", "restart", "c"))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(scenario())
+        self.assertEqual(seen, [{"model_id": "m1", "a": "1", "b": "2"}])
+        self.assertEqual(sorted(client.acked), [("model-events", "1-0"), ("model-events", "2-0")])
+        self.assertEqual(coalesced.value - before[0], 1)
+        self.assertEqual(consumed.value - before[1], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
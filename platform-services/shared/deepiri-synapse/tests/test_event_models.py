@@ -2,14 +2,12 @@ import unittest
 
 from deepiri_modelkit.contracts import events
 
-# Load validators module directly by file path to avoid package import issues
-import importlib.util
+# Import the validators through the Synapse `app` package (it uses relative imports)
+import sys
 from pathlib import Path
 
-validators_path = Path(__file__).resolve().parents[1] / "app" / "schemas" / "validators.py"
-spec = importlib.util.spec_from_file_location("deepiri_synapse.validators", str(validators_path))
-v = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(v)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.schemas import validators as v  # noqa: E402
 
 
 class TestEventModels(unittest.TestCase):
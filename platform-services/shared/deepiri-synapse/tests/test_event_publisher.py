@@ -0,0 +1,80 @@
+import asyncio
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.monitoring.prometheus import PUBLISH_DROPPED, PUBLISH_QUEUE_WAIT  # noqa: E402
+from app.producers.event_publisher import EventPublisher  # noqa: E402
+from app.producers.outbox import Outbox  # noqa: E402
+
+
+class SlowFunctions:
+    """Stands in for StreamFunctions: each publish takes a little while"""
+
+    def __init__(self):
+        self.published = 0
+
+    async def publish(self, stream_name, entry, max_length=None):
+        await asyncio.sleep(0.01)
+        self.published += 1
+        return f"{self.published}-0", False
+
+
+class TestInFlightLimit(unittest.TestCase):
+    def burst(self, publisher, n=10):
+        async def run():
+            return await asyncio.gather(*(
+                publisher.publish_model_event("model-ready", "m", str(i)) for i in range(n)
+            ))
+        return asyncio.run(run())
+
+    def test_block_waits_for_a_slot(self):
+        publisher = EventPublisher(None, functions=SlowFunctions(), max_in_flight=2)
+        waits = PUBLISH_QUEUE_WAIT.labels("model-events")
+        before = waits.count
+        ids = self.burst(publisher)
+        self.assertNotIn(None, ids)
+        self.assertEqual(waits.count - before, 10)
+        self.assertGreater(waits.sum, 0)
+        stats = publisher.stats()
+        self.assertEqual(stats["queue_wait_ms"]["count"], 10)
+        self.assertGreater(stats["queue_wait_ms"]["max"], 0)
+        self.assertEqual(stats["in_flight"], 0)
+
+    def test_drop_when_full(self):
+        publisher = EventPublisher(None, functions=SlowFunctions(), max_in_flight=2, overflow="drop")
+        dropped = PUBLISH_DROPPED.labels("model-events")
+        before = dropped.value
+        ids = self.burst(publisher)
+        self.assertEqual(ids.count(None), 8)
+        self.assertEqual(publisher.stats()["dropped"], 8)
+        self.assertEqual(dropped.value - before, 8)
+
+    def test_leftover_outbox_rows_are_not_overtaken(self):
+        async def scenario(path):
+            previous_run = Outbox(path, flush_interval_ms=1)
+            await previous_run.append("model-events", {"event": "model-ready", "n": 0})
+            await previous_run.close()
+
+            functions = SlowFunctions()
+            publisher = EventPublisher(None, functions=functions, outbox=Outbox(path))
+            # Published before start(): must queue behind the leftover row
+            self.assertIsNone(await publisher.publish_model_event("model-ready", "m", "1"))
+            self.assertEqual(functions.published, 0)
+            self.assertEqual(publisher.outbox.pending, 2)
+            await publisher.stop()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            asyncio.run(scenario(str(Path(tmp) / "outbox.db")))
+
+    def test_spill_needs_outbox(self):
+        with self.assertRaises(ValueError):
+            EventPublisher(None, functions=SlowFunctions(), max_in_flight=2, overflow="spill")
+        with self.assertRaises(ValueError):
+            EventPublisher(None, functions=SlowFunctions(), overflow="queue")
+
+
+if __name__ == "__main__":
+    unittest.main()
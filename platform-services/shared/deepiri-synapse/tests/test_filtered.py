@@ -0,0 +1,172 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from redis.asyncio.cluster import RedisCluster
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.connection import group_by_slot  # noqa: E402
+from app.consumers.event_router import EventRouter  # noqa: E402
+from app.consumers.filtered import FilteredReader  # noqa: E402
+from app.streams.partitions import PartitionSpec, StreamPartitioner  # noqa: E402
+
+
+class FakeRedis:
+    """Consumer groups plus a stand-in for the filtered read script"""
+
+    def __init__(self, streams):
+        self.streams = streams  # key -> pending entries
+        self.groups = {key: [] for key in streams}
+        self.script_keys = []
+
+    def register_script(self, source):
+        async def script(keys, args):
+            key, wanted = keys[0], int(args[2])
+            self.script_keys.append(key)
+            batch, self.streams[key] = self.streams[key][:wanted], self.streams[key][wanted:]
+            return ["9-0", len(batch), *[[entry_id, ["n", entry_id]] for entry_id in batch]]
+        return script
+
+    async def xinfo_groups(self, key):
+        if key not in self.groups:
+            raise RuntimeError("no such key")
+        return [{"name": name} for name in self.groups[key]]
+
+    async def xgroup_create(self, key, group_name, id="$", mkstream=False):
+        if mkstream:
+            raise AssertionError("ensure_group must not create streams")
+        self.groups[key].append(group_name)
+
+    async def xread(self, streams, count=None, block=None):
+        return []
+
+
+class TestEnsureGroup(unittest.TestCase):
+    def test_creates_on_every_partition(self):
+        client = FakeRedis({"inference-events:0": [], "inference-events:1": []})
+        client.groups["inference-events:0"].append("g")
+        reader = FilteredReader(
+            client, partitioner=StreamPartitioner({"inference-events": PartitionSpec(count=2)})
+        )
+        asyncio.run(reader.ensure_group("inference-events", "g"))
+        self.assertEqual(client.groups, {"inference-events:0": ["g"], "inference-events:1": ["g"]})
+
+    def test_group_limit(self):
+        client = FakeRedis({"model-events": []})
+        client.groups["model-events"] = ["a", "b"]
+        reader = FilteredReader(client, max_groups=2)
+        asyncio.run(reader.ensure_group("model-events", "a"))
+        with self.assertRaises(ValueError):
+            asyncio.run(reader.ensure_group("model-events", "c"))
+        self.assertEqual(client.groups["model-events"], ["a", "b"])
+
+
+class TestPartitionedRead(unittest.TestCase):
+    def test_reads_every_partition_and_rotates(self):
+        client = FakeRedis({
+            "inference-events:0": ["1-0", "2-0", "3-0"],
+            "inference-events:1": ["1-0"],
+        })
+        reader = FilteredReader(
+            client, partitioner=StreamPartitioner({"inference-events": PartitionSpec(count=2)})
+        )
+
+        entries = asyncio.run(reader.read("inference-events", "g", "c", {}, count=2, block_ms=0))
+        self.assertEqual([(key, entry_id) for key, entry_id, _ in entries], [
+            ("inference-events:0", "1-0"), ("inference-events:0", "2-0")
+        ])
+
+        entries = asyncio.run(reader.read("inference-events", "g", "c", {}, count=5, block_ms=0))
+        self.assertEqual([(key, entry_id) for key, entry_id, _ in entries], [
+            ("inference-events:1", "1-0"), ("inference-events:0", "3-0")
+        ])
+        self.assertEqual(reader.matched, 4)
+
+
+class FakeCluster(RedisCluster):
+    """A cluster client as far as is_cluster can tell; XREAD checks slots"""
+
+    def __init__(self):
+        self.reads = []
+
+    def register_script(self, source):
+        return None
+
+    async def xread(self, streams, count=None, block=None):
+        if len(group_by_slot(streams)) > 1:
+            raise RuntimeError("CROSSSLOT Keys in request don't hash to the same slot")
+        self.reads.append(sorted(streams))
+        await asyncio.sleep(0 if "inference-events:2" in streams else block / 1000)
+        return []
+
+
+class TestClusterWait(unittest.TestCase):
+    def test_wait_splits_keys_by_slot(self):
+        client = FakeCluster()
+        reader = FilteredReader(client)
+        newest = {f"inference-events:{i}": "0-0" for i in range(4)}
+        asyncio.run(asyncio.wait_for(reader._wait(newest, 5000), 1))
+        self.assertEqual(sorted(key for keys in client.reads for key in keys), sorted(newest))
+
+
+class StubReader:
+    """FilteredReader.read's documented (key, id, fields) results, once per key"""
+
+    def __init__(self, *args, **kwargs):
+        self.served = set()
+
+    async def read(self, stream_name, group_name, consumer_name, filters, block_ms=None):
+        if stream_name in self.served:
+            await asyncio.sleep(0.01)
+            return []
+        self.served.add(stream_name)
+        return [(stream_name, "1-0", {"model_name": "a"}), (stream_name, "2-0", {"model_name": "a"})]
+
+
+class AckingRedis:
+    def __init__(self):
+        self.acked = []
+
+    def register_script(self, source):
+        return None
+
+    async def xreadgroup(self, group, consumer, streams, count=None, block=None):
+        return []  # Nothing pending from an earlier run
+
+    async def xack(self, stream, group, msg_id):
+        self.acked.append((stream, msg_id))
+
+
+class TestRouterFilteredPath(unittest.TestCase):
+    def test_filtered_entries_reach_handlers_and_are_acked(self):
+        client = AckingRedis()
+        partitioner = StreamPartitioner({"inference-events": PartitionSpec(count=2)})
+        router = EventRouter(client, partitioner)
+        seen = []
+
+        async def handler(event):
+            seen.append(event["model_name"])
+
+        router.register_handler("inference-events", handler)
+
+        async def scenario():
+            with mock.patch("app.consumers.event_router.FilteredReader", StubReader):
+                task = asyncio.create_task(router.start_consuming(
+                    "inference-events", "g", "c", filters={"model_name": {"a"}}
+                ))
+                await asyncio.sleep(0.05)
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(scenario())
+        self.assertEqual(seen, ["a"] * 4)
+        self.assertEqual(sorted(client.acked), [
+            ("inference-events:0", "1-0"), ("inference-events:0", "2-0"),
+            ("inference-events:1", "1-0"), ("inference-events:1", "2-0"),
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
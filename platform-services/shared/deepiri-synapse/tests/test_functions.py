@@ -0,0 +1,172 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+
+try:
+    import fakeredis  # Runs the Lua library when lupa is installed
+except ImportError:
+    fakeredis = None
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.streams.functions import (  # noqa: E402
+    LIBRARY_VERSION,
+    PublishEntry,
+    StreamFunctions,
+    counters_key,
+    library_source,
+    script_source,
+)
+from app.streams.indexer import index_registry_key  # noqa: E402
+
+INDEX = "synapse:{model-events}:idx:model_name:m1"
+DEDUP = "synapse:{model-events}:dedup:abc"
+
+
+class TestPublishLibrary(unittest.TestCase):
+    def test_library_is_versioned_by_hash(self):
+        source = library_source()
+        self.assertTrue(source.startswith(f"#!lua name=synapse_{LIBRARY_VERSION}\n"))
+        self.assertIn(f"'synapse_publish_batch_{LIBRARY_VERSION}', publish_batch", source)
+        self.assertTrue(script_source("publish").rstrip().endswith("return publish(KEYS, ARGV)"))
+
+    def test_entry_encoding(self):
+        entry = PublishEntry(
+            {"event": "model-ready", "model_name": "m1"},
+            index_keys=["synapse:{model-events}:idx:model_name:m1"],
+            dedup_key="synapse:{model-events}:dedup:abc",
+            dedup_ttl_ms=60000
+        )
+        keys, args = entry.encode()
+        self.assertEqual(keys, [
+            "synapse:{model-events}:dedup:abc",
+            "synapse:{model-events}:idx:model_name:m1",
+        ])
+        self.assertEqual(args, ["model-ready", 60000, 1, 4, "event", "model-ready", "model_name", "m1"])
+
+    def test_entry_without_dedup_or_type(self):
+        keys, args = PublishEntry({"a": "1"}).encode()
+        self.assertEqual(keys, [])
+        self.assertEqual(args, ["", "", 0, 2, "a", "1"])
+        self.assertEqual(counters_key("model-events:3"), "synapse:{model-events:3}:counters")
+
+
+@unittest.skipUnless(fakeredis, "fakeredis not installed")
+class TestScripts(unittest.TestCase):
+    """Runs the library through EVALSHA; TestFunctions repeats it through FCALL"""
+
+    use_functions = False
+
+    def run_functions(self, scenario):
+        async def run():
+            client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+            functions = StreamFunctions(client)
+            if self.use_functions:
+                self.assertTrue(await functions.load())
+            return await scenario(client, functions)
+        return asyncio.run(run())
+
+    def test_publish_counts_and_indexes(self):
+        async def scenario(client, functions):
+            entry = PublishEntry({"event": "model-ready", "model_name": "m1"}, index_keys=[INDEX])
+            entry_id, duplicate = await functions.publish("model-events", entry)
+            return (
+                entry_id, duplicate,
+                await client.xrange("model-events"),
+                await client.hgetall(counters_key("model-events")),
+                await client.zrange(INDEX, 0, -1, withscores=True),
+                await client.smembers(index_registry_key("model-events")),
+            )
+
+        entry_id, duplicate, entries, counters, index, registry = self.run_functions(scenario)
+        self.assertFalse(duplicate)
+        self.assertEqual(entries, [(entry_id, {"event": "model-ready", "model_name": "m1"})])
+        self.assertEqual(counters, {"model-ready": "1"})
+        self.assertEqual(index, [(entry_id, float(entry_id.split("-")[0]))])
+        self.assertEqual(registry, {INDEX})
+
+    def test_dedup_returns_first_id_without_writing(self):
+        async def scenario(client, functions):
+            entry = PublishEntry({"event": "model-ready"}, dedup_key=DEDUP, dedup_ttl_ms=60000)
+            first = await functions.publish("model-events", entry)
+            retry = await functions.publish("model-events", entry)
+            return (
+                first, retry,
+                await client.xlen("model-events"),
+                await client.hgetall(counters_key("model-events")),
+                await client.pttl(DEDUP),
+            )
+
+        first, retry, length, counters, ttl = self.run_functions(scenario)
+        self.assertEqual(first[1], False)
+        self.assertEqual(retry, (first[0], True))
+        self.assertEqual(length, 1)
+        self.assertEqual(counters, {"model-ready": "1"})
+        self.assertTrue(0 < ttl <= 60000)
+
+    def test_max_length_trims_on_write(self):
+        async def scenario(client, functions):
+            for i in range(250):
+                await functions.publish("model-events", PublishEntry({"n": str(i)}), max_length=10)
+                await functions.publish("platform-events", PublishEntry({"n": str(i)}))
+            return await client.xlen("model-events"), await client.xlen("platform-events")
+
+        trimmed, untrimmed = self.run_functions(scenario)
+        # MAXLEN ~ drops whole stream nodes, so more than 10 entries stay
+        self.assertTrue(10 <= trimmed < 250)
+        self.assertEqual(untrimmed, 250)
+
+    def test_publish_batch_walks_mixed_entries(self):
+        async def scenario(client, functions):
+            indexed = PublishEntry(
+                {"event": "model-ready", "model_name": "m1"},
+                index_keys=[INDEX], dedup_key=DEDUP, dedup_ttl_ms=60000
+            )
+            plain = PublishEntry({"event": "model-failed"})
+            results = await functions.publish_batches({
+                "model-events": [indexed, plain, indexed],
+                "platform-events": [PublishEntry({"event": "deploy"})],
+            })
+            return (
+                results,
+                await client.xlen("model-events"),
+                await client.zcard(INDEX),
+                await client.hgetall(counters_key("model-events")),
+            )
+
+        results, length, indexed, counters = self.run_functions(scenario)
+        first, second, third = results["model-events"]
+        self.assertEqual((first[1], second[1]), (False, False))
+        self.assertEqual(third, (first[0], True))
+        self.assertEqual(len(results["platform-events"]), 1)
+        self.assertEqual((length, indexed), (2, 1))
+        self.assertEqual(counters, {"model-ready": "1", "model-failed": "1"})
+
+    def test_ack_and_forward(self):
+        async def scenario(client, functions):
+            await client.xgroup_create("model-events", "router", id="0", mkstream=True)
+            entry_id = await client.xadd("model-events", {"event": "model-ready"})
+            await client.xreadgroup("router", "c", {"model-events": ">"})
+            acked = await functions.ack_and_forward("model-events", "router", entry_id, [
+                ("audit-events", {"event": "model-ready", "seen": "1"}),
+                ("platform-events", {"event": "notify"}),
+            ], max_length=100)
+            return (
+                acked,
+                (await client.xpending("model-events", "router"))["pending"],
+                await client.xrange("audit-events"),
+                await client.xrange("platform-events"),
+            )
+
+        acked, pending, audit, platform = self.run_functions(scenario)
+        self.assertEqual((acked, pending), (1, 0))
+        self.assertEqual([fields for _, fields in audit], [{"event": "model-ready", "seen": "1"}])
+        self.assertEqual([fields for _, fields in platform], [{"event": "notify"}])
+
+
+class TestFunctions(TestScripts):
+    use_functions = True
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.monitoring.group_analytics import _merge_consumers, lag_trend  # noqa: E402
+
+
+class TestLagTrend(unittest.TestCase):
+    def test_draining(self):
+        trend = lag_trend([(0.0, 1000), (10.0, 900), (20.0, 800)])
+        self.assertEqual(trend["trend"], "draining")
+        self.assertAlmostEqual(trend["rate_per_second"], -10.0)
+        self.assertAlmostEqual(trend["time_to_drain_seconds"], 80.0)
+
+    def test_growing_and_steady(self):
+        growing = lag_trend([(0.0, 0), (1.0, 50), (2.0, 40), (3.0, 120)])
+        self.assertEqual(growing["trend"], "growing")
+        self.assertIsNone(growing["time_to_drain_seconds"])
+        self.assertEqual(lag_trend([(0.0, 5), (60.0, 5)])["trend"], "steady")
+        self.assertEqual(lag_trend([(0.0, 0), (60.0, 0)])["time_to_drain_seconds"], 0.0)
+
+    def test_too_few_samples(self):
+        self.assertEqual(lag_trend([(0.0, 5)])["trend"], "unknown")
+
+
+class TestMergeConsumers(unittest.TestCase):
+    def test_partitions_merged_by_name(self):
+        consumers = {}
+        _merge_consumers(consumers, [{"name": "w1", "pending": 2, "idle": 500, "inactive": -1}])
+        _merge_consumers(consumers, [
+            {"name": "w1", "pending": 3, "idle": 0, "inactive": 40},
+            {"name": "w2", "pending": 0, "idle": 9000},
+        ])
+        self.assertEqual(consumers["w1"], {"name": "w1", "pending": 5, "idle_ms": 0, "inactive_ms": 40})
+        self.assertEqual(consumers["w2"], {"name": "w2", "pending": 0, "idle_ms": 9000})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.producers.idempotency import DedupWindow, dedup_key, idempotency_key  # noqa: E402
+
+
+class TestIdempotencyKey(unittest.TestCase):
+    def test_explicit_key_wins(self):
+        event = {"idempotency_key": "abc", "producer_id": "helox", "sequence": 7}
+        self.assertEqual(idempotency_key(event), "abc")
+
+    def test_producer_and_sequence(self):
+        self.assertEqual(idempotency_key({"producer_id": "helox", "sequence": 7}), "helox:7")
+        self.assertEqual(idempotency_key({"sequence": 0}, producer="cyrex"), "cyrex:0")
+        self.assertIsNone(idempotency_key({"sequence": 7}))
+        self.assertIsNone(idempotency_key({"producer_id": "helox"}))
+
+    def test_long_keys_are_hashed(self):
+        key = dedup_key("model-events", "x" * 200)
+        self.assertTrue(key.startswith("synapse:{model-events}:dedup:"))
+        self.assertEqual(len(key.rsplit(":", 1)[1]), 40)
+
+
+class TestDedupWindow(unittest.TestCase):
+    def test_entries_and_hit_rate(self):
+        window = DedupWindow(window_seconds=60)
+        keyed = window.entry("model-events", {"event": "model-ready", "idempotency_key": "k"})
+        plain = window.entry("model-events", {"event": "model-ready"})
+        self.assertEqual(keyed.dedup_key, "synapse:{model-events}:dedup:k")
+        self.assertEqual(keyed.dedup_ttl_ms, 60000)
+        self.assertIsNone(plain.dedup_key)
+
+        window.record(keyed, False)
+        window.record(keyed, True)
+        window.record(plain, False)
+        self.assertEqual(window.stats()["checked"], 2)
+        self.assertEqual(window.stats()["hit_rate"], 0.5)
+
+    def test_disabled_window(self):
+        entry = DedupWindow(0).entry("model-events", {"idempotency_key": "k"})
+        self.assertIsNone(entry.dedup_key)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.streams.indexer import MAX_VALUE_LENGTH, index_keys, index_registry_key  # noqa: E402
+
+
+class TestIndexKeys(unittest.TestCase):
+    def test_keys_per_indexed_field(self):
+        fields = {"event": "inference", "model_name": "resnet", "trace_id": "abc", "model_id": ""}
+        self.assertEqual(
+            index_keys("inference-events", fields, ["model_id", "model_name", "trace_id"]),
+            [
+                "synapse:{inference-events}:idx:model_name:resnet",
+                "synapse:{inference-events}:idx:trace_id:abc",
+            ]
+        )
+
+    def test_oversized_values_skipped(self):
+        fields = {"model_name": "x" * (MAX_VALUE_LENGTH + 1), "model_id": 42}
+        self.assertEqual(
+            index_keys("model-events:0", fields, ["model_name", "model_id"]),
+            ["synapse:{model-events:0}:idx:model_id:42"]
+        )
+
+    def test_registry_shares_hash_tag(self):
+        self.assertEqual(index_registry_key("inference-events:1"), "synapse:{inference-events:1}:idx")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.streams.memory_pressure import MemoryPressureController  # noqa: E402
+from app.streams.partitions import PartitionSpec, StreamPartitioner  # noqa: E402
+
+PRIORITY = ["model-events", "platform-events", "training-events", "inference-events"]
+
+
+class FakeRedis:
+    def __init__(self, lengths):
+        self.lengths = dict(lengths)
+        self.added = []
+
+    async def xlen(self, stream_name):
+        return self.lengths.get(stream_name, 0)
+
+    async def xadd(self, stream_name, fields):
+        self.added.append((stream_name, fields))
+
+
+class FakeStreamManager:
+    """Memory readings, lengths and trims without Redis"""
+
+    def __init__(self, used, lengths, partitioner=None):
+        self.redis = FakeRedis(lengths)
+        self.partitioner = partitioner or StreamPartitioner()
+        self.used = used
+
+    async def memory_info(self):
+        return {"used_memory": self.used, "maxmemory": 100}
+
+    async def memory_usage(self, stream_name):
+        return None
+
+    async def trim_stream(self, stream_name, max_length=10000):
+        trimmed = self.redis.lengths[stream_name] - max_length
+        self.redis.lengths[stream_name] = max_length
+        return trimmed
+
+
+class TestStreamsToTighten(unittest.TestCase):
+    def setUp(self):
+        self.controller = MemoryPressureController(
+            FakeStreamManager(0, {}), priority_order=PRIORITY, soft_ratio=0.7, hard_ratio=0.9
+        )
+
+    def test_below_soft_ratio_trims_nothing(self):
+        self.assertEqual(self.controller.streams_to_tighten(0.69), [])
+
+    def test_pressure_widens_from_lowest_priority(self):
+        self.assertEqual(self.controller.streams_to_tighten(0.7), ["inference-events"])
+        self.assertEqual(
+            self.controller.streams_to_tighten(0.78), ["inference-events", "training-events"]
+        )
+        self.assertEqual(self.controller.streams_to_tighten(0.95), list(reversed(PRIORITY)))
+
+
+class TestRunOnce(unittest.TestCase):
+    def controller(self, manager):
+        return MemoryPressureController(
+            manager, priority_order=PRIORITY, soft_ratio=0.7, hard_ratio=0.9,
+            keep_fraction=0.5, min_length=1000
+        )
+
+    def test_halves_down_to_the_floor(self):
+        manager = FakeStreamManager(72, {"inference-events": 5000})
+        controller = self.controller(manager)
+        lengths = []
+        for _ in range(4):
+            asyncio.run(controller.run_once())
+            lengths.append(manager.redis.lengths["inference-events"])
+        self.assertEqual(lengths, [2500, 1250, 1000, 1000])
+        self.assertEqual(controller.entries_trimmed, 4000)
+
+    def test_no_pressure_no_trim(self):
+        manager = FakeStreamManager(50, {"inference-events": 5000})
+        self.assertEqual(asyncio.run(self.controller(manager).run_once()), [])
+        self.assertEqual(manager.redis.lengths["inference-events"], 5000)
+        self.assertEqual(manager.redis.added, [])
+
+    def test_actions_logged_to_the_event_stream_partition(self):
+        partitioner = StreamPartitioner({"platform-events": PartitionSpec(count=4, key_field="service")})
+        manager = FakeStreamManager(72, {"inference-events": 5000}, partitioner)
+        asyncio.run(self.controller(manager).run_once())
+        keys = {key for key, _ in manager.redis.added}
+        self.assertEqual(keys, {partitioner.route("platform-events", {"service": "synapse"})})
+        self.assertNotIn("platform-events", keys)
+
+
+if __name__ == "__main__":
+    unittest.main()
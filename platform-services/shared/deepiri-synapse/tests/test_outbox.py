@@ -0,0 +1,37 @@
+import asyncio
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.producers.outbox import Outbox  # noqa: E402
+
+
+class TestOutbox(unittest.TestCase):
+    def test_group_commit_order_and_reopen(self):
+        async def scenario(path):
+            outbox = Outbox(path, flush_interval_ms=1)
+            await asyncio.gather(*(
+                outbox.append("model-events", {"event": "model-ready", "n": i}) for i in range(20)
+            ))
+            self.assertEqual(outbox.flushes, 1)
+            self.assertTrue(outbox.has_backlog)
+
+            rows = await outbox.peek(5)
+            self.assertEqual([fields["n"] for _, _, fields in rows], [0, 1, 2, 3, 4])
+            await outbox.delete([seq for seq, _, _ in rows])
+            await outbox.close()
+
+            reopened = Outbox(path)
+            await reopened.open()
+            self.assertEqual(reopened.pending, 15)
+            self.assertEqual((await reopened.peek(1))[0][2]["n"], 5)
+            await reopened.close()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            asyncio.run(scenario(str(Path(tmp) / "outbox.db")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.streams.partitions import (  # noqa: E402
+    PartitionSpec,
+    StreamPartitioner,
+    parse_partition_specs,
+)
+from app.streams.retention import RetentionPolicy  # noqa: E402
+
+
+class TestStreamPartitioner(unittest.TestCase):
+    def setUp(self):
+        self.partitioner = StreamPartitioner(parse_partition_specs("inference-events=4:model_name"))
+
+    def test_parse_specs(self):
+        specs = parse_partition_specs("inference-events=8:model_name, training-events=2")
+        self.assertEqual(specs["inference-events"], PartitionSpec(8, "model_name"))
+        self.assertEqual(specs["training-events"], PartitionSpec(2))
+        with self.assertRaises(ValueError):
+            PartitionSpec.parse("0")
+
+    def test_same_key_same_partition(self):
+        first = self.partitioner.route("inference-events", {"model_name": "clf"})
+        self.assertTrue(first.startswith("inference-events:"))
+        for _ in range(10):
+            self.assertEqual(self.partitioner.route("inference-events", {"model_name": "clf"}), first)
+
+    def test_keyless_events_round_robin(self):
+        routed = {self.partitioner.route("inference-events", {}) for _ in range(4)}
+        self.assertEqual(routed, set(self.partitioner.partitions("inference-events")))
+
+    def test_unpartitioned_streams_unchanged(self):
+        self.assertEqual(self.partitioner.route("model-events", {"model_name": "clf"}), "model-events")
+        self.assertEqual(self.partitioner.assign("model-events", 1, 2), ["model-events"])
+
+    def test_assignment_covers_each_partition_once(self):
+        owned = [self.partitioner.assign("inference-events", i, 3) for i in range(3)]
+        flat = [name for names in owned for name in names]
+        self.assertEqual(sorted(flat), self.partitioner.partitions("inference-events"))
+
+    def test_cursor_round_trip(self):
+        positions = {"inference-events:0": "5-0", "inference-events:2": "7-1"}
+        cursor = self.partitioner.encode_cursor("inference-events", positions)
+        self.assertEqual(cursor, "0:5-0,2:7-1")
+        self.assertEqual(self.partitioner.parse_cursor("inference-events", cursor), positions)
+        # A plain ID applies to every partition
+        self.assertEqual(
+            self.partitioner.parse_cursor("inference-events", "5-0"),
+            {name: "5-0" for name in self.partitioner.partitions("inference-events")}
+        )
+        self.assertEqual(self.partitioner.encode_cursor("model-events", {"model-events": "3-0"}), "3-0")
+
+    def test_bad_cursors(self):
+        for cursor in ("4:1-0", "x:1-0", "0:oops"):
+            with self.assertRaises(ValueError):
+                self.partitioner.parse_cursor("inference-events", cursor)
+        with self.assertRaises(ValueError):
+            self.partitioner.parse_cursor("model-events", "0:1-0")
+
+    def test_retention_limits_split_across_partitions(self):
+        policy = RetentionPolicy.parse("age:1d;length:10000;memory:1mb").split(4)
+        self.assertEqual(policy.max_age_seconds, 86400)
+        self.assertEqual(policy.max_length, 2500)
+        self.assertEqual(policy.max_memory_bytes, 262144)
+
+
+if __name__ == "__main__":
+    unittest.main()
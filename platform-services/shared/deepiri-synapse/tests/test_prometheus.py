@@ -0,0 +1,69 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.monitoring.prometheus import MetricsRegistry  # noqa: E402
+
+
+class TestExposition(unittest.TestCase):
+    def test_counter_and_gauge(self):
+        registry = MetricsRegistry()
+        published = registry.counter("events_total", "Events", ("stream",))
+        published.labels("model-events").inc()
+        published.labels("model-events").inc(2)
+        registry.gauge("depth", "Depth").set(7)
+
+        text = registry.expose()
+        self.assertIn("# TYPE events_total counter\n", text)
+        self.assertIn('events_total{stream="model-events"} 3.0\n', text)
+        self.assertIn("depth 7.0\n", text)
+        self.assertEqual(registry.snapshot(), {"events_total": {"model-events": 3.0}, "depth": 7})
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = MetricsRegistry()
+        sizes = registry.histogram("ack_size", "Ack sizes", buckets=(1, 10))
+        for value in (1, 5, 10, 50):
+            sizes.observe(value)
+
+        text = registry.expose()
+        self.assertIn('ack_size_bucket{le="1.0"} 1\n', text)
+        self.assertIn('ack_size_bucket{le="10.0"} 3\n', text)
+        self.assertIn('ack_size_bucket{le="+Inf"} 4\n', text)
+        self.assertIn("ack_size_sum 66.0\n", text)
+        self.assertIn("ack_size_count 4\n", text)
+
+    def test_label_values_escaped(self):
+        registry = MetricsRegistry()
+        registry.counter("c", "C", ("name",)).labels('a"b\\c\n').inc()
+        self.assertIn('c{name="a\\"b\\\\c\\n"} 1.0\n', registry.expose())
+
+    def test_wrong_label_count_and_duplicate_name(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("c", "C", ("stream", "group"))
+        with self.assertRaises(ValueError):
+            counter.labels("only-one")
+        with self.assertRaises(ValueError):
+            registry.gauge("c", "again")
+
+
+class TestCollect(unittest.TestCase):
+    def test_failing_collector_keeps_others(self):
+        registry = MetricsRegistry()
+        gauge = registry.gauge("length", "Length", ("stream",))
+
+        def broken():
+            raise RuntimeError("redis down")
+
+        async def lengths():
+            gauge.labels("model-events").set(4)
+
+        registry.add_collector(broken)
+        registry.add_collector(lengths)
+        asyncio.run(registry.collect())
+        self.assertEqual(registry.snapshot()["length"], {"model-events": 4})
+
+
+if __name__ == "__main__":
+    unittest.main()
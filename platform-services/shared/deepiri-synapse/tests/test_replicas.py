@@ -0,0 +1,67 @@
+import asyncio
+import sys
+import time
+import unittest
+from pathlib import Path
+
+import redis.asyncio as redis
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.connection import parse_nodes  # noqa: E402
+from app.replicas import HEARTBEAT_KEY, ReplicaRouter  # noqa: E402
+
+
+class _Node:
+    """Just enough of a client: a key-value store that can go down"""
+
+    def __init__(self, name, values=None):
+        self.name = name
+        self.values = values if values is not None else {}
+        self.down = False
+
+    async def get(self, key):
+        if self.down:
+            raise redis.ConnectionError(f"{self.name} is down")
+        return self.values.get(key)
+
+    async def set(self, key, value):
+        self.values[key] = value
+
+    async def whoami(self):
+        if self.down:
+            raise redis.ConnectionError(f"{self.name} is down")
+        return self.name
+
+
+class TestReplicaRouter(unittest.TestCase):
+    def test_staleness_budget_and_fallback(self):
+        async def scenario():
+            primary = _Node("primary")
+            shared = primary.values  # replicates instantly
+            lagging = _Node("lagging", {HEARTBEAT_KEY: repr(time.time() - 60)})
+            fresh = _Node("fresh", shared)
+            router = ReplicaRouter(
+                primary, {"lagging": lagging, "fresh": fresh}, max_staleness_seconds=5
+            )
+
+            # Nothing is trusted before the first check
+            self.assertEqual(await router.reader.whoami(), "primary")
+
+            await router.check()
+            self.assertEqual(await router.reader.whoami(), "fresh")
+            self.assertGreater(router.stats()["replicas"]["lagging"]["staleness_seconds"], 5)
+
+            fresh.down = True
+            self.assertEqual(await router.reader.whoami(), "primary")
+            self.assertEqual(router.fallbacks, 1)
+            self.assertEqual(await router.reader.whoami(), "primary")
+            self.assertEqual(router.stats()["replica_reads"], 1)
+
+        asyncio.run(scenario())
+
+    def test_parse_nodes(self):
+        self.assertEqual(parse_nodes("r1:6380, r2,"), [("r1", 6380), ("r2", 6379)])
+
+
+if __name__ == "__main__":
+    unittest.main()
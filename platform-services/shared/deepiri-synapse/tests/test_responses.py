@@ -0,0 +1,80 @@
+import sys
+import unittest
+from pathlib import Path
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.responses import (  # noqa: E402
+    CompressionMiddleware,
+    ORJSONResponse,
+    cached_json,
+    entry_body,
+    negotiate_encoding,
+)
+
+
+def _app() -> FastAPI:
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.add_middleware(CompressionMiddleware, minimum_size=256)
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/large")
+    async def large():
+        return {"values": list(range(500))}
+
+    @app.get("/stats")
+    async def stats(request: Request):
+        return cached_json(request, {"streams": ["a", "b"]})
+
+    @app.get("/lines")
+    async def lines():
+        return StreamingResponse((f"{i}\n" for i in range(100)), media_type="application/x-ndjson")
+
+    return app
+
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(_app())
+
+    def test_negotiation(self):
+        self.assertEqual(negotiate_encoding("gzip, deflate"), "gzip")
+        self.assertIsNone(negotiate_encoding("identity"))
+        self.assertIsNone(negotiate_encoding("gzip;q=0"))
+
+    def test_threshold(self):
+        small = self.client.get("/small", headers={"Accept-Encoding": "gzip"})
+        self.assertIsNone(small.headers.get("content-encoding"))
+        large = self.client.get("/large", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(large.headers["content-encoding"], "gzip")
+        self.assertEqual(large.json()["values"][-1], 499)
+
+    def test_streamed_body_is_compressed_per_chunk(self):
+        response = self.client.get("/lines", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(len(response.text.splitlines()), 100)
+
+    def test_etag_revalidation(self):
+        first = self.client.get("/stats")
+        etag = first.headers["etag"]
+        again = self.client.get("/stats", headers={"If-None-Match": etag})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b"")
+        stale = self.client.get("/stats", headers={"If-None-Match": 'W/"other"'})
+        self.assertEqual(stale.status_code, 200)
+
+    def test_entry_body_decodes_bytes_mode_entries(self):
+        self.assertEqual(
+            entry_body(b"1-0", {b"event": b"model-ready", "replay_of": "0-1"}),
+            {"id": "1-0", "data": {"event": "model-ready", "replay_of": "0-1"}}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+import asyncio
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.storage.blob import LocalBlobStore  # noqa: E402
+from app.streams.archiver import StreamArchiver  # noqa: E402
+from app.streams.ids import parse_id  # noqa: E402
+from app.streams.manager import StreamManager  # noqa: E402
+from app.streams.partitions import PartitionSpec, StreamPartitioner  # noqa: E402
+from app.streams.retention import (  # noqa: E402
+    RetentionPolicy,
+    RetentionScheduler,
+    parse_retention_policies,
+)
+
+ENTRY_BYTES = 100
+
+
+class FakeRedis:
+    """In-memory streams with exact XTRIM, plus what the archiver needs"""
+
+    def __init__(self, streams):
+        self.streams = streams
+        self.values = {}
+        self.trims = []
+
+    def register_script(self, source):
+        async def release(keys, args):
+            return int(self.values.pop(keys[0], None) is not None)
+        return release
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def xlen(self, stream_name):
+        return len(self.streams[stream_name])
+
+    async def memory_usage(self, stream_name):
+        return len(self.streams[stream_name]) * ENTRY_BYTES
+
+    async def xrange(self, stream_name, min="-", max="+", count=None):
+        def bound(value, default):
+            if value in ("-", "+"):
+                return default, False
+            return parse_id(value.lstrip("(")), value.startswith("(")
+
+        low, low_open = bound(min, (0, 0))
+        high, high_open = bound(max, (2 ** 64, 0))
+        return [
+            (entry_id, fields) for entry_id, fields in self.streams[stream_name]
+            if (low < parse_id(entry_id) or not low_open and low == parse_id(entry_id))
+            and (parse_id(entry_id) < high or not high_open and high == parse_id(entry_id))
+        ][:count]
+
+    async def xtrim(self, stream_name, maxlen=None, minid=None, approximate=True):
+        self.trims.append((stream_name, "minid" if minid else "maxlen", minid or maxlen))
+        entries = self.streams[stream_name]
+        if minid:
+            kept = [e for e in entries if parse_id(e[0]) >= parse_id(minid)]
+        else:
+            kept = entries[-maxlen:]
+        self.streams[stream_name] = kept
+        return len(entries) - len(kept)
+
+
+def entries(first_ms, count, step_ms=1):
+    return [(f"{first_ms + i * step_ms}-0", {"n": str(i)}) for i in range(count)]
+
+
+def hours_ago(hours):
+    return int((time.time() - hours * 3600) * 1000)
+
+
+class TestRetentionPolicy(unittest.TestCase):
+    def test_parse_all_limits(self):
+        policy = RetentionPolicy.parse("age:7d;length:100000;memory:256mb")
+        self.assertEqual(policy.max_age_seconds, 7 * 86400)
+        self.assertEqual(policy.max_length, 100000)
+        self.assertEqual(policy.max_memory_bytes, 256 * 1024 ** 2)
+
+    def test_parse_stream_map_with_partial_policies(self):
+        policies = parse_retention_policies("inference-events=age:90m, model-events=length:500")
+        self.assertEqual(policies["inference-events"].max_age_seconds, 5400)
+        self.assertIsNone(policies["inference-events"].max_length)
+        self.assertEqual(policies["model-events"].max_length, 500)
+
+    def test_unknown_limit_rejected(self):
+        with self.assertRaises(ValueError):
+            RetentionPolicy.parse("ttl:5")
+
+
+class TestRetentionScheduler(unittest.TestCase):
+    def scheduler(self, client, policies, partitions=None, archiver=None):
+        partitioner = StreamPartitioner(partitions or {})
+        manager = StreamManager(client, partitioner=partitioner)
+        # Split per partition the way main.py does
+        split = {
+            key: policy.split(len(partitioner.partitions(stream)))
+            for stream, policy in policies.items()
+            for key in partitioner.partitions(stream)
+        }
+        return RetentionScheduler(manager, split, archiver=archiver)
+
+    def test_age_trims_each_partition_by_minid(self):
+        client = FakeRedis({
+            f"inference-events:{i}": entries(hours_ago(3), 3) + entries(hours_ago(0.5), 2)
+            for i in range(2)
+        })
+        scheduler = self.scheduler(
+            client,
+            {"inference-events": RetentionPolicy(max_age_seconds=3600)},
+            partitions={"inference-events": PartitionSpec(count=2)}
+        )
+        run = asyncio.run(scheduler.run_once())
+
+        self.assertEqual(sorted((key, kind) for key, kind, _ in client.trims), [
+            ("inference-events:0", "minid"), ("inference-events:1", "minid"),
+        ])
+        for i in range(2):
+            self.assertEqual(len(client.streams[f"inference-events:{i}"]), 2)
+            self.assertEqual(run["streams"][f"inference-events:{i}"]["age"], 3)
+        self.assertEqual(scheduler.stats()["trimmed_total"]["inference-events:0"], 3)
+
+    def test_length_limit_is_shared_between_partitions(self):
+        client = FakeRedis({f"model-events:{i}": entries(1, 5) for i in range(2)})
+        scheduler = self.scheduler(
+            client,
+            {"model-events": RetentionPolicy(max_length=6)},
+            partitions={"model-events": PartitionSpec(count=2)}
+        )
+        asyncio.run(scheduler.run_once())
+        self.assertEqual([len(client.streams[f"model-events:{i}"]) for i in range(2)], [3, 3])
+
+    def test_memory_limit_trims_to_estimated_length(self):
+        client = FakeRedis({"model-events": entries(1, 10)})
+        policy = RetentionPolicy(max_memory_bytes=4 * ENTRY_BYTES)
+        scheduler = self.scheduler(client, {"model-events": policy})
+        run = asyncio.run(scheduler.run_once())
+        self.assertEqual(run["streams"]["model-events"]["memory"], 6)
+        self.assertEqual([e[0] for e in client.streams["model-events"]], ["7-0", "8-0", "9-0", "10-0"])
+
+    def test_archived_streams_are_exported_before_trimming(self):
+        old, recent = entries(hours_ago(3), 4), entries(hours_ago(0.5), 2)
+        client = FakeRedis({"model-events": old + recent, "platform-events": entries(hours_ago(3), 2)})
+        with tempfile.TemporaryDirectory() as root:
+            archiver = StreamArchiver(client, LocalBlobStore(root), ["model-events"])
+            policy = RetentionPolicy(max_age_seconds=3600)
+            scheduler = self.scheduler(
+                client, {"model-events": policy, "platform-events": policy}, archiver=archiver
+            )
+            asyncio.run(scheduler.run_once())
+            indexes = asyncio.run(archiver.segment_indexes("model-events"))
+
+        self.assertEqual(client.streams["model-events"], recent)
+        self.assertEqual([(i["first_id"], i["last_id"]) for i in indexes], [(old[0][0], old[-1][0])])
+        self.assertEqual(archiver.entries_archived, 4)
+        # Streams the archiver doesn't cover are trimmed directly
+        self.assertEqual(client.streams["platform-events"], [])
+
+    def test_failing_stream_does_not_stop_the_run(self):
+        client = FakeRedis({"model-events": entries(1, 5)})
+        scheduler = self.scheduler(client, {
+            "missing-events": RetentionPolicy(max_length=2),
+            "model-events": RetentionPolicy(max_length=2),
+        })
+        run = asyncio.run(scheduler.run_once())
+        self.assertIn("error", run["streams"]["missing-events"])
+        self.assertEqual(run["streams"]["model-events"]["length"], 3)
+        self.assertEqual(scheduler.errors, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.schemas.registry import (  # noqa: E402
+    SCHEMA_ID_FIELD,
+    SchemaCompatibilityError,
+    SchemaRegistry,
+)
+from app.schemas.sampling import SamplingValidator, ValidationPolicy, parse_policies  # noqa: E402
+
+
+V1_FIELDS = {
+    "event": {"type": "string", "required": True},
+    "model_name": {"type": "string", "required": True},
+}
+V2_FIELDS = {
+    "event": {"type": "string", "required": True},
+    "model": {"type": "string", "required": True, "default": ""},
+    "replicas": {"type": "integer", "required": False},
+}
+
+
+class TestSchemaRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = SchemaRegistry(cache_size=1)
+
+    def register(self, subject, fields, check=True):
+        return asyncio.run(self.registry.register(subject, fields, check=check))
+
+    def test_versions_get_stable_ids(self):
+        v1 = self.register("model-events/model-scaled", V1_FIELDS)
+        again = self.register("model-events/model-scaled", V1_FIELDS)
+        self.assertEqual(v1.version, 1)
+        self.assertEqual(v1.schema_id, again.schema_id)
+
+    def test_incompatible_version_rejected(self):
+        self.register("model-events/model-scaled", V1_FIELDS)
+        breaking = dict(V1_FIELDS, model_name={"type": "integer", "required": True})
+        with self.assertRaises(SchemaCompatibilityError):
+            self.register("model-events/model-scaled", breaking)
+
+    def test_upcaster_migrates_old_events(self):
+        v1 = self.register("model-events/model-scaled", V1_FIELDS)
+        v2 = self.register("model-events/model-scaled", V2_FIELDS)
+        self.registry.register_upcaster(
+            "model-events/model-scaled", 1,
+            lambda e: {"model": e.pop("model_name"), **e},
+        )
+        old_event = {"event": "model-scaled", "model_name": "clf", SCHEMA_ID_FIELD: v1.schema_id}
+        data, version = self.registry.validate("model-events", old_event)
+        self.assertEqual(version.schema_id, v2.schema_id)
+        self.assertEqual(data["model"], "clf")
+        self.assertNotIn("model_name", data)
+
+    def test_unheadered_events_use_latest_and_reject_invalid(self):
+        self.register("training-events", V1_FIELDS)
+        with self.assertRaises(ValueError):
+            self.registry.validate("training-events", {"event": "training"})
+
+    def test_compiled_validator_cache_is_bounded(self):
+        a = self.register("a-events", V1_FIELDS)
+        b = self.register("b-events", V1_FIELDS)
+        self.registry.validator_for(a.schema_id)
+        self.registry.validator_for(b.schema_id)
+        self.registry.validator_for(a.schema_id)
+        self.assertEqual(self.registry.stats()["compiled_cached"], 1)
+        self.assertEqual(self.registry.cache_misses, 3)
+
+    def test_declared_upcaster_applies_on_read(self):
+        v1 = self.register("model-events/model-scaled", V1_FIELDS)
+        v2 = self.register("model-events/model-scaled", V2_FIELDS)
+        asyncio.run(self.registry.register_declared_upcaster(
+            "model-events/model-scaled", 1,
+            {"rename": {"model_name": "model"}, "defaults": {"replicas": "1"}},
+        ))
+        stored = {"event": "model-scaled", "model_name": "clf", SCHEMA_ID_FIELD: v1.schema_id}
+        self.assertEqual(self.registry.upcast_fields(stored), {
+            "event": "model-scaled", "model": "clf", "replicas": "1", SCHEMA_ID_FIELD: v2.schema_id,
+        })
+        raw = {k.encode(): v.encode() for k, v in stored.items()}
+        self.assertEqual(self.registry.upcast_fields(raw)[b"model"], b"clf")
+
+    def test_read_passes_through_current_and_unheadered_entries(self):
+        self.register("model-events/model-scaled", V1_FIELDS)
+        v2 = self.register("model-events/model-scaled", V2_FIELDS)
+        current = {"event": "model-scaled", "model": "clf", SCHEMA_ID_FIELD: v2.schema_id}
+        self.assertIs(self.registry.upcast_fields(current), current)
+        plain = {b"event": b"model-scaled"}
+        self.assertIs(self.registry.upcast_fields(plain), plain)
+
+    def test_declared_upcaster_rejects_bad_specs(self):
+        self.register("model-events/model-scaled", V1_FIELDS)
+        register = self.registry.register_declared_upcaster
+        with self.assertRaises(ValueError):
+            asyncio.run(register("model-events/model-scaled", 1, {"cast": {"a": "int"}}))
+        with self.assertRaises(ValueError):
+            asyncio.run(register("model-events/model-scaled", 1, {"drop": "model_name"}))
+        with self.assertRaises(ValueError):
+            asyncio.run(register("model-events/model-scaled", 7, {"drop": ["model_name"]}))
+
+
+class TestSamplingValidator(unittest.TestCase):
+    def setUp(self):
+        self.registry = SchemaRegistry()
+        asyncio.run(self.registry.register("training-events", V1_FIELDS))
+
+    def test_parse_policies(self):
+        policies = parse_policies("inference-events=sample:100, model-events=shape")
+        self.assertEqual(policies["inference-events"], ValidationPolicy("sample", 100))
+        self.assertEqual(policies["model-events"].mode, "shape")
+        with self.assertRaises(ValueError):
+            ValidationPolicy.parse("sometimes")
+
+    def test_sample_validates_one_in_n(self):
+        validator = SamplingValidator(
+            self.registry, {"training-events": ValidationPolicy.parse("sample:3")}
+        )
+        bad = {"event": "training"}
+        outcomes = []
+        for _ in range(6):
+            try:
+                validator.validate("training-events", bad, producer="helox")
+                outcomes.append("skipped")
+            except ValueError:
+                outcomes.append("failed")
+        self.assertEqual(outcomes, ["failed", "skipped", "skipped"] * 2)
+        self.assertEqual(validator.stats()["by_producer"]["helox"]["failure_rate"], 1.0)
+
+    def test_shape_skips_key_sets_already_seen(self):
+        validator = SamplingValidator(
+            self.registry, {"training-events": ValidationPolicy.parse("shape")}
+        )
+        event = {"event": "training", "model_name": "clf"}
+        validator.validate("training-events", event)
+        validator.validate("training-events", dict(event, model_name="other"))
+        counts = validator.stats()["by_schema"]["training-events"]
+        self.assertEqual((counts["validated"], counts["skipped"]), (1, 1))
+
+    def test_sampled_out_events_are_still_upcast(self):
+        v1 = asyncio.run(self.registry.register("model-events/model-scaled", V1_FIELDS))
+        asyncio.run(self.registry.register("model-events/model-scaled", V2_FIELDS))
+        self.registry.register_upcaster(
+            "model-events/model-scaled", 1,
+            lambda e: {"model": e.pop("model_name"), **e},
+        )
+        validator = SamplingValidator(
+            self.registry, {"model-events": ValidationPolicy.parse("sample:100")}
+        )
+        old_event = {"event": "model-scaled", "model_name": "clf", SCHEMA_ID_FIELD: v1.schema_id}
+        results = [validator.validate("model-events", dict(old_event)) for _ in range(2)]
+        self.assertEqual([r.get("model") for r in results], ["clf", "clf"])
+        self.assertEqual(validator.stats()["by_schema"][v1.schema_id]["skipped"], 1)
+
+    def test_producers_past_the_limit_fold_into_other(self):
+        validator = SamplingValidator(self.registry, max_producers=2)
+        event = {"event": "training", "model_name": "clf"}
+        for producer in ("a", "b", "c", "d", "a"):
+            validator.validate("training-events", event, producer=producer)
+        by_producer = validator.stats()["by_producer"]
+        self.assertEqual(sorted(by_producer), ["a", "b", "other"])
+        self.assertEqual(by_producer["a"]["validated"], 2)
+        self.assertEqual(by_producer["other"]["validated"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
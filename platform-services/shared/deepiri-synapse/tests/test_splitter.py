@@ -0,0 +1,51 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.streams.partitions import PartitionSpec, StreamPartitioner  # noqa: E402
+from app.streams.splitter import StreamSplitter, parse_split_streams  # noqa: E402
+
+
+class TestStreamSplitter(unittest.TestCase):
+    def test_parse_split_streams(self):
+        streams = parse_split_streams("model-events, agi-decisions=decision|override")
+        self.assertIsNone(streams["model-events"])
+        self.assertEqual(streams["agi-decisions"], {"decision", "override"})
+
+    def test_targets_and_new_stream_callback(self):
+        created = []
+        splitter = StreamSplitter(
+            redis_client=None,
+            streams=parse_split_streams("model-events"),
+            max_types=2,
+            on_new_stream=lambda derived, source: created.append((derived, source))
+        )
+        self.assertEqual(splitter._target("model-events", {"event": "model-ready"}), "model-events:type:model-ready")
+        self.assertEqual(splitter._target("model-events", {"event": "model-ready"}), "model-events:type:model-ready")
+        self.assertIsNone(splitter._target("model-events", {"event": "bad type!"}))
+        self.assertIsNone(splitter._target("model-events", {}))
+        self.assertEqual(splitter._target("model-events", {"event": "model-loaded"}), "model-events:type:model-loaded")
+        # Capped at max_types derived streams per source
+        self.assertIsNone(splitter._target("model-events", {"event": "model-failed"}))
+        self.assertEqual(created, [
+            ("model-events:type:model-ready", "model-events"),
+            ("model-events:type:model-loaded", "model-events"),
+        ])
+
+    def test_allowed_types_only(self):
+        splitter = StreamSplitter(None, parse_split_streams("model-events=model-ready"))
+        self.assertIsNone(splitter._target("model-events", {"event": "model-loaded"}))
+        with self.assertRaises(ValueError):
+            StreamSplitter(None, {}, mode="fork")
+
+    def test_numeric_types_never_target_a_partition(self):
+        partitioner = StreamPartitioner({"model-events": PartitionSpec(count=4)})
+        splitter = StreamSplitter(None, parse_split_streams("model-events"), partitioner=partitioner)
+        target = splitter._target("model-events", {"event": "0"})
+        self.assertEqual(target, "model-events:type:0")
+        self.assertNotIn(target, partitioner.partitions("model-events"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.consumers.filtered import encode_filters  # noqa: E402
+from app.streams.filters import matches, parse_filter  # noqa: E402
+from app.streams.ids import (  # noqa: E402
+    MAX_SEQ, merge_entries, merge_entry_streams, next_id, parse_id, parse_position
+)
+
+
+class TestStreamPositions(unittest.TestCase):
+    def test_ids_pass_through(self):
+        self.assertEqual(parse_position("1700000000000-5"), "1700000000000-5")
+        self.assertIsNone(parse_position("-"))
+        self.assertEqual(next_id("1700000000000-5"), "1700000000000-6")
+
+    def test_dates_and_epoch_millis(self):
+        self.assertEqual(parse_position("2025-01-01"), "1735689600000-0")
+        self.assertEqual(parse_position("2025-01-01T00:00:00Z", end=True), f"1735689600000-{MAX_SEQ}")
+        self.assertEqual(parse_position("1735689600000"), "1735689600000-0")
+
+    def test_invalid_position(self):
+        with self.assertRaises(ValueError):
+            parse_position("yesterday")
+
+    def test_invalid_ids(self):
+        self.assertEqual(parse_id("1700000000000"), (1700000000000, 0))
+        for value in ("abc", "-5", "+5", "1-2-3", "1- 2", ""):
+            with self.assertRaises(ValueError):
+                parse_id(value)
+
+
+class TestMergeEntries(unittest.TestCase):
+    def test_merges_partitions_by_id(self):
+        merged = merge_entries([
+            [("1-0", {}), ("10-0", {})],
+            [(b"2-0", {}), (b"10-1", {})],
+            [],
+        ])
+        self.assertEqual([e[0] for e in merged], ["1-0", b"2-0", "10-0", b"10-1"])
+
+    def test_descending(self):
+        merged = merge_entries([[("9-0", {}), ("1-0", {})], [("10-0", {}), ("2-0", {})]], True)
+        self.assertEqual([e[0] for e in merged], ["10-0", "9-0", "2-0", "1-0"])
+
+    def test_async_sources(self):
+        async def source(*ids):
+            for entry_id in ids:
+                yield entry_id, {}
+
+        async def collect():
+            merged = merge_entry_streams([source("1-0", "3-0"), source(), source("2-0", "4-0")])
+            return [entry_id async for entry_id, _ in merged]
+
+        self.assertEqual(asyncio.run(collect()), ["1-0", "2-0", "3-0", "4-0"])
+
+
+class TestFilters(unittest.TestCase):
+    def test_all_fields_must_match_any_listed_value(self):
+        filters = parse_filter("model_name=clf, event=model-ready|model-loaded")
+        self.assertTrue(matches({"model_name": "clf", "event": "model-loaded"}, filters))
+        self.assertFalse(matches({"model_name": "clf", "event": "inference"}, filters))
+        self.assertFalse(matches({"event": "model-ready"}, filters))
+
+    def test_bad_clause(self):
+        with self.assertRaises(ValueError):
+            parse_filter("model_name")
+        with self.assertRaises(ValueError):
+            parse_filter("=clf")
+
+    def test_empty_and_repeated_clauses(self):
+        self.assertEqual(parse_filter(None), {})
+        self.assertEqual(parse_filter(" , "), {})
+        self.assertEqual(
+            parse_filter(" model_name = a , model_name=b|c,"), {"model_name": {"a", "b", "c"}}
+        )
+
+    def test_bytes_fields(self):
+        filters = parse_filter("model_name=clf")
+        self.assertTrue(matches({b"model_name": b"clf"}, filters))
+        self.assertFalse(matches({b"model_name": b"other"}, filters))
+
+    def test_script_argument_layout(self):
+        filters = parse_filter("model_name=clf,event=model-ready|model-loaded")
+        self.assertEqual(
+            encode_filters(filters),
+            ["2", "model_name", "1", "clf", "event", "2", "model-loaded", "model-ready"]
+        )
+        self.assertEqual(encode_filters({}), ["0"])
+
+    def test_script_arguments_decode_back(self):
+        # Mirrors the ARGV walk in FILTERED_READ_SCRIPT (1-based, after group/consumer/count)
+        filters = parse_filter("a=1|2|3,b=x,c=y|z")
+        argv = ["group", "consumer", "10", *encode_filters(filters)]
+        decoded, pos = {}, 5
+        for _ in range(int(argv[3])):
+            name, size = argv[pos - 1], int(argv[pos])
+            decoded[name] = set(argv[pos + 1:pos + 1 + size])
+            pos += 2 + size
+        self.assertEqual(decoded, filters)
+        self.assertEqual(pos - 1, len(argv))
+
+
+if __name__ == "__main__":
+    unittest.main()
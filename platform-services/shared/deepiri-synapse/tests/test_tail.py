@@ -0,0 +1,125 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.streams.ids import parse_id  # noqa: E402
+from app.streams.partitions import PartitionSpec, StreamPartitioner  # noqa: E402
+from app.streams.tail import TailHub, TailSubscriber, _StreamTail  # noqa: E402
+
+
+class FakeRedis:
+    """XRANGE/XREVRANGE over in-memory streams; XREAD never returns"""
+
+    def __init__(self, streams):
+        self.streams = streams
+
+    async def xrange(self, stream_name, min="-", max="+", count=None):
+        low = parse_id(min.lstrip("("))
+        high = parse_id(max)
+        return [
+            (entry_id, fields) for entry_id, fields in self.streams[stream_name]
+            if low < parse_id(entry_id) <= high
+        ][:count]
+
+    async def xrevrange(self, stream_name, count=None):
+        return self.streams[stream_name][::-1][:count]
+
+    async def xread(self, streams, count=None, block=None):
+        await asyncio.sleep(3600)
+
+
+class TestTailFanOut(unittest.TestCase):
+    def setUp(self):
+        self.hub = TailHub(redis_client=None, queue_size=2)
+        self.tail = _StreamTail("model-events", "0-0")
+
+    def _subscribe(self, **kwargs) -> TailSubscriber:
+        subscriber = TailSubscriber("model-events", queue_size=2, **kwargs)
+        self.tail.subscribers.add(subscriber)
+        return subscriber
+
+    def test_filters_and_drop_oldest(self):
+        everything = self._subscribe()
+        model_a = self._subscribe(filters={"model_name": {"a"}})
+        for i in range(3):
+            self.hub._dispatch(self.tail, (f"1-{i}", {"model_name": "a" if i != 1 else "b"}))
+
+        self.assertEqual([everything.queue.get_nowait()[0] for _ in range(2)], ["1-1", "1-2"])
+        self.assertEqual(everything.dropped, 1)
+        self.assertEqual([model_a.queue.get_nowait()[0] for _ in range(2)], ["1-0", "1-2"])
+        self.assertEqual(model_a.dropped, 0)
+
+    def test_bytes_mode_fields(self):
+        model_a = self._subscribe(filters={"model_name": {"a"}})
+        self.hub._dispatch(self.tail, ("1-0", {b"model_name": b"a"}))
+        self.hub._dispatch(self.tail, ("1-1", {b"model_name": b"b"}))
+
+        self.assertEqual(model_a.queue.get_nowait(), ("1-0", {b"model_name": b"a"}, "model-events"))
+        self.assertTrue(model_a.queue.empty())
+
+    def test_slow_client_disconnected(self):
+        slow = self._subscribe(overflow="disconnect")
+        for i in range(3):
+            self.hub._dispatch(self.tail, (f"1-{i}", {}))
+
+        self.assertTrue(slow.overflowed)
+        self.assertNotIn(slow, self.tail.subscribers)
+        self.assertIsNone(slow.queue.get_nowait())
+        self.assertEqual(self.hub.disconnected, 1)
+
+    def test_disconnected_subscriber_leaves_other_partitions(self):
+        slow = self._subscribe(overflow="disconnect")
+        other_partition = _StreamTail("model-events:1", "0-0")
+        other_partition.subscribers.add(slow)
+        for i in range(3):
+            self.hub._dispatch(self.tail, (f"1-{i}", {}))
+        self.hub._dispatch(other_partition, ("2-0", {}))
+
+        self.assertNotIn(slow, other_partition.subscribers)
+        self.assertIsNone(slow.queue.get_nowait())
+        self.assertTrue(slow.queue.empty())
+
+    def test_unknown_overflow_policy(self):
+        with self.assertRaises(ValueError):
+            TailSubscriber("model-events", overflow="block")
+
+
+class TestPartitionedResume(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeRedis({
+            "inference-events:0": [("5-0", {"n": "a"}), ("6-0", {"n": "b"})],
+            "inference-events:1": [("2-0", {"n": "c"}), ("3-0", {"n": "d"})],
+        })
+        partitioner = StreamPartitioner({"inference-events": PartitionSpec(count=2)})
+        self.hub = TailHub(self.client, partitioner=partitioner)
+
+    def resume(self, cursor):
+        async def collect():
+            subscriber = await self.hub.subscribe("inference-events", resume_after=cursor)
+            seen, cursors = [], []
+            try:
+                async for entry in self.hub.events(subscriber, heartbeat_seconds=0.01):
+                    if entry is None:
+                        break
+                    seen.append(entry[1]["n"])
+                    cursors.append(self.hub.cursor(subscriber))
+            finally:
+                await self.hub.unsubscribe(subscriber)
+            return seen, cursors
+        return asyncio.run(collect())
+
+    def test_slower_partition_is_not_skipped(self):
+        # Partition 0 was delivered up to 5-0, partition 1 only up to 0-0:
+        # 2-0 and 3-0 sort below the last delivered ID but are still owed
+        seen, cursors = self.resume("0:5-0,1:0-0")
+        self.assertEqual(seen, ["c", "d", "b"])
+        self.assertEqual(cursors[-1], "0:6-0,1:3-0")
+
+        seen, _ = self.resume(cursors[1])
+        self.assertEqual(seen, ["b"])
+
+
+if __name__ == "__main__":
+    unittest.main()